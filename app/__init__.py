@@ -1,5 +1,6 @@
 from decouple import UndefinedValueError, config
 from app.core.logging_config import setup_logging
+from app.db.session import close_request_sessions
 from flask import Flask, flash, redirect, url_for
 from flask_login import LoginManager
 from flask_wtf import CSRFProtect
@@ -7,11 +8,13 @@ from flask_wtf.csrf import CSRFError
 import logging
 
 from app.routes.auth import auth_bp
+from app.routes.batch_lookup import batch_lookup_bp
 from app.routes.diary import diary_bp
 from app.routes.handle_scan import handle_scan_bp
 from app.routes.handle_search import handle_search_bp
 from app.routes.index import index_bp
 from app.routes.manual_analysis import manual_analysis_bp
+from app.routes.metrics import metrics_bp
 from app.routes.profile import profile_bp
 from app.routes.recommendations import recommendations_bp
 from app.routes.results import results_bp
@@ -48,6 +51,9 @@ def create_app():
         flash("Сессия истекла или неверный CSRF токен. Повторите попытку.", "error")
         return redirect(url_for("index_bp.index")), 400
 
+    # сессия БД живёт один запрос (одно соединение из пула), в конце — возврат в пул
+    app.teardown_appcontext(close_request_sessions)
+
     # ленивое использование CSRFProtect, включаем CSRF защиту
     csrf.init_app(app)
 
@@ -69,6 +75,25 @@ def create_app():
     app.register_blueprint(recommendations_bp)
     app.register_blueprint(profile_bp)
     app.register_blueprint(manual_analysis_bp)
+    app.register_blueprint(metrics_bp)
+    # пакетный поиск вызывают программы партнёров по ключу API, а не формы сайта —
+    # CSRF проверяется в самом роуте и только для вошедших по cookie сессии
+    csrf.exempt(batch_lookup_bp)
+    app.register_blueprint(batch_lookup_bp)
+
+    # матрица роль → права компилируется один раз при старте; если БД ещё недоступна
+    # (нет таблиц, не применены сиды) — скомпилируется при первой проверке прав
+    from app.auth.rbac.matrix import compile_permission_matrix
+
+    try:
+        compile_permission_matrix()
+    except Exception:
+        logger.warning("Матрица прав не скомпилирована при старте", exc_info=True)
+
+    # L1-кэш продуктов воркера заполняется из общего L2 (если он настроен)
+    from app.services.product_lookup_service import warm_product_cache
+
+    warm_product_cache()
     return app
 
 
@@ -83,10 +108,11 @@ def load_user(user_id):
     вызывает load_user(user_id)
     получает пользователя
     кладёт в current_user
-    """
-    from app.db.crud import OtrazhenieDB
 
-    db = OtrazhenieDB()
+    В current_user попадает неизменяемый Principal (id, роли, права) из кэша процесса:
+    пока он в кэше, запрос не обращается к БД ни за пользователем, ни за правами.
+    """
+    from app.auth.rbac.principal import Principal, principal_cache
 
     # 1. защита от повреждённого session / атаки / мусора
     try:
@@ -97,10 +123,17 @@ def load_user(user_id):
         )
         return None
 
-    # 2. получаем пользователя
-    user = db.get_user_by_id(user_id_int)
+    # 2. снимок из кэша (сбрасывается при смене ролей и по TTL)
+    principal = principal_cache.get(user_id_int)
+    if principal is not None:
+        return principal
+
+    # 3. получаем пользователя
+    from app.db.crud import OtrazhenieDB
+
+    user = OtrazhenieDB().get_user_by_id(user_id_int)
 
-    # 3. пользователь удалён / не существует
+    # 4. пользователь удалён / не существует
     if not user:
         logger.info(
             "FLASK_LOGIN: пользователь не найден в БД, user_id=%s",
@@ -108,4 +141,6 @@ def load_user(user_id):
         )
         return None
 
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(principal)
+    return principal
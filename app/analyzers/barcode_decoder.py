@@ -0,0 +1,276 @@
+import importlib
+import io
+import logging
+import threading
+from dataclasses import dataclass, field
+from time import perf_counter
+
+import numpy as np
+from decouple import config
+from PIL import Image, UnidentifiedImageError
+
+from app.core.metrics import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+# Поэтапное распознавание штрих-кода на фото с телефона.
+# Снимок 12+ Мп, раскодированный целиком и отданный pyzbar, стоит сотни миллисекунд
+# и десятки МБ на запрос, хотя сам код занимает малую часть кадра. Поэтому:
+# 1. reduced_roi — JPEG раскодируется сразу уменьшенным и в оттенках серого
+#    (IMREAD_REDUCED_GRAYSCALE_2/4/8: libjpeg масштабирует при декодировании),
+#    по градиенту яркости ищутся области, похожие на штрих-код, pyzbar читает только их;
+# 2. reduced_frame — pyzbar по всему уменьшенному кадру (повёрнутый или мелкий код);
+# 3. full_roi, full_frame — то же в полном разрешении: только если уменьшенный кадр
+#    ничего не дал (мелкий или размытый код).
+# Время этапов и то, на каком этапе код найден, — в метриках barcode_decoder.
+
+# длинная сторона уменьшенного кадра — не меньше стольких пикселей
+BARCODE_DECODE_MIN_SIDE = config("BARCODE_DECODE_MIN_SIDE", default=800, cast=int)
+# сколько областей-кандидатов проверять на каждом этапе
+BARCODE_DECODE_MAX_REGIONS = config("BARCODE_DECODE_MAX_REGIONS", default=3, cast=int)
+# изображения больше стольких пикселей не раскодируются (по умолчанию — порог Pillow,
+# ~89 Мп: кадр 20000×20000 в оттенках серого — 400 МБ на один запрос)
+BARCODE_DECODE_MAX_PIXELS = config(
+    "BARCODE_DECODE_MAX_PIXELS", default=Image.MAX_IMAGE_PIXELS, cast=int
+)
+
+# этапы, на которых ищется код, и все замеры времени (с раскодированием кадра)
+STAGES = ("reduced_roi", "reduced_frame", "full_roi", "full_frame")
+TIMINGS = (
+    "decode_reduced",
+    "reduced_roi",
+    "reduced_frame",
+    "decode_full",
+    "full_roi",
+    "full_frame",
+)
+_REDUCED_FLAGS = {
+    2: "IMREAD_REDUCED_GRAYSCALE_2",
+    4: "IMREAD_REDUCED_GRAYSCALE_4",
+    8: "IMREAD_REDUCED_GRAYSCALE_8",
+}
+# оператор Шарра даёт до 16 × 255 на перепад яркости — приводим к 0..255
+_SCHARR_SCALE = 1 / 16
+# область меньше этой доли кадра — не штрих-код, а текстура или текст
+_MIN_REGION_AREA = 0.002
+# поля вокруг найденной области: pyzbar нужна «тихая зона» по бокам кода
+_REGION_MARGIN = 0.15
+
+
+def _dependencies():
+    try:
+        cv2 = importlib.import_module("cv2")
+        pyzbar = importlib.import_module("pyzbar.pyzbar")
+    except ImportError as error:
+        raise RuntimeError(
+            "Для распознавания штрих-кода нужны opencv-python и pyzbar "
+            "(pip install opencv-python pyzbar)"
+        ) from error
+    return cv2, pyzbar
+
+
+class ImageTooLarge(ValueError):
+    """Изображение больше BARCODE_DECODE_MAX_PIXELS — не раскодируется"""
+
+
+@dataclass
+class DecodeResult:
+    value: str | None = None
+    stage: str | None = None  # этап, на котором код найден
+    scale: int = 1  # во сколько раз уменьшался кадр
+    timings: dict[str, float] = field(default_factory=dict)  # этап → секунды
+
+
+def image_size(
+    image_data: bytes, max_pixels: int = BARCODE_DECODE_MAX_PIXELS
+) -> tuple[int, int] | None:
+    """
+    (ширина, высота) по заголовку файла, без раскодирования пикселей;
+    None — заголовок не прочитан. Изображение больше max_pixels — ImageTooLarge.
+    """
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            size = image.size
+    except Image.DecompressionBombError as error:
+        # Pillow отказывается открывать изображения вдвое больше своего порога
+        raise ImageTooLarge(str(error)) from error
+    except (UnidentifiedImageError, OSError):
+        return None
+    except Exception:
+        # повреждённый заголовок может уронить разбор и другими исключениями
+        logger.warning("Не удалось прочитать заголовок изображения", exc_info=True)
+        return None
+    if size[0] * size[1] > max_pixels:
+        raise ImageTooLarge(f"{size[0]}×{size[1]} больше {max_pixels} пикселей")
+    return size
+
+
+def reduce_factor(size: tuple[int, int] | None, min_side: int = BARCODE_DECODE_MIN_SIDE) -> int:
+    """Наибольший множитель 1/2/4/8, при котором длинная сторона не меньше min_side"""
+    if size is None:
+        return 1
+    longest = max(size)
+    factor = 1
+    for candidate in (2, 4, 8):
+        if longest // candidate < min_side:
+            break
+        factor = candidate
+    return factor
+
+
+def find_barcode_regions(cv2, gray, max_regions: int = BARCODE_DECODE_MAX_REGIONS) -> list:
+    """
+    Области кадра, похожие на одномерный штрих-код: сильный градиент по одной оси
+    и слабый по другой. Возвращает прямоугольники (x, y, w, h), крупные — первыми.
+    """
+    height, width = gray.shape[:2]
+    regions = []
+    # коды бывают и горизонтальными, и повёрнутыми на 90°
+    for dx, dy, kernel in ((1, 0, (21, 7)), (0, 1, (7, 21))):
+        along = cv2.convertScaleAbs(
+            cv2.Sobel(gray, cv2.CV_32F, dx, dy, ksize=-1), alpha=_SCHARR_SCALE
+        )
+        across = cv2.convertScaleAbs(
+            cv2.Sobel(gray, cv2.CV_32F, dy, dx, ksize=-1), alpha=_SCHARR_SCALE
+        )
+        # поперёк штрихов яркость скачет, вдоль — почти нет (вычитание с насыщением в 0)
+        gradient = cv2.blur(cv2.subtract(along, across), (9, 9))
+        _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        # штрихи сливаются в один блок, мелкий шум (текст, фактура) стирается
+        mask = cv2.morphologyEx(
+            mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, kernel)
+        )
+        mask = cv2.dilate(cv2.erode(mask, None, iterations=4), None, iterations=4)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area >= _MIN_REGION_AREA * width * height:
+                regions.append((area, cv2.boundingRect(contour)))
+    regions.sort(key=lambda region: region[0], reverse=True)
+    return [_pad(rect, width, height) for _, rect in regions[:max_regions]]
+
+
+def _pad(rect, width: int, height: int) -> tuple[int, int, int, int]:
+    x, y, w, h = rect
+    margin_x, margin_y = int(w * _REGION_MARGIN), int(h * _REGION_MARGIN)
+    left, top = max(0, x - margin_x), max(0, y - margin_y)
+    right, bottom = min(width, x + w + margin_x), min(height, y + h + margin_y)
+    return left, top, right - left, bottom - top
+
+
+def _read(pyzbar, gray) -> str | None:
+    codes = pyzbar.decode(gray)
+    return codes[0].data.decode("utf-8") if codes else None
+
+
+def _read_regions(pyzbar, gray, regions, scale: int = 1) -> str | None:
+    for x, y, w, h in regions:
+        value = _read(pyzbar, gray[y * scale:(y + h) * scale, x * scale:(x + w) * scale])
+        if value:
+            return value
+    return None
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._images = 0
+        self._failures = 0
+        self._found = {stage: 0 for stage in STAGES}
+        self._seconds = {name: 0.0 for name in TIMINGS}
+        self._runs = {name: 0 for name in TIMINGS}
+
+    def record(self, result: DecodeResult) -> None:
+        with self._lock:
+            self._images += 1
+            if result.stage is None:
+                self._failures += 1
+            else:
+                self._found[result.stage] += 1
+            for name, seconds in result.timings.items():
+                self._runs[name] += 1
+                self._seconds[name] += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "images": self._images,
+                "not_found": self._failures,
+                "success_rate": round(1 - self._failures / self._images, 4)
+                if self._images
+                else 0.0,
+                "found_at": dict(self._found),
+                "avg_ms": {
+                    name: round(self._seconds[name] / self._runs[name] * 1000, 3)
+                    for name in TIMINGS
+                    if self._runs[name]
+                },
+            }
+
+
+decoder_stats = _Stats()
+register_metrics_source("barcode_decoder", decoder_stats.stats)
+
+
+def decode(image_data: bytes, min_side: int = BARCODE_DECODE_MIN_SIDE) -> DecodeResult:
+    """
+    Распознаёт штрих-код (или QR-код) на изображении: сначала в уменьшенном кадре,
+    полное разрешение — только если там кода не нашлось.
+    Изображение, которое не удалось раскодировать или которое больше
+    BARCODE_DECODE_MAX_PIXELS, — DecodeResult без value.
+    """
+    cv2, pyzbar = _dependencies()
+    try:
+        size = image_size(image_data, BARCODE_DECODE_MAX_PIXELS)
+    except ImageTooLarge as error:
+        logger.warning("Изображение слишком большое, не раскодируется: %s", error)
+        result = DecodeResult()
+        decoder_stats.record(result)
+        return result
+    buffer = np.frombuffer(image_data, np.uint8)
+    result = DecodeResult(scale=reduce_factor(size, min_side))
+    started = perf_counter()
+
+    def lap(name: str, value=None):
+        nonlocal started
+        now = perf_counter()
+        result.timings[name] = now - started
+        started = now
+        if value and result.value is None:
+            result.value, result.stage = value, name
+
+    flag = (
+        getattr(cv2, _REDUCED_FLAGS[result.scale])
+        if result.scale > 1
+        else cv2.IMREAD_GRAYSCALE
+    )
+    gray = cv2.imdecode(buffer, flag)
+    lap("decode_reduced")
+    if gray is None:
+        logger.warning("Не удалось декодировать изображение")
+        decoder_stats.record(result)
+        return result
+
+    regions = find_barcode_regions(cv2, gray)
+    lap("reduced_roi", _read_regions(pyzbar, gray, regions))
+    if result.value is None:
+        lap("reduced_frame", _read(pyzbar, gray))
+    if result.value is None and result.scale > 1:
+        # мелкий или размытый код: те же области и весь кадр в полном разрешении;
+        # уменьшенный кадр больше не нужен — не держим оба в памяти
+        gray = None
+        full = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        lap("decode_full")
+        if full is not None:
+            lap("full_roi", _read_regions(pyzbar, full, regions, result.scale))
+            if result.value is None:
+                lap("full_frame", _read(pyzbar, full))
+
+    decoder_stats.record(result)
+    logger.debug(
+        "Распознавание штрих-кода: этап=%s, уменьшение=%s, время=%s",
+        result.stage,
+        result.scale,
+        {name: round(seconds * 1000, 1) for name, seconds in result.timings.items()},
+    )
+    return result
@@ -0,0 +1,155 @@
+import re
+from itertools import chain
+from typing import Iterator
+
+# Разбор строки состава на ингредиенты за один проход.
+#
+# Наивный composition.split(",") ломается на реальных этикетках:
+# - «Parfum (Fragrance, Limonene)» — запятые внутри скобок не разделяют ингредиенты;
+# - «1,2-Hexanediol», «0,5%» — запятая между цифрами часть названия/числа;
+# - «May contain: CI 77491», «[+/- CI 77491, CI 77492]» — секция «может содержать»,
+#   её ингредиенты нужно разобрать так же, как основные;
+# - списки через «;», «•» или с переводами строк, заголовок «Ingredients:».
+#
+# Строка просматривается regex-ом только по «значимым» символам, токены отдаются
+# генератором как срезы исходной строки — каждый символ копируется не больше одного раза.
+
+_MARKER = r"\+\s*/\s*-|±|\bmay\s+contain\b|\bможет\s+содержать\b|\bpeut\s+contenir\b"
+_MARKER_RE = re.compile(r"\s*(?:" + _MARKER + r")\s*:?", re.IGNORECASE)
+# Один класс символов без альтернатив и именованных групп: так re пропускает обычный
+# текст быстрым поиском по множеству символов. Словесные маркеры ищутся отдельным
+# проходом, «+» и «±» проверяются на месте.
+_SPECIAL_RE = re.compile(r"[(\[{)\]},;•·:\n\r+±]")
+_WORD_MARKER_RE = re.compile(
+    r"\b(?:may\s+contain|может\s+содержать|peut\s+contenir)\b", re.IGNORECASE
+)
+_OPENERS = frozenset("([{")
+_CLOSERS = frozenset(")]}")
+_SEPARATORS = frozenset(",;•·:\n\r")
+# заголовки перед списком: «Ingredients:», «Состав:», «INCI:»
+_HEADERS = frozenset(
+    {"ingredients", "ingrédients", "ingredienti", "inci", "composition", "состав", "ингредиенты"}
+)
+# края токена, которые не несут смысла: пробелы и финальная точка списка
+_EDGE = " \t\r\n."
+# скобка, не закрытая за столько символов, считается опечаткой, а не группой
+MAX_GROUP_LENGTH = 120
+
+_GROUP = 0
+_SECTION = 1
+
+
+def _trimmed(text: str, start: int, end: int) -> str | None:
+    """Срез text[start:end] без краевых пробелов/точек; None если пусто"""
+    while start < end and text[start] in _EDGE:
+        start += 1
+    while end > start and text[end - 1] in _EDGE:
+        end -= 1
+    return text[start:end] if start < end else None
+
+
+def iter_ingredients(composition: str) -> Iterator[str]:
+    """
+    Лениво отдаёт ингредиенты из строки состава (в исходном написании, без краевых
+    пробелов). Никогда не падает: на пустой строке ничего не отдаёт.
+    """
+    if not composition:
+        return
+    text = composition
+    length = len(text)
+    start = 0  # начало текущего токена
+    stack: list[int] = []  # открытые скобки: _GROUP или _SECTION
+    depth = 0  # сколько скобок-групп открыто
+    group_start = 0  # позиция самой внешней открытой скобки-группы
+    first = True
+    words = _WORD_MARKER_RE.finditer(text)
+    word = next(words, None)
+
+    # None в конце — чтобы обработать словесные маркеры после последнего спецсимвола
+    for match in chain(_SPECIAL_RE.finditer(text), (None,)):
+        position = match.start() if match is not None else length
+
+        # «may contain» / «может содержать» вне скобок
+        while word is not None and word.start() < position:
+            marker_at = word.start()
+            word = next(words, None)
+            if marker_at < start or depth:
+                continue
+            token = _trimmed(text, start, marker_at)
+            start = _MARKER_RE.match(text, marker_at).end()
+            if token is not None:
+                first = False
+                yield token
+
+        if match is None:
+            break
+        if position < start:
+            # внутри уже пропущенного маркера секции
+            continue
+        char = text[position]
+
+        if char in _SEPARATORS:
+            if depth:
+                if position - group_start <= MAX_GROUP_LENGTH:
+                    continue
+                # незакрытая скобка — перестаём считать её группой
+                stack.clear()
+                depth = 0
+            if (
+                char == ","
+                and 0 < position < length - 1
+                and text[position - 1].isdigit()
+                and text[position + 1].isdigit()
+            ):
+                continue  # 1,2-Hexanediol / 0,5%
+            token = _trimmed(text, start, position)
+            start = position + 1
+            if token is None:
+                continue
+            if first and char == ":" and token.casefold() in _HEADERS:
+                first = False
+                continue
+            first = False
+            yield token
+
+        elif char in _OPENERS:
+            marker = None if depth else _MARKER_RE.match(text, position + 1)
+            if marker:
+                # «[+/- CI 77491, ...]» / «(may contain: ...)» — начало секции
+                token = _trimmed(text, start, position)
+                if token is not None:
+                    first = False
+                    yield token
+                stack.append(_SECTION)
+                start = marker.end()
+            else:
+                if not depth:
+                    group_start = position
+                stack.append(_GROUP)
+                depth += 1
+
+        elif char in _CLOSERS:
+            kind = stack.pop() if stack else _SECTION
+            if kind == _GROUP:
+                depth -= 1
+            else:
+                # конец секции; лишняя закрывающая скобка тоже разделяет
+                token = _trimmed(text, start, position)
+                start = position + 1
+                if token is not None:
+                    first = False
+                    yield token
+
+        elif not depth:  # «+/-» или «±» вне скобок
+            marker = _MARKER_RE.match(text, position)
+            if marker is None:
+                continue  # одиночный «+» — часть названия
+            token = _trimmed(text, start, position)
+            start = marker.end()
+            if token is not None:
+                first = False
+                yield token
+
+    token = _trimmed(text, start, length)
+    if token is not None:
+        yield token
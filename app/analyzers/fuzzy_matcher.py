@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+# Нечёткий поиск ингредиентов для опечаток и шумов OCR («glycerine», «phenoxyethanl»).
+#
+# Два этапа:
+# 1. отбор кандидатов по инвертированному индексу символьных триграмм. Одна правка
+#    портит не больше трёх триграмм, поэтому у ключа на расстоянии ≤ d обязательно есть
+#    хотя бы одна из 3d + 1 самых редких триграмм запроса (принцип Дирихле). Читаются
+#    только эти короткие списки, подсчёт совпадений — векторно (numpy.bincount);
+# 2. точная проверка лучших кандидатов расстоянием Дамерау-Левенштейна (OSA) с отсечкой.
+# Допустимое число правок наращивается по одной: типичная опечатка находится уже
+# на первом шаге, а длинные частые списки триграмм не читаются вовсе.
+
+DEFAULT_MIN_CONFIDENCE = 0.75
+# короткие токены («ci», «aha») дают слишком много ложных совпадений
+MIN_QUERY_LENGTH = 4
+# больше правок — это уже другое слово, а не опечатка
+MAX_EDITS = 3
+CANDIDATES = 8
+
+
+@dataclass(frozen=True)
+class FuzzyMatch:
+    key: str  # найденный ключ индекса
+    confidence: float  # 1 - расстояние / длина большей строки, от 0 до 1
+    distance: int
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _pattern_masks(pattern: str) -> dict[str, int]:
+    """Битовые маски позиций каждого символа шаблона (для bit-parallel алгоритма)"""
+    masks: dict[str, int] = {}
+    for position, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return masks
+
+
+def _osa_distance(masks: dict[str, int], length: int, text: str) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (OSA) между шаблоном и text.
+    Bit-parallel алгоритм Хюрё (Hyyrö, 2003): столбец матрицы DP хранится в двух
+    битовых векторах, на символ text — десяток операций над int вместо length ячеек.
+    """
+    if not length:
+        return len(text)
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+    vp, vn, d0, previous_mask = full, 0, 0, 0
+    score = length
+    for char in text:
+        mask = masks.get(char, 0)
+        transposition = (((~d0) & mask) << 1) & previous_mask
+        d0 = ((((mask & vp) + vp) ^ vp) | mask | vn | transposition) & full
+        hp = (vn | ~(d0 | vp)) & full
+        hn = d0 & vp
+        if hp & high:
+            score += 1
+        elif hn & high:
+            score -= 1
+        shifted = ((hp << 1) | 1) & full
+        vn = shifted & d0
+        vp = ((hn << 1) | ~(shifted | d0)) & full
+        previous_mask = mask
+    return score
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (вариант OSA: перестановка соседних символов = 1).
+    Если расстояние заведомо больше max_distance — возвращает max_distance + 1.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    distance = _osa_distance(_pattern_masks(a), len(a), b)
+    return distance if distance <= max_distance else max_distance + 1
+
+
+class FuzzyMatcher:
+    """
+    Индекс для нечёткого поиска по набору ключей (нормализованных названий ингредиентов).
+    Неизменяемый: при изменении набора ключей строится новый экземпляр.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self._keys: list[str] = []
+        postings: dict[str, list[int]] = {}
+        for key in keys:
+            if len(key) < MIN_QUERY_LENGTH:
+                continue
+            key_id = len(self._keys)
+            self._keys.append(key)
+            for gram in _trigrams(key):
+                postings.setdefault(gram, []).append(key_id)
+        self._postings = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+        self._key_ids = {key: key_id for key_id, key in enumerate(self._keys)}
+        self._lengths = np.asarray([len(key) for key in self._keys], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def match(
+        self, query: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE
+    ) -> FuzzyMatch | None:
+        """Лучший ключ для запроса с уверенностью не ниже min_confidence или None"""
+        if len(query) < MIN_QUERY_LENGTH or not self._keys:
+            return None
+
+        # триграммы запроса от редких к частым
+        postings = sorted(
+            (self._postings[g] for g in _trigrams(query) if g in self._postings), key=len
+        )
+        if not postings:
+            return None
+        max_edits = min(MAX_EDITS, int(len(query) * (1 - min_confidence)))
+        masks = _pattern_masks(query)
+
+        if query in self._key_ids:
+            return FuzzyMatch(key=query, confidence=1.0, distance=0)
+
+        for edits in range(1, max_edits + 1):
+            rare = postings[: 3 * edits + 1]
+            # списки редких триграмм короткие: сортировка дешевле bincount по всем ключам
+            candidate_ids, shared = np.unique(np.concatenate(rare), return_counts=True)
+            # ключ, отличающийся по длине больше чем на edits, не подходит
+            fits = np.abs(self._lengths[candidate_ids] - len(query)) <= edits
+            candidate_ids, shared = candidate_ids[fits], shared[fits]
+            if len(candidate_ids) > CANDIDATES:
+                top = np.argpartition(shared, -CANDIDATES)[-CANDIDATES:]
+                candidate_ids, shared = candidate_ids[top], shared[top]
+            # больше общих триграмм — вероятнее совпадение, проверяем таких первыми
+            candidate_ids = candidate_ids[np.argsort(-shared, kind="stable")]
+
+            best = None
+            for key_id in candidate_ids:
+                limit = edits if best is None else best.distance - 1
+                if limit < 1:
+                    break
+                key = self._keys[key_id]
+                distance = _osa_distance(masks, len(query), key)
+                if distance > limit:
+                    continue
+                longest = max(len(query), len(key))
+                confidence = 1 - distance / longest
+                if confidence < min_confidence:
+                    continue
+                best = FuzzyMatch(
+                    key=key, confidence=round(confidence, 3), distance=distance
+                )
+            if best is not None:
+                return best
+        return None
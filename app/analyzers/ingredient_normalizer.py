@@ -0,0 +1,55 @@
+import re
+import unicodedata
+
+# Нормализация названий ингредиентов в ключ для поиска.
+# Один и тот же ключ строится и для названий/синонимов в БД, и для токенов состава,
+# поэтому «Aqua», « AQUA*», «aqua.» и «Аква» (синоним) сходятся в одну запись индекса.
+
+# разные виды тире и дефисов → обычный дефис
+_DASHES = dict.fromkeys(map(ord, "‐‑‒–—―−"), "-")
+# маркеры сносок и органики на концах: «Aloe Vera*», «Parfum**», «Limonene†»
+_EDGE_MARKERS = " \t\r\n*†‡º°.:;,"
+_SPACES = re.compile(r"\s+")
+_SLASH = re.compile(r"\s*/\s*")
+
+
+def normalize_ingredient_key(name: str) -> str:
+    """
+    Строит ключ для поиска ингредиента:
+    - NFKC (полноширинные символы, лигатуры) и casefold;
+    - ё → е, подчёркивания и тире → пробел/дефис;
+    - схлопывание пробелов, пробелы вокруг «/» убираются;
+    - снятие маркеров сносок (*, †, точки) по краям.
+    """
+    if not name:
+        return ""
+    key = unicodedata.normalize("NFKC", name).casefold()
+    key = key.translate(_DASHES).replace("ё", "е").replace("_", " ")
+    key = _SPACES.sub(" ", key).strip(_EDGE_MARKERS)
+    return _SLASH.sub("/", key)
+
+
+def split_slash_forms(key: str) -> list[str]:
+    """
+    «aqua/water/eau» → ["aqua", "water", "eau"].
+    Вызывается только если ключ целиком не найден: у части ингредиентов косая черта —
+    часть настоящего названия (Caprylic/Capric Triglyceride).
+    """
+    if "/" not in key:
+        return []
+    return [part for part in key.split("/") if part]
+
+
+def split_parenthetical(key: str) -> list[str]:
+    """
+    «parfum (fragrance)» → ["parfum", "fragrance"];
+    «ci 77491 (iron oxides)» → ["ci 77491", "iron oxides"].
+    Вызывается только если ключ целиком не найден.
+    """
+    opening = key.find("(")
+    if opening < 0:
+        return []
+    closing = key.find(")", opening)
+    head = key[:opening].strip()
+    inner = key[opening + 1:closing if closing > 0 else len(key)].strip()
+    return [part for part in (head, inner) if part]
@@ -1,9 +1,23 @@
-import requests
 from PIL import Image
 import logging
 import importlib
+from app.exceptions.upstream import (
+    BulkheadFullError,
+    CircuitOpenError,
+    UpstreamError,
+    UpstreamTimeout,
+)
 from app.schemas.product_dto import ProductDTO
+from app.schemas.product_mapper import product_from_openbeautyfacts
 from app.schemas.products_schema import OpenBeautyFactsResponse
+from app.services.openbeautyfacts_async_client import (
+    AsyncOpenBeautyFactsClient,
+    fetch_product_guarded_async,
+)
+from app.services.openbeautyfacts_client import (
+    OpenBeautyFactsClient,
+    fetch_product_guarded,
+)
 from pydantic import ValidationError
 
 logger = logging.getLogger(__name__)
@@ -120,58 +134,53 @@ def scan_barcode():
     logger.info("Камера закрыта")
 
 
-def get_cosmetic_info(barcode: str) -> ProductDTO | None:
-    """Получает информацию о продукте по штрих-коду"""
-    try:
-        logger.info("Запрос API OpenBeautyFacts: %s", barcode)
+def fetch_cosmetic_info(
+    barcode: str, timeout: float = None, client: OpenBeautyFactsClient = None
+) -> ProductDTO | None:
+    """
+    Запрашивает продукт в OpenBeautyFacts через клиент процесса (пул соединений),
+    предохранитель и bulkhead. None — продукта нет в базе OpenBeautyFacts; сбои —
+    исключения UpstreamError (retryable для таймаутов, 5xx и 429), чтобы вызывающий
+    решал, повторять ли; CircuitOpenError — API сейчас не опрашивается.
+    """
+    logger.info("Запрос API OpenBeautyFacts: %s", barcode)
+    data = fetch_product_guarded(barcode, timeout=timeout, client=client)
 
-        response = requests.get(
-            f"https://world.openbeautyfacts.org/api/v0/product/{barcode}.json",
-            timeout=5,  # если API не ответил за 5 секунд — считаем, что он умер
-        )
+    if data and data.status == 1 and data.product:
+        logger.info("Продукт успешно получен: %s", barcode)
+        return product_from_openbeautyfacts(barcode, data.product)
 
-        logger.debug("Ответ API получен: %s", response.status_code)
+    logger.warning("Продукт не найден: %s", barcode)
+    return None
 
-        try:
-            data = parse_api_response(response.json())
-        except Exception:
-            logger.exception(
-                "Ошбика JSON парсинга OpenBeautyFacts: barcode=%s status=%s",
-                barcode,
-                response.status_code,
-            )
-            return None
-
-        if not data:
-            logger.warning("После анализа ответа API остается пустым: barcode=%s", barcode)
-            return None
-
-        if data.status == 1:
-            product = data.product
-            validate_product = {
-                "barcode": barcode,
-                "name": product.product_name or "Неизвестно",
-                "brand": product.brands or "",
-                "category": product.categories or "",
-                "ingredients": product.ingredients_text_en or "",
-                "image_url": product.image_front_url,
-                "additional_info": {
-                    "Упаковка": product.packaging or "",
-                    "Вес": product.quantity or "",
-                    "Страна": product.countries or "",
-                },
-            }
-
-            logger.info("Продукт успешно получен: %s", barcode)
-            return ProductDTO.model_validate(validate_product)
-
-        logger.warning("Продукт не найден: %s", barcode)
-        return None
 
-    except requests.Timeout:
+async def fetch_cosmetic_info_async(
+    barcode: str, timeout: float = None, client: AsyncOpenBeautyFactsClient = None
+) -> ProductDTO | None:
+    """Асинхронный вариант fetch_cosmetic_info (aiohttp, event loop не блокируется)"""
+    logger.info("Запрос API OpenBeautyFacts (async): %s", barcode)
+    data = await fetch_product_guarded_async(barcode, timeout=timeout, client=client)
+
+    if data and data.status == 1 and data.product:
+        logger.info("Продукт успешно получен: %s", barcode)
+        return product_from_openbeautyfacts(barcode, data.product)
+
+    logger.warning("Продукт не найден: %s", barcode)
+    return None
+
+
+def get_cosmetic_info(barcode: str) -> ProductDTO | None:
+    """Получает информацию о продукте по штрих-коду (любой сбой — None, для скриптов)"""
+    try:
+        return fetch_cosmetic_info(barcode)
+
+    except UpstreamTimeout:
         logger.warning("Таймаут OpenBeautyFacts: штрих-код=%s", barcode)
 
-    except requests.RequestException:
+    except (CircuitOpenError, BulkheadFullError) as error:
+        logger.warning("OpenBeautyFacts не опрашивается (%s): штрих-код=%s", error, barcode)
+
+    except UpstreamError:
         logger.exception("Ошибка запроса OpenBeautyFacts: штрих-код=%s", barcode)
 
     except Exception:
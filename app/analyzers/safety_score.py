@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+# Общая оценка безопасности продукта по оценкам его ингредиентов.
+#
+# Шкала та же, что у ингредиентов: 1 — безопасно, 10 — вредно.
+# - INCI перечисляет ингредиенты по убыванию концентрации, поэтому вклад ингредиента
+#   убывает с позицией в списке: вес 1 / (1 + POSITION_DECAY * позиция);
+# - ингредиенты без оценки считаются «средними» (UNKNOWN_SCORE) с половинным весом:
+#   много неизвестных тянет оценку к середине шкалы, а не улучшает её;
+# - каждый рискованный ингредиент (≥ RISK_THRESHOLD) добавляет RISK_PENALTY:
+#   один консервант-аллерген в конце списка не должен растворяться в среднем.
+
+POSITION_DECAY = 0.15
+UNKNOWN_SCORE = 5.0
+UNKNOWN_WEIGHT = 0.5
+RISK_THRESHOLD = 7.0
+RISK_PENALTY = 0.5
+# пороги уровней — те же, что у бейджей ингредиентов на странице результатов
+SAFE_MAX = 3.0
+MODERATE_MAX = 6.0
+MIN_SCORE = 1.0
+MAX_SCORE = 10.0
+
+
+@dataclass(frozen=True)
+class ProductScore:
+    score: float | None  # None — ни у одного ингредиента нет оценки
+    level: str  # safe / moderate / risk / unknown
+    safe_count: int
+    moderate_count: int
+    risk_count: int
+    unknown_count: int
+
+    def to_dict(self):
+        return {
+            "score": self.score,
+            "level": self.level,
+            "safe_count": self.safe_count,
+            "moderate_count": self.moderate_count,
+            "risk_count": self.risk_count,
+            "unknown_count": self.unknown_count,
+        }
+
+
+def score_level(score: float | None) -> str:
+    """Уровень риска для оценки: safe / moderate / risk / unknown"""
+    if score is None:
+        return "unknown"
+    if score <= SAFE_MAX:
+        return "safe"
+    if score <= MODERATE_MAX:
+        return "moderate"
+    return "risk"
+
+
+def _as_score(value) -> float | None:
+    """Оценка ингредиента или None («?», пусто, мусор из CSV)"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compute_product_score(scores: Iterable) -> ProductScore:
+    """
+    Оценка продукта по оценкам ингредиентов в порядке их следования в составе.
+    Элемент без оценки (None, «?») — неизвестный ингредиент.
+    """
+    weighted_sum = 0.0
+    total_weight = 0.0
+    counts = {"safe": 0, "moderate": 0, "risk": 0, "unknown": 0}
+    has_known = False
+
+    for position, value in enumerate(scores):
+        weight = 1 / (1 + POSITION_DECAY * position)
+        score = _as_score(value)
+        if score is None:
+            counts["unknown"] += 1
+            weighted_sum += UNKNOWN_SCORE * weight * UNKNOWN_WEIGHT
+            total_weight += weight * UNKNOWN_WEIGHT
+            continue
+        has_known = True
+        counts[score_level(score)] += 1
+        weighted_sum += score * weight
+        total_weight += weight
+
+    product_score = None
+    if has_known:
+        product_score = weighted_sum / total_weight + RISK_PENALTY * counts["risk"]
+        product_score = round(min(MAX_SCORE, max(MIN_SCORE, product_score)), 1)
+
+    return ProductScore(
+        score=product_score,
+        level=score_level(product_score),
+        safe_count=counts["safe"],
+        moderate_count=counts["moderate"],
+        risk_count=counts["risk"],
+        unknown_count=counts["unknown"],
+    )
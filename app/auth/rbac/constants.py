@@ -6,6 +6,8 @@ PERMISSIONS = {
     "ingredients:delete": "Удаление ингредиентов",
 
     "admin:panel": "Доступ в админку",
+
+    "products:batch": "Пакетный поиск продуктов по штрих-кодам",
 }
 
 
@@ -0,0 +1,87 @@
+import logging
+import threading
+from typing import Iterable
+
+from app.auth.rbac.constants import PERMISSIONS
+
+logger = logging.getLogger(__name__)
+
+# Матрица роль → права, скомпилированная в битовые маски.
+# Каждое право — один бит, каждая роль — OR битов своих прав. Набор прав пользователя —
+# OR масок его ролей (считается один раз, при построении Principal), проверка права —
+# одно побитовое AND вместо обхода User.roles → Role.permissions.
+# Источник — таблицы roles / role_permissions (их заполняет RBACSeeder по constants.py).
+
+
+class PermissionMatrix:
+    """Неизменяемая таблица: id роли → маска прав, имя права → бит"""
+
+    def __init__(self, role_permissions: Iterable[tuple[int, str | None]]):
+        """
+        :param role_permissions: пары (role_id, permission_name);
+            permission_name=None — роль без прав
+        """
+        rows = list(role_permissions)
+        names = list(PERMISSIONS)
+        # права из БД, которых нет в constants.py, — в конец, биты известных не сдвигаются
+        names += sorted({p for _, p in rows if p and p not in PERMISSIONS})
+        self._bits = {name: 1 << index for index, name in enumerate(names)}
+        self._names = tuple(names)
+        self._role_masks: dict[int, int] = {}
+        for role_id, permission_name in rows:
+            self._role_masks[role_id] = self._role_masks.get(role_id, 0) | self._bits.get(
+                permission_name, 0
+            )
+
+    def __len__(self) -> int:
+        return len(self._role_masks)
+
+    def bit(self, permission_name: str) -> int:
+        """Бит права (0 — неизвестное право, не разрешено никому)"""
+        return self._bits.get(permission_name, 0)
+
+    def mask_for_roles(self, role_ids: Iterable[int]) -> int:
+        mask = 0
+        for role_id in role_ids:
+            mask |= self._role_masks.get(role_id, 0)
+        return mask
+
+    def allows(self, mask: int, permission_name: str) -> bool:
+        return bool(mask & self._bits.get(permission_name, 0))
+
+    def permission_names(self, mask: int) -> frozenset[str]:
+        return frozenset(name for name in self._names if mask & self._bits[name])
+
+
+_matrix: PermissionMatrix | None = None
+_lock = threading.Lock()
+
+
+def compile_permission_matrix() -> PermissionMatrix:
+    """Строит матрицу по таблицам ролей и прав (один запрос) и делает её текущей"""
+    global _matrix
+    from app.db.crud import OtrazhenieDB
+
+    matrix = PermissionMatrix(OtrazhenieDB().select_role_permissions())
+    _matrix = matrix
+    logger.info("Матрица прав скомпилирована: ролей=%s", len(matrix))
+    return matrix
+
+
+def get_permission_matrix() -> PermissionMatrix:
+    """Текущая матрица; если её ещё нет (или сброшена) — компилируется"""
+    matrix = _matrix
+    if matrix is None:
+        with _lock:
+            matrix = _matrix or compile_permission_matrix()
+    return matrix
+
+
+def invalidate_permission_matrix() -> None:
+    """Сбрасывает матрицу и кэш principal (в нём маски, посчитанные по старой матрице)"""
+    global _matrix
+    from app.auth.rbac.principal import principal_cache
+
+    _matrix = None
+    principal_cache.clear()
+    logger.info("Матрица прав сброшена")
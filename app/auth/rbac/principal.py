@@ -0,0 +1,124 @@
+import logging
+import threading
+from dataclasses import dataclass
+
+from cachetools import TTLCache
+from decouple import config
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from app.auth.rbac.matrix import get_permission_matrix
+from app.core.metrics import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд principal живёт в кэше процесса. В своём процессе роли сбрасываются
+# сразу (RBACService), в других воркерах изменение видно не позже чем через TTL.
+PRINCIPAL_CACHE_TTL_SECONDS = config("PRINCIPAL_CACHE_TTL_SECONDS", default=60, cast=float)
+PRINCIPAL_CACHE_SIZE = config("PRINCIPAL_CACHE_SIZE", default=10000, cast=int)
+
+
+@dataclass(frozen=True, eq=False)
+class Principal(UserMixin):
+    """
+    Неизменяемый снимок пользователя для current_user: id, активность, роли и маска прав.
+    Маска считается по id ролей через матрицу прав, проверка права — побитовое AND.
+    """
+
+    id: int
+    username: str
+    email: str
+    active: bool
+    roles: frozenset[str]
+    role_ids: frozenset[int]
+    permission_mask: int
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        """Снимок из ORM-пользователя с загруженными ролями"""
+        role_ids = frozenset(role.id for role in user.roles)
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            active=bool(user.is_active),
+            roles=frozenset(role.name for role in user.roles),
+            role_ids=role_ids,
+            permission_mask=get_permission_matrix().mask_for_roles(role_ids),
+        )
+
+    @property
+    def is_active(self) -> bool:
+        return self.active
+
+    @property
+    def permissions(self) -> frozenset[str]:
+        return get_permission_matrix().permission_names(self.permission_mask)
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.roles
+
+    def has_permission(self, permission_name: str) -> bool:
+        return bool(self.permission_mask & get_permission_matrix().bit(permission_name))
+
+
+class PrincipalCache:
+    """Кэш principal по id пользователя (TTL + явный сброс при смене ролей)"""
+
+    def __init__(
+        self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS
+    ):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # cachetools не потокобезопасен
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, user_id: int) -> Principal | None:
+        with self._lock:
+            principal = self._cache.get(user_id)
+            if principal is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return principal
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            self._cache[principal.id] = principal
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._cache.pop(user_id, None)
+        logger.info("Кэш прав пользователя сброшен: user_id=%s", user_id)
+
+    def invalidate_after_commit(self, session, user_id: int) -> None:
+        """
+        Сброс сейчас и ещё раз после коммита сессии: иначе параллельный запрос
+        успеет закэшировать старые роли до того, как изменение станет видно в БД.
+        """
+        self.invalidate(user_id)
+        event.listen(
+            session, "after_commit", lambda _session: self.invalidate(user_id), once=True
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
+
+
+principal_cache = PrincipalCache()
+register_metrics_source("principal_cache", principal_cache.stats)
@@ -1,6 +1,7 @@
 from app.db.crud import OtrazhenieDB
 from app.db.models import Role, Permission
 from app.auth.rbac.constants import ROLES, PERMISSIONS
+from app.auth.rbac.matrix import invalidate_permission_matrix
 
 
 class RBACSeeder:
@@ -23,6 +24,9 @@ class RBACSeeder:
 
             session.commit()
 
+        # связи ролей и прав могли измениться — матрица пересоберётся при следующей проверке
+        invalidate_permission_matrix()
+
     def _create_permissions(self, session):
         """
         Создает все permissions.
@@ -1,3 +1,6 @@
+from sqlalchemy.orm import object_session
+
+from app.auth.rbac.principal import principal_cache
 from app.db.models import User, Role
 
 
@@ -22,6 +25,7 @@ class RBACService:
 
         if role not in user.roles:
             user.roles.append(role)
+            principal_cache.invalidate_after_commit(session, user.id)
 
     @staticmethod
     def remove_role(
@@ -33,6 +37,11 @@ class RBACService:
             for role in user.roles
             if role.name != role_name
         ]
+        session = object_session(user)
+        if session is not None:
+            principal_cache.invalidate_after_commit(session, user.id)
+        else:
+            principal_cache.invalidate(user.id)
 
 if __name__ == "__main__":
     user = RBACService.assign_role(session='', user='', role_name='')
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, TypeVar
+
+from app.exceptions.upstream import BulkheadFullError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Bulkhead:
+    """
+    Ограничение одновременных вызовов зависимости (bulkhead).
+    Не больше max_concurrent вызовов сразу; следующий ждёт слот не дольше max_wait
+    секунд и получает BulkheadFullError — медленный сервис занимает только свои слоты,
+    а не все потоки воркера.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0.0):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._peak = 0
+        self._calls = 0
+        self._rejected = 0
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self.max_wait > 0:
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            logger.warning("Bulkhead %s: все %s слотов заняты", self.name, self.max_concurrent)
+            raise BulkheadFullError(f"{self.name}: все слоты заняты")
+        with self._lock:
+            self._active += 1
+            self._calls += 1
+            self._peak = max(self._peak, self._active)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self._active,
+                "peak": self._peak,
+                "calls": self._calls,
+                "rejected": self._rejected,
+            }
+
+
+class AsyncBulkhead:
+    """
+    Bulkhead для asyncio: то же ограничение для корутин одного event loop.
+    Семафор asyncio привязывается к loop при первом ожидании — экземпляр на loop.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0.0):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._active = 0
+        self._peak = 0
+        self._calls = 0
+        self._rejected = 0
+
+    async def _acquire(self) -> bool:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+        if self.max_wait <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        if not await self._acquire():
+            self._rejected += 1
+            logger.warning("Bulkhead %s: все %s слотов заняты", self.name, self.max_concurrent)
+            raise BulkheadFullError(f"{self.name}: все слоты заняты")
+        # счётчики меняются только в потоке event loop — блокировка не нужна
+        self._active += 1
+        self._calls += 1
+        self._peak = max(self._peak, self._active)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self._active,
+            "peak": self._peak,
+            "calls": self._calls,
+            "rejected": self._rejected,
+        }
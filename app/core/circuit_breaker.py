@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from app.core.retry import is_retryable
+from app.exceptions.upstream import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# прерывание вызова (отмена задачи, закрытие генератора, Ctrl+C) ничего не говорит
+# о здоровье сервиса — такой вызов не учитывается, как ignore
+_INTERRUPTS = (asyncio.CancelledError, GeneratorExit, KeyboardInterrupt)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель внешней зависимости (closed → open → half_open → closed/open).
+
+    - closed: вызовы идут, исходы последних window_size вызовов копятся в окне;
+      когда их не меньше min_calls и доля сбоев ≥ failure_rate_threshold или доля
+      медленных (дольше slow_call_seconds) ≥ slow_call_rate_threshold — размыкается;
+    - open: вызовы сразу отклоняются CircuitOpenError, open_seconds секунд;
+    - half_open: пропускается half_open_calls пробных вызовов; если их доли сбоев
+      и медленных ниже порогов — замыкается, иначе снова размыкается
+      (сбой пробного вызова размыкает сразу, не дожидаясь остальных).
+
+    Сбой — исключение, для которого is_failure(error) истинно (по умолчанию таймауты,
+    5xx, 429 — то же, что повторяет RetryPolicy): 404 и 4xx говорят о запросе,
+    а не о здоровье сервиса. Исключения, для которых ignore(error) истинно,
+    не учитываются вовсе (например, отказ bulkhead — запрос не был отправлен),
+    как и прерванные вызовы (отмена задачи asyncio).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3,
+        is_failure: Callable[[BaseException], bool] = is_retryable,
+        ignore: Callable[[BaseException], bool] = lambda error: False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self.is_failure = is_failure
+        self.ignore = ignore
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (сбой, медленный) последних вызовов
+        self._window: deque[tuple[bool, bool]] = deque(maxlen=max(window_size, self.min_calls))
+        self._trials: list[tuple[bool, bool]] = []
+        self._trials_in_flight = 0
+        self._state = CLOSED
+        self._changed_at = clock()
+        self._transitions: dict[str, int] = {}
+        self._calls = 0
+        self._failures = 0
+        self._slow_calls = 0
+        self._rejected = 0
+
+    # --- состояние (вызывать под self._lock) ---
+
+    def _transition(self, state: str) -> None:
+        key = f"{self._state}_to_{state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        log = logger.warning if state == OPEN else logger.info
+        log("Предохранитель %s: %s → %s", self.name, self._state, state)
+        self._state = state
+        self._changed_at = self.clock()
+        self._window.clear()
+        self._trials.clear()
+        self._trials_in_flight = 0
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() - self._changed_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _tripped(self, outcomes) -> bool:
+        total = len(outcomes)
+        failures = sum(1 for failed, _ in outcomes if failed)
+        slow = sum(1 for _, is_slow in outcomes if is_slow)
+        return (
+            failures / total >= self.failure_rate_threshold
+            or slow / total >= self.slow_call_rate_threshold
+        )
+
+    # --- вызов ---
+
+    def _acquire(self) -> bool:
+        """Разрешение на вызов: True — пробный вызов в half_open"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and (
+                self._trials_in_flight + len(self._trials) < self.half_open_calls
+            ):
+                self._trials_in_flight += 1
+                return True
+            self._rejected += 1
+            retry_after = max(0.0, self.open_seconds - (self.clock() - self._changed_at))
+        raise CircuitOpenError(
+            f"{self.name}: предохранитель разомкнут", retry_after=retry_after
+        )
+
+    def _record(self, trial: bool, failed: bool | None, duration: float) -> None:
+        """failed=None — вызов не учитывается (ignore)"""
+        with self._lock:
+            if trial:
+                if self._state != HALF_OPEN:
+                    # состояние сменилось, пока шёл пробный вызов
+                    return
+                self._trials_in_flight -= 1
+            if failed is None:
+                return
+            slow = duration >= self.slow_call_seconds
+            self._calls += 1
+            self._failures += failed
+            self._slow_calls += slow
+            if trial:
+                self._trials.append((failed, slow))
+                if failed or (
+                    len(self._trials) >= self.half_open_calls and self._tripped(self._trials)
+                ):
+                    self._transition(OPEN)
+                elif len(self._trials) >= self.half_open_calls:
+                    self._transition(CLOSED)
+            elif self._state == CLOSED:
+                self._window.append((failed, slow))
+                if len(self._window) >= self.min_calls and self._tripped(self._window):
+                    self._transition(OPEN)
+
+    def _failed(self, error: BaseException) -> bool | None:
+        """Исход вызова, завершившегося исключением: None — не учитывается"""
+        if isinstance(error, _INTERRUPTS) or self.ignore(error):
+            return None
+        return self.is_failure(error)
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """fn(*args, **kwargs) через предохранитель; разомкнут — CircuitOpenError"""
+        trial = self._acquire()
+        started = self.clock()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as error:
+            self._record(trial, self._failed(error), self.clock() - started)
+            raise
+        self._record(trial, False, self.clock() - started)
+        return result
+
+    async def call_async(self, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """Асинхронный вариант call: fn — корутинная функция; состояние общее с call"""
+        trial = self._acquire()
+        started = self.clock()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as error:
+            self._record(trial, self._failed(error), self.clock() - started)
+            raise
+        self._record(trial, False, self.clock() - started)
+        return result
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def reset(self) -> None:
+        """Замыкает предохранитель и очищает окно (тесты, ручное восстановление)"""
+        with self._lock:
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+            self._window.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            window = len(self._window)
+            return {
+                "state": state,
+                "state_seconds": round(self.clock() - self._changed_at, 3),
+                "window_calls": window,
+                "window_failure_rate": round(
+                    sum(1 for failed, _ in self._window if failed) / window, 4
+                )
+                if window
+                else 0.0,
+                "window_slow_rate": round(
+                    sum(1 for _, slow in self._window if slow) / window, 4
+                )
+                if window
+                else 0.0,
+                "calls": self._calls,
+                "failures": self._failures,
+                "slow_calls": self._slow_calls,
+                "rejected": self._rejected,
+                "transitions": dict(self._transitions),
+            }
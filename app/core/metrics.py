@@ -0,0 +1,26 @@
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Реестр источников метрик процесса: имя → функция, возвращающая dict со счётчиками.
+# Компоненты (кэши, индексы, пулы) регистрируют себя при импорте,
+# а /internal/metrics собирает все значения в один JSON.
+_sources: dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics_source(name: str, source: Callable[[], dict]) -> None:
+    """Регистрирует источник метрик (повторная регистрация заменяет старый)"""
+    _sources[name] = source
+
+
+def collect_metrics() -> dict:
+    """Собирает метрики со всех источников. Ошибка одного источника не ломает остальные"""
+    result = {}
+    for name, source in _sources.items():
+        try:
+            result[name] = source()
+        except Exception:
+            logger.exception("Ошибка сбора метрик: %s", name)
+            result[name] = None
+    return result
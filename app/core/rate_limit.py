@@ -0,0 +1,91 @@
+import logging
+import math
+import threading
+import time
+from typing import Callable
+
+from app.exceptions.rate_limit import CallerLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class CallerLimiter:
+    """
+    Лимиты на каждого вызывающего (партнёра, пользователя) отдельно:
+    не больше max_concurrent одновременных запросов и per_minute единиц работы в минуту
+    (token bucket: ведро на per_minute единиц пополняется равномерно).
+    Один вызывающий не может занять все потоки воркера и весь бюджет запросов к API.
+    Лимиты — на процесс, а не на кластер.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        per_minute: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.per_minute = max(1.0, per_minute)
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._active: dict[str, int] = {}
+        self._buckets: dict[str, tuple[float, float]] = {}  # вызывающий → (токены, когда)
+        self._calls = 0
+        self._rejected = 0
+
+    def _tokens(self, caller: str, now: float) -> float:
+        tokens, updated = self._buckets.get(caller, (self.per_minute, now))
+        return min(self.per_minute, tokens + (now - updated) * self.per_minute / 60)
+
+    def acquire(self, caller: str, cost: float = 1) -> None:
+        """Занимает слот и cost единиц; при превышении — CallerLimitExceeded"""
+        cost = min(cost, self.per_minute)
+        with self._lock:
+            now = self._timer()
+            tokens = self._tokens(caller, now)
+            if self._active.get(caller, 0) >= self.max_concurrent:
+                error = CallerLimitExceeded(
+                    f"{self.name}: не больше {self.max_concurrent} одновременных запросов",
+                    retry_after=1.0,
+                )
+            elif tokens < cost:
+                error = CallerLimitExceeded(
+                    f"{self.name}: не больше {self.per_minute:g} в минуту",
+                    retry_after=math.ceil((cost - tokens) * 60 / self.per_minute),
+                )
+            else:
+                error = None
+                self._buckets[caller] = (tokens - cost, now)
+                self._active[caller] = self._active.get(caller, 0) + 1
+                self._calls += 1
+            if error is not None:
+                self._rejected += 1
+        if error is not None:
+            logger.warning("Лимит %s превышен: caller=%s (%s)", self.name, caller, error)
+            raise error
+
+    def release(self, caller: str) -> None:
+        """Освобождает слот, занятый acquire"""
+        with self._lock:
+            active = self._active.get(caller, 0) - 1
+            if active > 0:
+                self._active[caller] = active
+            else:
+                self._active.pop(caller, None)
+            # полное ведро без активных запросов ничего не помнит — не копим вызывающих
+            now = self._timer()
+            if active <= 0 and self._tokens(caller, now) >= self.per_minute:
+                self._buckets.pop(caller, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "per_minute": self.per_minute,
+                "active_callers": len(self._active),
+                "active": sum(self._active.values()),
+                "calls": self._calls,
+                "rejected": self._rejected,
+            }
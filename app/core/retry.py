@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Повторяем только то, что может пройти со второго раза: таймауты, 5xx, 429"""
+    retryable = getattr(error, "retryable", None)
+    if retryable is not None:
+        return bool(retryable)
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class RetryPolicy:
+    """
+    Повторы с общим дедлайном и decorrelated jitter
+    (пауза = min(max_delay, random(base_delay, предыдущая пауза × 3))).
+
+    - повторяются только ошибки, для которых retry_on(error) истинно;
+    - Retry-After из ошибки (атрибут retry_after) — нижняя граница паузы;
+    - после последней попытки паузы нет; если пауза не укладывается в дедлайн —
+      ошибка пробрасывается сразу, не дожидаясь его;
+    - попытка получает timeout — сколько ещё можно ждать (не больше attempt_timeout),
+      поэтому общее время вызова ограничено дедлайном.
+
+    Одна политика используется и из потоков (call), и из asyncio (call_async).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        deadline: float = 6.0,
+        attempt_timeout: float = 3.0,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        retry_on: Callable[[BaseException], bool] = is_retryable,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._retries = 0
+        self._gave_up = {"not_retryable": 0, "attempts": 0, "deadline": 0}
+
+    def _next_delay(self, previous: float, error: BaseException) -> float:
+        delay = min(self.max_delay, self.rng.uniform(self.base_delay, previous * 3))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _attempt_timeout(self, started: float) -> float:
+        return max(0.0, min(self.attempt_timeout, self.deadline - (self.clock() - started)))
+
+    def _after_failure(self, error, attempt: int, started: float, previous: float) -> float | None:
+        """Пауза перед следующей попыткой или None — сдаёмся"""
+        if not self.retry_on(error):
+            reason = "not_retryable"
+        elif attempt >= self.max_attempts:
+            reason = "attempts"
+        else:
+            delay = self._next_delay(previous, error)
+            remaining = self.deadline - (self.clock() - started)
+            # после паузы должно остаться время хотя бы на начало попытки
+            if delay < remaining:
+                with self._lock:
+                    self._retries += 1
+                logger.debug(
+                    "Повтор через %.3f с: попытка %s из %s, ошибка=%r",
+                    delay,
+                    attempt + 1,
+                    self.max_attempts,
+                    error,
+                )
+                return delay
+            reason = "deadline"
+        with self._lock:
+            self._gave_up[reason] += 1
+        return None
+
+    def call(self, fn: Callable[[float], T], sleep: Callable[[float], None] = time.sleep) -> T:
+        """Вызывает fn(timeout) с повторами; исключение последней попытки пробрасывается"""
+        with self._lock:
+            self._calls += 1
+        started = self.clock()
+        delay = self.base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return fn(self._attempt_timeout(started))
+            except Exception as error:
+                delay = self._after_failure(error, attempt, started, delay)
+                if delay is None:
+                    raise
+            sleep(delay)
+
+    async def call_async(self, fn: Callable[[float], Awaitable[T]]) -> T:
+        """
+        Асинхронный вариант: fn(timeout) — корутина, пауза — asyncio.sleep (event loop не
+        блокируется). Попытка дополнительно ограничена asyncio.wait_for(timeout).
+        """
+        with self._lock:
+            self._calls += 1
+        started = self.clock()
+        delay = self.base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self._attempt_timeout(started)
+            try:
+                return await asyncio.wait_for(fn(timeout), timeout)
+            except Exception as error:
+                delay = self._after_failure(error, attempt, started, delay)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "retries": self._retries,
+                "gave_up": dict(self._gave_up),
+            }
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Схлопывание одновременных вызовов с одним ключом (single-flight).
+    Первый вызов (лидер) выполняет fn, остальные, пришедшие до его завершения,
+    ждут и получают тот же результат или то же исключение.
+    Результат не кэшируется: следующий вызов после завершения выполнит fn заново.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._executions = 0
+        self._coalesced = 0
+        self._errors = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+            else:
+                call.waiters += 1
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                logger.debug("Single-flight: key=%s, ожидавших=%s", key, call.waiters)
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "errors": self._errors,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Single-flight для asyncio: одновременные await с одним ключом ждут одну задачу.
+    Работа лидера идёт в отдельной задаче — отмена одного из ожидающих (например,
+    пользователь ушёл) не отменяет запрос для остальных.
+    Используется из одного event loop; блокировки не нужны.
+    """
+
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self._executions = 0
+        self._coalesced = 0
+        self._errors = 0
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self._executions += 1
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "errors": self._errors,
+        }
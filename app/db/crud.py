@@ -1,11 +1,48 @@
-from app.db.encrypt import EncryptData
-from app.db.models import IngredientCategory, Product, ProductIngredient, User, Role
+from app.analyzers.composition_tokenizer import iter_ingredients
+from app.analyzers.ingredient_normalizer import normalize_ingredient_key
+from app.analyzers.safety_score import compute_product_score
+from app.db.encrypt import EncryptData, run_in_background
+from app.db.models import (
+    IngredientAlias,
+    IngredientCategory,
+    IngredientChange,
+    Product,
+    ProductIngredient,
+    Permission,
+    Role,
+    User,
+    product_ingredients_link,
+    role_permissions,
+)
 from app.db.session import Base, Database
 import logging
+from datetime import datetime
+from decouple import config
+from sqlalchemy import func, insert, or_, select, update
 from sqlalchemy.orm import joinedload
 
 logger = logging.getLogger(__name__)
 
+# Сколько продуктов пересчитывается одним SELECT/UPDATE при изменении оценок ингредиентов
+PRODUCT_SCORE_BATCH = config("PRODUCT_SCORE_BATCH", default=500, cast=int)
+
+# Колонки продукта для поиска по штрих-коду (ProductDTO + fetched_at), без ингредиентов
+_LOOKUP_COLUMNS = (
+    Product.barcode,
+    Product.name,
+    Product.brand,
+    Product.category,
+    Product.ingredients_text,
+    Product.image_url,
+    Product.packaging,
+    Product.quantity,
+    Product.weight,
+    Product.countries,
+    Product.fetched_at,
+)
+# не больше стольких штрих-кодов в одном IN (лимит параметров SQLite — 999)
+_LOOKUP_IN_CHUNK = 500
+
 class OtrazhenieDB(Database):
     """Класс для работы с таблицами"""
 
@@ -61,8 +98,11 @@ class OtrazhenieDB(Database):
                 category_id=category_id,
             )
             session.add(ingredient)
+            session.flush()  # получаем id для журнала изменений
+            self._log_ingredient_change(session, ingredient.id, "upsert")
             session.commit()  # фиксируем изменения
             session.refresh(ingredient)
+            self._ingredients_changed()
             logger.info("Добавлен новый ингредиент: %s", {
                 "name":name,
                 "safety_score" : safety_score,
@@ -71,6 +111,69 @@ class OtrazhenieDB(Database):
             })
             return ingredient
 
+    def add_ingredient_alias(
+        self, ingredient_id: int, alias: str, language: str = None
+    ):
+        """Добавляет синоним ингредиента (если такой ключ уже есть — возвращает существующий)
+        :param ingredient_id: id канонического ингредиента
+        :param alias: написание синонима (Water, Вода, Eau ...)
+        :param language: код языка синонима (la / en / ru ...)
+        """
+        normalized = normalize_ingredient_key(alias)
+        if not normalized:
+            return None
+        with self.get_session() as session:
+            existing = (
+                session.query(IngredientAlias).filter_by(normalized=normalized).first()
+            )
+            if existing:
+                logger.info("Синоним уже существует: %s", alias)
+                return existing
+            ingredient_alias = IngredientAlias(
+                alias=alias,
+                normalized=normalized,
+                language=language,
+                ingredient_id=ingredient_id,
+            )
+            session.add(ingredient_alias)
+            self._log_ingredient_change(session, ingredient_id, "upsert")
+            session.commit()
+            session.refresh(ingredient_alias)
+            self._ingredients_changed()
+            logger.info("Добавлен синоним ингредиента: %s → %s", alias, ingredient_id)
+            return ingredient_alias
+
+    def select_ingredient_aliases(self, ingredient_ids=None):
+        """
+        Возвращает синонимы ингредиентов.
+        :param ingredient_ids: если передан — только синонимы этих ингредиентов
+        :return: список (ingredient_id, normalized)
+        """
+        with self.get_session() as session:
+            query = session.query(
+                IngredientAlias.ingredient_id, IngredientAlias.normalized
+            )
+            if ingredient_ids is not None:
+                if not ingredient_ids:
+                    return []
+                query = query.filter(
+                    IngredientAlias.ingredient_id.in_(list(ingredient_ids))
+                )
+            return query.all()
+
+    def _log_ingredient_change(self, session, ingredient_id: int, operation: str):
+        """
+        Пишет запись в журнал изменений ингредиентов в той же транзакции, что и само изменение.
+        :param operation: upsert — ингредиент создан/изменён, delete — удалён
+        """
+        session.add(IngredientChange(ingredient_id=ingredient_id, operation=operation))
+
+    def _ingredients_changed(self):
+        """Просит индекс ингредиентов этого процесса сразу дочитать журнал изменений"""
+        from app.services.ingredient_index import ingredient_index
+
+        ingredient_index.mark_dirty()
+
     def show_all_tables(self):
         """
         Возвращает список всех таблиц, которые есть в базе данных
@@ -125,40 +228,210 @@ class OtrazhenieDB(Database):
     # Работа с ingredients
     def _parse_ingredients(self, ingredients_text: str) -> list[str]:
         """
-        Безопасный парсинг строки ингредиентов.
+        Безопасный парсинг строки ингредиентов (скобки, «1,2-Hexanediol», «may contain»).
         Никогда не падает.
         """
         if not ingredients_text:
             return []
 
         try:
-            return [
-                item.strip() for item in ingredients_text.split(",") if item.strip()
-            ]
-        except Exception as e:
+            return list(iter_ingredients(ingredients_text))
+        except Exception:
             logger.exception("ingredients_parse_failed")
             return []
 
-    def _attach_ingredients(self, session, product, ingredients_list: list[str]):
+    def _insert_ignoring_conflicts(self, session, table):
         """
-        Привязывает ингредиенты к продукту.
-        Fail-safe: не ломает pipeline.
+        INSERT ... ON CONFLICT DO NOTHING для PostgreSQL и SQLite.
+        Для других СУБД — обычный INSERT (конфликт уронит вставку целиком).
         """
-        for ing_name in ingredients_list:
-            try:
-                ingredient = (
-                    session.query(ProductIngredient).filter_by(name=ing_name).first()
-                )
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            return insert(table)
+        return dialect_insert(table).on_conflict_do_nothing()
 
-                if not ingredient:
-                    ingredient = ProductIngredient(name=ing_name)
-                    session.add(ingredient)
-                    session.flush()
+    def _attach_ingredients(self, session, product, ingredients_list: list[str]):
+        """
+        Привязывает ингредиенты к продукту с позициями в составе — set-based,
+        число запросов не зависит от длины состава:
+        1. синонимы (Water, Вода → Aqua) сводятся к каноническому id через индекс в памяти;
+        2. один SELECT ... IN по id и названиям;
+        3. один INSERT ... ON CONFLICT DO NOTHING для новых названий (+ запись в журнал);
+        4. один INSERT в product_ingredients_link.
+        Fail-safe: не ломает pipeline — при сбое вставки откатываются до savepoint,
+        продукт сохраняется без привязки.
+        :return: ([(id, safety_score)] привязанных ингредиентов в порядке состава,
+            созданы ли новые ингредиенты — индексу нужно узнать о них после commit)
+        """
+        from app.services.ingredient_index import ingredient_index
 
-                product.ingredients.append(ingredient)
+        try:
+            # savepoint: сбой вставки откатывает только привязку — на PostgreSQL иначе
+            # прерывается вся транзакция и продукт не сохранится при commit
+            created = []
+            with session.begin_nested():
+                # название → канонический id (None — искать/создавать по названию)
+                names = {}
+                for ing_name in ingredients_list:
+                    if ing_name not in names:
+                        names[ing_name] = ingredient_index.resolve_id(ing_name)
+                known_ids = {i for i in names.values() if i is not None}
+                unresolved = [name for name, i in names.items() if i is None]
+
+                scores = {}  # id → safety_score
+                ids_by_name = {}
+                rows = session.execute(
+                    select(
+                        ProductIngredient.id,
+                        ProductIngredient.name,
+                        ProductIngredient.safety_score,
+                    ).where(
+                        or_(
+                            ProductIngredient.id.in_(known_ids),
+                            ProductIngredient.name.in_(unresolved),
+                        )
+                    )
+                )
+                for ingredient_id, name, safety_score in rows:
+                    scores[ingredient_id] = safety_score
+                    ids_by_name[name] = ingredient_id
+
+                # новые названия и устаревшие id индекса (ингредиент успели удалить)
+                missing = [
+                    name
+                    for name, canonical_id in names.items()
+                    if canonical_id not in scores and name not in ids_by_name
+                ]
+                if missing:
+                    created = session.execute(
+                        self._insert_ignoring_conflicts(session, ProductIngredient.__table__)
+                        .values([{"name": name} for name in missing])
+                        .returning(ProductIngredient.id, ProductIngredient.name)
+                    ).all()
+                    for ingredient_id, name in created:
+                        scores[ingredient_id] = None
+                        ids_by_name[name] = ingredient_id
+                    if created:
+                        session.execute(
+                            insert(IngredientChange),
+                            [
+                                {"ingredient_id": ingredient_id, "operation": "upsert"}
+                                for ingredient_id, _ in created
+                            ],
+                        )
+                    if len(created) < len(missing):
+                        # параллельная вставка успела раньше — дочитываем её строки
+                        raced = [name for name in missing if name not in ids_by_name]
+                        for ingredient_id, name, safety_score in session.execute(
+                            select(
+                                ProductIngredient.id,
+                                ProductIngredient.name,
+                                ProductIngredient.safety_score,
+                            ).where(ProductIngredient.name.in_(raced))
+                        ):
+                            scores[ingredient_id] = safety_score
+                            ids_by_name[name] = ingredient_id
+
+                # «Aqua, Water» — два синонима одного ингредиента, связь нужна одна
+                attached = []
+                attached_ids = set()
+                for name, canonical_id in names.items():
+                    ingredient_id = (
+                        canonical_id if canonical_id in scores else ids_by_name.get(name)
+                    )
+                    if ingredient_id is None:
+                        logger.error("ingredient_attach_failed: %s", name)
+                    elif ingredient_id not in attached_ids:
+                        attached_ids.add(ingredient_id)
+                        attached.append((ingredient_id, scores[ingredient_id]))
+
+                if attached:
+                    session.execute(
+                        insert(product_ingredients_link),
+                        [
+                            {
+                                "product_id": product.id,
+                                "ingredient_id": ingredient_id,
+                                "position": position,
+                            }
+                            for position, (ingredient_id, _) in enumerate(attached)
+                        ],
+                    )
+            return attached, bool(created)
+
+        except Exception:
+            logger.exception("ingredients_attach_failed: %s", product.barcode)
+            return [], False
+
+    @staticmethod
+    def _apply_product_score(product, scores) -> None:
+        """Записывает в продукт общую оценку по оценкам ингредиентов (в порядке состава)"""
+        result = compute_product_score(scores)
+        product.safety_score = result.score
+        product.risk_count = result.risk_count
+        product.unknown_count = result.unknown_count
+
+    def _affected_product_ids(self, session, ingredient_ids) -> list[int]:
+        """id продуктов, в составе которых есть хотя бы один из ингредиентов"""
+        return list(
+            session.execute(
+                select(product_ingredients_link.c.product_id)
+                .where(product_ingredients_link.c.ingredient_id.in_(list(ingredient_ids)))
+                .distinct()
+            ).scalars()
+        )
+
+    def _recompute_product_scores(self, session, product_ids) -> int:
+        """
+        Пересчитывает оценки продуктов пачками по PRODUCT_SCORE_BATCH:
+        один SELECT оценок ингредиентов и один пакетный UPDATE на пачку.
+        Коммит — на вызывающей стороне.
+        """
+        product_ids = list(product_ids)
+        link = product_ingredients_link
+        for start in range(0, len(product_ids), PRODUCT_SCORE_BATCH):
+            batch = product_ids[start:start + PRODUCT_SCORE_BATCH]
+            rows = session.execute(
+                select(link.c.product_id, ProductIngredient.safety_score)
+                .join(ProductIngredient, ProductIngredient.id == link.c.ingredient_id)
+                .where(link.c.product_id.in_(batch))
+                .order_by(link.c.product_id, link.c.position, link.c.ingredient_id)
+            )
+            scores_by_product = {product_id: [] for product_id in batch}
+            for product_id, score in rows:
+                scores_by_product[product_id].append(score)
+
+            updates = []
+            for product_id, scores in scores_by_product.items():
+                result = compute_product_score(scores)
+                updates.append(
+                    {
+                        "id": product_id,
+                        "safety_score": result.score,
+                        "risk_count": result.risk_count,
+                        "unknown_count": result.unknown_count,
+                    }
+                )
+            session.execute(update(Product), updates)
+        if product_ids:
+            logger.info("Пересчитаны оценки продуктов: %s", len(product_ids))
+        return len(product_ids)
 
-            except Exception as e:
-                logger.exception("ingredient_attach_failed: %s", ing_name)
+    def recompute_product_scores(self, product_ids=None) -> int:
+        """
+        Пересчитывает и сохраняет общие оценки продуктов (все, если product_ids не передан).
+        :return: количество пересчитанных продуктов
+        """
+        with self.get_session() as session:
+            if product_ids is None:
+                product_ids = session.execute(select(Product.id)).scalars().all()
+            count = self._recompute_product_scores(session, product_ids)
+            session.commit()
+            return count
 
     def add_product(
         self,
@@ -171,9 +444,13 @@ class OtrazhenieDB(Database):
         packaging: str = None,
         quantity: int = None,
         countries: str = None,
+        category: str = None,
+        fetched_at: datetime = None,
+        weight: str = None,
     ):
         """
         Добавляет новый продукт в базу (устойчивый ingestion).
+        fetched_at — время получения из OpenBeautyFacts (None — добавлен вручную).
         """
 
         with self.get_session() as session:
@@ -188,12 +465,15 @@ class OtrazhenieDB(Database):
                 barcode=barcode,
                 name=name,
                 brand=brand,
+                category=category,
                 ingredients_text=ingredients_text,
                 ingredients_text_ru=ingredients_text_ru,
                 image_url=image_url,
                 packaging=packaging,
                 quantity=quantity,
+                weight=weight,
                 countries=countries,
+                fetched_at=fetched_at,
             )
 
             session.add(product)
@@ -201,20 +481,98 @@ class OtrazhenieDB(Database):
 
             logger.info("Продукт создан: %s", barcode)
 
-            # 3. Парсинг ингредиентов (fail-safe)
-            ingredients_list = self._parse_ingredients(ingredients_text)
-
-            if not ingredients_list:
-                logger.info("Продукт создан без ингредиентов: %s", barcode)
-            else:
-                # 4. Привязка ингредиентов (fail-safe)
-                self._attach_ingredients(session, product, ingredients_list)
+            # 3-5. Ингредиенты и общая оценка (fail-safe)
+            ingredients_created = self._link_product_ingredients(session, product)
 
-            # 5. Финальный commit (ОДИН раз)
+            # 6. Финальный commit (ОДИН раз)
             session.commit()
             session.refresh(product)
+            if ingredients_created:
+                self._ingredients_changed()
+            return product
+
+    def _link_product_ingredients(self, session, product) -> bool:
+        """
+        Разбирает состав продукта, привязывает ингредиенты и считает общую оценку.
+        :return: созданы ли новые ингредиенты
+        """
+        ingredients_list = self._parse_ingredients(product.ingredients_text)
+
+        if not ingredients_list:
+            logger.info("Продукт без ингредиентов: %s", product.barcode)
+            return False
+        attached, created = self._attach_ingredients(session, product, ingredients_list)
+        # Общая оценка — хранится в продукте, чтобы списки не трогали ингредиенты
+        self._apply_product_score(product, [score for _, score in attached])
+        return created
+
+    def select_product_for_lookup(self, barcode: str):
+        """
+        Продукт для поиска по штрих-коду — только колонки ProductDTO и fetched_at,
+        без загрузки ингредиентов (один SELECT по индексу barcode). None — нет в базе.
+        """
+        with self.get_session() as session:
+            return session.execute(
+                select(*_LOOKUP_COLUMNS).where(Product.barcode == barcode)
+            ).first()
+
+    def select_products_for_lookup(self, barcodes) -> dict:
+        """
+        То же для пачки штрих-кодов: штрих-код → строка, пачками по IN-запросу.
+        Штрих-кодов, которых нет в базе, в ответе нет.
+        Своя короткая сессия, а не сессия запроса: пакетный поиск читает базу внутри
+        потокового ответа, и соединение запроса было бы занято до конца всей пачки.
+        """
+        barcodes = list(dict.fromkeys(barcodes))
+        rows = {}
+        with self.SessionLocal() as session:
+            for start in range(0, len(barcodes), _LOOKUP_IN_CHUNK):
+                chunk = barcodes[start:start + _LOOKUP_IN_CHUNK]
+                for row in session.execute(
+                    select(*_LOOKUP_COLUMNS).where(Product.barcode.in_(chunk))
+                ):
+                    rows[row.barcode] = row
+        return rows
+
+    def save_fetched_product(self, barcode: str, fetched_at: datetime, **fields):
+        """
+        Сохраняет продукт, полученный из OpenBeautyFacts: новый — добавляет с ингредиентами,
+        существующий — обновляет поля и fetched_at; при изменении состава ингредиенты
+        перепривязываются и оценка пересчитывается.
+        Продукты, добавленные вручную (fetched_at is None), не перезаписываются.
+        """
+        with self.get_session() as session:
+            product = session.query(Product).filter_by(barcode=barcode).first()
+            if product is not None:
+                return self._refresh_fetched_product(session, product, fetched_at, fields)
+        return self.add_product(barcode=barcode, fetched_at=fetched_at, **fields)
+
+    def _refresh_fetched_product(self, session, product, fetched_at, fields):
+        if product.fetched_at is None:
+            logger.info("Продукт добавлен вручную, не обновляется из API: %s", product.barcode)
             return product
 
+        ingredients_changed = product.ingredients_text != fields.get("ingredients_text")
+        for name, value in fields.items():
+            setattr(product, name, value)
+        product.fetched_at = fetched_at
+
+        ingredients_created = False
+        if ingredients_changed:
+            session.execute(
+                product_ingredients_link.delete().where(
+                    product_ingredients_link.c.product_id == product.id
+                )
+            )
+            self._apply_product_score(product, [])
+            ingredients_created = self._link_product_ingredients(session, product)
+
+        session.commit()
+        if ingredients_created:
+            self._ingredients_changed()
+        logger.info("Продукт обновлён из API: %s", product.barcode)
+        return product
+
     def add_ingredient_with_category(
         self,
         name: str,
@@ -288,12 +646,22 @@ class OtrazhenieDB(Database):
                 ingredient.name = name
             if function:
                 ingredient.function = function
+            score_changed = (
+                safety_score is not None and safety_score != ingredient.safety_score
+            )
             if safety_score is not None:
                 ingredient.safety_score = safety_score
             if description:
                 ingredient.description = description
+            self._log_ingredient_change(session, ingredient.id, "upsert")
+            if score_changed:
+                session.flush()
+                self._recompute_product_scores(
+                    session, self._affected_product_ids(session, [ingredient.id])
+                )
             session.commit()  # фиксируем изменения
             session.refresh(ingredient)  # обновляем объект после commit
+            self._ingredients_changed()
             logger.info("Данные ингредиента обновлены: %s", ingredient)
             return ingredient
 
@@ -307,8 +675,13 @@ class OtrazhenieDB(Database):
             )
             if not ingredient:
                 return None
+            product_ids = self._affected_product_ids(session, [ingredient.id])
             session.delete(ingredient)
+            self._log_ingredient_change(session, ingredient.id, "delete")
+            session.flush()
+            self._recompute_product_scores(session, product_ids)
             session.commit()  # фиксируем изменения
+            self._ingredients_changed()
             logger.info("Ингредиент удален: %s", ingredient)
             return ingredient
 
@@ -317,6 +690,24 @@ class OtrazhenieDB(Database):
         with self.get_session() as session:
             return session.query(Product).all()
 
+    def select_products_by_safety(
+        self, max_score: float = None, limit: int = 50, safest_first: bool = True
+    ):
+        """
+        Продукты, отсортированные по общей оценке безопасности (без оценки — в конце).
+        :param max_score: только продукты с оценкой не выше (1 — безопасно, 10 — вредно)
+        """
+        with self.get_session() as session:
+            query = session.query(Product)
+            if max_score is not None:
+                query = query.filter(Product.safety_score <= max_score)
+            order = Product.safety_score.asc() if safest_first else Product.safety_score.desc()
+            return (
+                query.order_by(Product.safety_score.is_(None), order, Product.id)
+                .limit(limit)
+                .all()
+            )
+
     def select_all_categories(self):
         """Возвращает все категории из таблицы ingredient_categories"""
         with self.get_session() as session:
@@ -327,28 +718,62 @@ class OtrazhenieDB(Database):
         with self.get_session() as session:
             return session.query(ProductIngredient).all()
 
+    def _ingredients_with_names_query(self, session):
+        """Запрос ингредиентов с русским названием категории вместо внешнего ключа"""
+        # Выполняем JOIN запрос между таблицами product_ingredients и ingredient_categories
+        return session.query(
+            ProductIngredient.id,
+            ProductIngredient.name,
+            IngredientCategory.name_ru.label(
+                "ingredient_name"
+            ),  # Берем русское название ингредиента
+            ProductIngredient.safety_score,
+            ProductIngredient.description,
+        ).join(
+            IngredientCategory,  # Указываем таблицу для JOIN
+            ProductIngredient.category_id
+            == IngredientCategory.id,  # Условие соединения
+        )
+
     def select_all_ingredients_with_names(self):
         """Возвращает все записи из таблицы product_ingredients с названиями ингредиентов вместо внешних ключей"""
         with self.get_session() as session:
-            # Выполняем JOIN запрос между таблицами product_ingredients и ingredients
-            results = (
+            return self._ingredients_with_names_query(session).all()
+
+    def select_ingredients_with_names_by_ids(self, ingredient_ids):
+        """То же, что select_all_ingredients_with_names, но только для указанных id"""
+        if not ingredient_ids:
+            return []
+        with self.get_session() as session:
+            return (
+                self._ingredients_with_names_query(session)
+                .filter(ProductIngredient.id.in_(list(ingredient_ids)))
+                .all()
+            )
+
+    def get_ingredient_revision(self) -> int:
+        """Текущая ревизия данных ингредиентов (последний id журнала, 0 если журнал пуст)"""
+        with self.get_session() as session:
+            return session.query(func.max(IngredientChange.id)).scalar() or 0
+
+    def select_ingredient_changes_since(self, revision: int, limit: int = None):
+        """
+        Возвращает записи журнала с ревизией больше revision в порядке возрастания.
+        :return: список (revision, ingredient_id, operation)
+        """
+        with self.get_session() as session:
+            query = (
                 session.query(
-                    ProductIngredient.id,
-                    ProductIngredient.name,
-                    IngredientCategory.name_ru.label(
-                        "ingredient_name"
-                    ),  # Берем русское название ингредиента
-                    ProductIngredient.safety_score,
-                    ProductIngredient.description,
-                )
-                .join(
-                    IngredientCategory,  # Указываем таблицу для JOIN
-                    ProductIngredient.category_id
-                    == IngredientCategory.id,  # Условие соединения
+                    IngredientChange.id,
+                    IngredientChange.ingredient_id,
+                    IngredientChange.operation,
                 )
-                .all()
+                .filter(IngredientChange.id > revision)
+                .order_by(IngredientChange.id)
             )
-            return results
+            if limit:
+                query = query.limit(limit)
+            return query.all()
 
     def select_one_ingredient(self, ingredient_name: str):
         """
@@ -389,18 +814,25 @@ class OtrazhenieDB(Database):
             return session.query(User).filter(User.username == username).first()
 
     def get_user_by_id(self, user_id: int):
-        """Возвращает пользователя по ID с ролями и доступами"""
+        """Возвращает пользователя по ID с ролями (права — через матрицу прав по id ролей)"""
         with self.get_session() as session:
             return (
                 session.query(User)
-                .options(
-                    joinedload(User.roles)
-                    .joinedload(Role.permissions)
-                )
+                .options(joinedload(User.roles))
                 .filter(User.id == user_id)
                 .first()
             )
 
+    def select_role_permissions(self) -> list[tuple[int, str | None]]:
+        """Пары (id роли, имя права) одним запросом; роль без прав — (id, None)"""
+        with self.get_session() as session:
+            rows = session.execute(
+                select(Role.id, Permission.name)
+                .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+                .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+            )
+            return [tuple(row) for row in rows]
+
     def create_user(self, username: str, email: str, password_hash: str):
         """Создаёт нового пользователя"""
         with self.get_session() as session:
@@ -415,17 +847,74 @@ class OtrazhenieDB(Database):
             logger.info("Создан новый пользователь: %s", user)
             return user
 
+    def get_user_credentials(self, email: str):
+        """
+        Данные для входа одним запросом: только нужные колонки
+        (id, username, email, password_hash, is_active), без ORM-объекта
+        """
+        with self.get_session() as session:
+            return session.execute(
+                select(
+                    User.id,
+                    User.username,
+                    User.email,
+                    User.password_hash,
+                    User.is_active,
+                ).where(User.email == email)
+            ).first()
+
+    def find_registration_conflicts(self, email: str, username: str) -> set[str]:
+        """Какие из полей уже заняты: {"email", "username"} — одним запросом"""
+        with self.get_session() as session:
+            rows = session.execute(
+                select(User.email == email, User.username == username).where(
+                    or_(User.email == email, User.username == username)
+                )
+            ).all()
+        conflicts = set()
+        for email_taken, username_taken in rows:
+            if email_taken:
+                conflicts.add("email")
+            if username_taken:
+                conflicts.add("username")
+        return conflicts
+
+    def check_user_password(self, user, password: str) -> bool:
+        """
+        Проверяет пароль по уже загруженным данным пользователя (id, password_hash).
+        Если параметры Argon2 изменились, новый хеш пишется в фоне — вход его не ждёт.
+        """
+        is_valid, new_hash = EncryptData().verify_password(user.password_hash, password)
+        if is_valid and new_hash:
+            run_in_background(
+                self.update_password_hash, user.id, user.password_hash, new_hash
+            )
+        return is_valid
+
     def verify_user_password(self, email: str, password: str):
         """Проверяет пароль пользователя"""
-        with self.get_session() as session:
-            user = session.query(User).filter(User.email == email).first()
-            if not user:
-                return False
+        user = self.get_user_credentials(email)
+        if not user:
+            return False
+        return self.check_user_password(user, password)
 
-            is_valid, new_hash = EncryptData().verify_password(
-                user.password_hash, password
+    def update_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        """
+        Заменяет хеш пароля, только если он не менялся с момента проверки
+        (пароль могли сменить, пока пересчитывался хеш)
+        """
+        with self.get_session() as session:
+            result = session.execute(
+                update(User)
+                .where(User.id == user_id, User.password_hash == old_hash)
+                .values(password_hash=new_hash)
             )
-            return is_valid
+            session.commit()
+        updated = result.rowcount == 1
+        logger.info(
+            "Хеш пароля пересчитан: user_id=%s сохранён=%s", user_id, updated
+        )
+        return updated
 
 
 if __name__ == "__main__":
@@ -1,53 +1,593 @@
+import argparse
 import csv
+import io
 import logging
-from app.db.models import IngredientCategory, ProductIngredient
-from app.db.session import Database
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterator
+
+from decouple import config
+from sqlalchemy import column, func, insert, select
+from sqlalchemy import table as sql_table
+
+from app.analyzers.ingredient_normalizer import normalize_ingredient_key
+from app.db.crud import OtrazhenieDB
+from app.db.models import (
+    ImportCheckpoint,
+    IngredientAlias,
+    IngredientCategory,
+    IngredientChange,
+    ProductIngredient,
+)
+from app.db.session import DATABASE_URL
 
 logger = logging.getLogger(__name__)
 
+# Импорт справочников из CSV пачками:
+# - файл читается потоково, пачка дедуплицируется в памяти;
+# - PostgreSQL: пачка уходит COPY во временную staging-таблицу и одним
+#   INSERT ... SELECT ... ON CONFLICT DO UPDATE в основную;
+# - SQLite: тот же upsert через executemany;
+# - каждая пачка — отдельная транзакция вместе с отметкой прогресса (import_checkpoints),
+#   поэтому после сбоя импорт продолжается с первой незаписанной пачки.
+
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", default=5000, cast=int)
+# СУБД, для которых есть INSERT ... ON CONFLICT (upsert пачкой)
+SUPPORTED_DIALECTS = ("postgresql", "sqlite")
+CSV_DIR = Path(__file__).resolve().parent / "csv_files"
+# ключ для «лишних» полей строки: запятые в описании без кавычек
+_REST = "_rest"
+
+
+@dataclass
+class ImportReport:
+    source: str
+    rows_read: int = 0  # строк CSV прочитано в этом запуске
+    rows_written: int = 0  # уникальных записей отправлено в upsert
+    rows_skipped: int = 0  # строки без названия
+    chunks: int = 0
+    resumed_from: int = 0  # строк пропущено: записаны прошлым (прерванным) запуском
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def _read_rows(file_path) -> Iterator[dict]:
+    """Строки CSV по одной; лишние поля склеиваются обратно в последнее (описание)"""
+    with open(file_path, newline="", encoding="utf-8-sig") as csvfile:
+        reader = csv.DictReader(csvfile, restkey=_REST)
+        last_field = reader.fieldnames[-1] if reader.fieldnames else None
+        for row in reader:
+            rest = row.pop(_REST, None)
+            if rest:
+                row[last_field] = ",".join([row[last_field] or "", *rest])
+            yield row
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _merge(records: dict, key: str, record: dict) -> None:
+    """Дубль в пачке дополняет запись так же, как upsert: непустые значения побеждают"""
+    previous = records.get(key)
+    if previous is None:
+        records[key] = record
+    else:
+        previous.update((name, value) for name, value in record.items() if value is not None)
+
+
+def _fingerprint(file_path) -> str:
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _clean(value) -> str | None:
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def _to_float(value) -> float | None:
+    try:
+        return float(value.replace(",", ".")) if _clean(value) else None
+    except ValueError:
+        return None
+
 
-class CSVToDB(Database):
+def _to_int(value) -> int | None:
+    try:
+        return int(value) if _clean(value) else None
+    except ValueError:
+        return None
 
-    def import_ingredients_from_csv(self, file_path: str):
+
+def _split_function(function: str) -> tuple[str, str | None] | None:
+    """
+    Функция ингредиента из inci_data.csv → (name_en, name_ru) категории.
+    «Emulsifier|Emollient» — берётся первая; «Растворитель / Solvent» — ru / en.
+    """
+    primary = _clean((function or "").split("|")[0])
+    if not primary:
+        return None
+    if "/" in primary:
+        name_ru, name_en = (part.strip() for part in primary.split("/", 1))
+        return name_en or name_ru, name_ru or None
+    return primary, None
+
+
+class CSVToDB(OtrazhenieDB):
+
+    def __init__(self, db_url: str = DATABASE_URL, chunk_size: int = IMPORT_CHUNK_SIZE):
+        super().__init__(db_url)
+        self.chunk_size = chunk_size
+
+    # --- общая часть ---
+    def _check_dialect(self) -> None:
+        """Проверка СУБД до начала импорта, а не посреди пачки"""
+        dialect = self.engine.dialect.name
+        if dialect not in SUPPORTED_DIALECTS:
+            raise RuntimeError(
+                f"Импорт поддерживает только {', '.join(SUPPORTED_DIALECTS)}, а не {dialect}"
+            )
+
+    def _run_import(
+        self, file_path, write_chunk: Callable[[object, list[dict]], tuple[int, int]]
+    ) -> ImportReport:
         """
-        Импорт ингредиентов (product_ingredients) из CSV
-        Ожидаемые поля: name, function_id, safety_score, description
+        Читает CSV пачками по chunk_size и передаёт их в write_chunk(session, rows),
+        который возвращает (записано, пропущено). Коммит и отметка прогресса — на пачку.
         """
+        self._check_dialect()
+        source = Path(file_path).name
+        fingerprint = _fingerprint(file_path)
+        report = ImportReport(source=source)
+        started = perf_counter()
+
         with self.get_session() as session:
-            with open(file_path, newline="", encoding="utf-8") as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    existing = (
-                        session.query(ProductIngredient)
-                        .filter_by(name=row["name"])
-                        .first()
-                    )
-                    if existing:
-                        continue
-
-                    # Получаем category_id из CSV и преобразуем в int
-                    category_id = None
-                    if row.get("category_id"):
-                        try:
-                            category_id = int(row["category_id"])
-                        except (ValueError, TypeError):
-                            category_id = None
-
-                    ingredient = ProductIngredient(
-                        name=row["name"],
-                        safety_score=(
-                            int(row["safety_score"])
-                            if row.get("safety_score")
-                            else None
-                        ),
-                        description=row.get("description"),
-                        category_id=category_id,
-                    )
-                    session.add(ingredient)
+            checkpoint = session.query(ImportCheckpoint).filter_by(source=source).first()
+            if checkpoint is None:
+                checkpoint = ImportCheckpoint(source=source, fingerprint=fingerprint)
+                session.add(checkpoint)
+            elif checkpoint.fingerprint == fingerprint and not checkpoint.finished:
+                report.resumed_from = checkpoint.rows_done
+                logger.info(
+                    "Импорт %s продолжается со строки %s", source, report.resumed_from
+                )
+            checkpoint.fingerprint = fingerprint
+            checkpoint.rows_done = report.resumed_from
+            checkpoint.finished = False
+            session.commit()
+
+            rows = _read_rows(file_path)
+            for _ in islice(rows, report.resumed_from):
+                pass
+            rows_done = report.resumed_from
+            for chunk in _chunks(rows, self.chunk_size):
+                written, skipped = write_chunk(session, chunk)
+                rows_done += len(chunk)
+                checkpoint.rows_done = rows_done
+                checkpoint.updated_at = datetime.now(timezone.utc)
                 session.commit()
-        logger.info("Ингредиенты импортированы из CSV!")
+
+                report.chunks += 1
+                report.rows_read += len(chunk)
+                report.rows_written += written
+                report.rows_skipped += skipped
+                logger.debug("Импорт %s: записано строк %s", source, rows_done)
+
+            checkpoint.finished = True
+            session.commit()
+
+        report.seconds = perf_counter() - started
+        self._ingredients_changed()
+        logger.info(
+            "Импорт %s завершён: %s строк (%s записей, %s пропущено) за %.2f с, %.0f строк/с",
+            source,
+            report.rows_read,
+            report.rows_written,
+            report.rows_skipped,
+            report.seconds,
+            report.rows_per_second,
+        )
+        return report
+
+    def _copy_to_staging(self, session, table, columns: list[str], rows: list[dict]):
+        """
+        PostgreSQL: COPY пачки во временную таблицу <table>_staging (очищается при коммите).
+        Возвращает имя staging-таблицы или None, если драйвер не умеет COPY (не psycopg2).
+        """
+        cursor = session.connection().connection.dbapi_connection.cursor()
+        if not hasattr(cursor, "copy_expert"):
+            return None
+        dialect = session.get_bind().dialect
+        staging = f"{table.name}_staging"
+        definitions = ", ".join(
+            f"{name} {table.c[name].type.compile(dialect=dialect)}" for name in columns
+        )
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} ({definitions}) "
+            "ON COMMIT DELETE ROWS"
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # None → пустое поле без кавычек → NULL
+            writer.writerow([row[name] for name in columns])
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        return staging
+
+    def _bulk_upsert(
+        self,
+        session,
+        table,
+        rows: list[dict],
+        key: str,
+        overwrite: bool,
+        version_column: str = None,
+    ):
+        """
+        Один upsert пачки по уникальному столбцу key.
+        overwrite=True — непустые значения из CSV заменяют текущие,
+        overwrite=False — только заполняют пустые поля (вторичный источник).
+        version_column — столбец версии: существующая строка обновляется, только если
+        новое значение в нём не меньше текущего (строка с NULL не обновляется никогда).
+        """
+        if not rows:
+            return
+        columns = list(rows[0])
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            # импорт отсекает такие СУБД раньше, в _check_dialect
+            raise RuntimeError(f"Импорт не поддерживает СУБД {dialect}")
+
+        staging = None
+        if dialect == "postgresql":
+            staging = self._copy_to_staging(session, table, columns, rows)
+        statement = dialect_insert(table)
+        if staging:
+            source = sql_table(staging, *(column(name) for name in columns))
+            statement = statement.from_select(columns, select(*source.c))
+
+        updates = {
+            name: (
+                func.coalesce(statement.excluded[name], table.c[name])
+                if overwrite
+                else func.coalesce(table.c[name], statement.excluded[name])
+            )
+            for name in columns
+            if name != key
+        }
+        if updates:
+            statement = statement.on_conflict_do_update(
+                index_elements=[key],
+                set_=updates,
+                where=statement.excluded[version_column] >= table.c[version_column]
+                if version_column
+                else None,
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[key])
+
+        if staging:
+            session.execute(statement)
+        else:
+            session.execute(statement, rows)
+
+    def _log_changes(self, session, ingredient_ids) -> None:
+        """Журнал изменений одной пачкой + пересчёт оценок затронутых продуктов"""
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+        session.execute(
+            insert(IngredientChange),
+            [{"ingredient_id": i, "operation": "upsert"} for i in ingredient_ids],
+        )
+        self._recompute_product_scores(
+            session, self._affected_product_ids(session, ingredient_ids)
+        )
+
+    # --- категории ---
+    def _write_categories(self, session, chunk: list[dict]) -> tuple[int, int]:
+        records = {}
+        skipped = 0
+        for row in chunk:
+            name_en = _clean(row.get("name_en"))
+            if not name_en:
+                skipped += 1
+                continue
+            _merge(
+                records,
+                name_en,
+                {
+                    "name_en": name_en,
+                    "name_ru": _clean(row.get("name_ru")),
+                    "description": _clean(row.get("description")),
+                },
+            )
+        rows = list(records.values())
+        self._bulk_upsert(
+            session, IngredientCategory.__table__, rows, key="name_en", overwrite=True
+        )
+        # название категории — это «функция» ингредиента в индексе
+        if rows:
+            self._log_changes(
+                session,
+                session.execute(
+                    select(ProductIngredient.id)
+                    .join(IngredientCategory)
+                    .where(IngredientCategory.name_en.in_(list(records)))
+                ).scalars(),
+            )
+        return len(rows), skipped
+
+    def import_categories_from_csv(self, file_path) -> ImportReport:
+        """
+        Импорт категорий (ingredient_categories) из CSV
+        Ожидаемые поля: name_en, name_ru, description
+        """
+        return self._run_import(file_path, self._write_categories)
+
+    def _category_ids(self, session, functions: dict[str, str | None]) -> dict[str, int]:
+        """
+        id категорий по name_en (без учёта регистра), недостающие создаются одной пачкой.
+        :param functions: name_en → name_ru
+        """
+        wanted = {name_en.lower(): name_en for name_en in functions}
+        ids = {}
+
+        def load():
+            for category_id, name_en in session.execute(
+                select(IngredientCategory.id, IngredientCategory.name_en).where(
+                    func.lower(IngredientCategory.name_en).in_(list(wanted))
+                )
+            ):
+                ids[name_en.lower()] = category_id
+
+        load()
+        missing = [
+            {"name_en": name_en, "name_ru": functions[name_en], "description": None}
+            for lowered, name_en in wanted.items()
+            if lowered not in ids
+        ]
+        if missing:
+            self._bulk_upsert(
+                session, IngredientCategory.__table__, missing, key="name_en", overwrite=False
+            )
+            load()
+        return ids
+
+    # --- ингредиенты ---
+    def _write_ingredients(
+        self, session, chunk: list[dict], overwrite: bool = True
+    ) -> tuple[int, int]:
+        records = {}
+        skipped = 0
+        functions = {}  # name_en → name_ru категорий из поля function
+        category_of = {}  # ключ записи → name_en категории
+        for row in chunk:
+            name = _clean(row.get("name"))
+            if not name:
+                skipped += 1
+                continue
+            # дубли без учёта регистра сливаются в одну запись
+            key = name.lower()
+            _merge(
+                records,
+                key,
+                {
+                    "name": name,
+                    "category_id": _to_int(row.get("category_id")),
+                    "safety_score": _to_float(row.get("safety_score")),
+                    "description": _clean(row.get("description")),
+                },
+            )
+            category = _split_function(row.get("function"))
+            if category:
+                functions.setdefault(category[0], category[1])
+                category_of[key] = category[0]
+        if not records:
+            return 0, skipped
+
+        if functions:
+            category_ids = self._category_ids(session, functions)
+            for key, name_en in category_of.items():
+                records[key]["category_id"] = category_ids.get(name_en.lower())
+
+        records = self._resolve_canonical(session, records)
+        rows = list(records.values())
+        self._bulk_upsert(
+            session, ProductIngredient.__table__, rows, key="name", overwrite=overwrite
+        )
+        self._log_changes(
+            session,
+            session.execute(
+                select(ProductIngredient.id).where(
+                    ProductIngredient.name.in_([row["name"] for row in rows])
+                )
+            ).scalars(),
+        )
+        return len(rows), skipped
+
+    def _resolve_canonical(self, session, records: dict[str, dict]) -> dict[str, dict]:
+        """
+        Приводит записи к существующим ингредиентам: «aqua» из inci_data.csv обновляет
+        «Aqua», а синоним («water» → Aqua через ingredient_aliases) заполняет пустые поля
+        канонического ингредиента, а не становится отдельным ингредиентом.
+        Собственное название важнее синонима — как в индексе ингредиентов.
+        """
+        existing = {
+            name.lower(): name
+            for name in session.execute(
+                select(ProductIngredient.name).where(
+                    func.lower(ProductIngredient.name).in_(list(records))
+                )
+            ).scalars()
+        }
+        keys = {
+            key: normalize_ingredient_key(record["name"])
+            for key, record in records.items()
+            if key not in existing
+        }
+        canonical = {}
+        if keys:
+            canonical = dict(
+                session.execute(
+                    select(IngredientAlias.normalized, ProductIngredient.name)
+                    .join(ProductIngredient, IngredientAlias.ingredient_id == ProductIngredient.id)
+                    .where(IngredientAlias.normalized.in_(set(keys.values())))
+                ).all()
+            )
+
+        resolved = {}
+        for key, record in records.items():
+            name = existing.get(key) or canonical.get(keys.get(key))
+            if name is not None:
+                record["name"] = name
+                key = name.lower()
+            # синоним и каноническое название в одной пачке сливаются в одну запись
+            _merge(resolved, key, record)
+        return resolved
+
+    def import_ingredients_from_csv(self, file_path) -> ImportReport:
+        """
+        Импорт ингредиентов (product_ingredients) из CSV
+        Ожидаемые поля: name, category_id, safety_score, description
+        """
+        return self._run_import(file_path, self._write_ingredients)
+
+    def import_inci_from_csv(self, file_path) -> ImportReport:
+        """
+        Импорт словаря INCI (inci_data.csv) — вторичный источник: заполняет пустые поля
+        существующих ингредиентов и добавляет новые.
+        Ожидаемые поля: name, function, safety_score, description
+        Категория берётся из function (создаётся, если её нет).
+        """
+        return self._run_import(
+            file_path,
+            lambda session, chunk: self._write_ingredients(session, chunk, overwrite=False),
+        )
+
+    # --- синонимы ---
+    def _write_aliases(self, session, chunk: list[dict]) -> tuple[int, int]:
+        records = {}  # normalized → запись; первая в пачке побеждает, как в индексе
+        skipped = 0
+        for row in chunk:
+            normalized = normalize_ingredient_key(row.get("alias") or "")
+            ingredient = _clean(row.get("ingredient"))
+            if not normalized or not ingredient:
+                skipped += 1
+                continue
+            records.setdefault(
+                normalized,
+                {
+                    "alias": row["alias"].strip(),
+                    "normalized": normalized,
+                    "language": _clean(row.get("language")),
+                    "ingredient": ingredient,
+                },
+            )
+        # уже загруженные синонимы не трогаем
+        for normalized in session.execute(
+            select(IngredientAlias.normalized).where(
+                IngredientAlias.normalized.in_(list(records))
+            )
+        ).scalars():
+            records.pop(normalized, None)
+        if not records:
+            return 0, skipped
+
+        # каноническое название ингредиента: по названию или по уже известному синониму
+        targets = {
+            record["ingredient"].lower(): {"name": record["ingredient"]}
+            for record in records.values()
+        }
+        # _resolve_canonical заменяет name в записях на каноническое
+        self._resolve_canonical(session, targets)
+        ids = dict(
+            session.execute(
+                select(func.lower(ProductIngredient.name), ProductIngredient.id).where(
+                    func.lower(ProductIngredient.name).in_(
+                        {target["name"].lower() for target in targets.values()}
+                    )
+                )
+            ).all()
+        )
+
+        rows = []
+        for record in records.values():
+            target = targets[record.pop("ingredient").lower()]
+            ingredient_id = ids.get(target["name"].lower())
+            if ingredient_id is None:
+                skipped += 1
+                logger.warning(
+                    "Синоним пропущен, ингредиент не найден: %s", record["alias"]
+                )
+                continue
+            rows.append({**record, "ingredient_id": ingredient_id})
+        self._bulk_upsert(
+            session, IngredientAlias.__table__, rows, key="normalized", overwrite=False
+        )
+        # журнал изменений: воркеры подхватят синонимы без перезапуска
+        changed = {row["ingredient_id"] for row in rows}
+        if changed:
+            session.execute(
+                insert(IngredientChange),
+                [{"ingredient_id": i, "operation": "upsert"} for i in changed],
+            )
+        return len(rows), skipped
+
+    def import_aliases_from_csv(self, file_path) -> ImportReport:
+        """
+        Импорт синонимов ингредиентов (ingredient_aliases) из CSV
+        Ожидаемые поля: alias, ingredient (каноническое название), language
+        Синонимы неизвестных ингредиентов пропускаются, загруженные ранее — не меняются.
+        """
+        return self._run_import(file_path, self._write_aliases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт справочников из CSV")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--csv-dir", type=Path, default=CSV_DIR)
+    args = parser.parse_args()
+
+    importer = CSVToDB(chunk_size=args.chunk_size)
+    importer.create_tables()
+    reports = [
+        importer.import_categories_from_csv(args.csv_dir / "ingredient_categories.csv"),
+        importer.import_ingredients_from_csv(args.csv_dir / "ingredients.csv"),
+    ]
+    # синонимы — до словаря INCI, чтобы его «water» попал в Aqua, и ещё раз после:
+    # для ингредиентов, которые есть только в INCI (уже загруженные пропускаются)
+    reports.append(importer.import_aliases_from_csv(args.csv_dir / "ingredient_aliases.csv"))
+    reports.append(importer.import_inci_from_csv(args.csv_dir / "inci_data.csv"))
+    reports.append(importer.import_aliases_from_csv(args.csv_dir / "ingredient_aliases.csv"))
+    for report in reports:
+        print(
+            f"{report.source}: {report.rows_read} строк, {report.rows_written} записано, "
+            f"{report.rows_skipped} пропущено, {report.rows_per_second:.0f} строк/с"
+            + (f" (продолжено со строки {report.resumed_from})" if report.resumed_from else "")
+        )
 
 
 if __name__ == "__main__":
-    # CSVToDB().import_categories_from_csv("csv_files/ingredient_categories.csv")
-    CSVToDB().import_ingredients_from_csv("csv_files/ingredients.csv")
+    main()
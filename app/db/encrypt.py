@@ -1,20 +1,159 @@
+import argparse
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
-import logging
+from argon2.profiles import RFC_9106_LOW_MEMORY
+from decouple import config
+
+from app.core.metrics import register_metrics_source
 
 logger = logging.getLogger(__name__)
 
+# Параметры Argon2 (по умолчанию — профиль RFC 9106 LOW_MEMORY, как у PasswordHasher()).
+# Подобрать под свой сервер: python -m app.db.encrypt --target-ms 250
+# Хеши со старыми параметрами пересчитываются при следующем успешном входе.
+ARGON2_TIME_COST = config(
+    "ARGON2_TIME_COST", default=RFC_9106_LOW_MEMORY.time_cost, cast=int
+)
+ARGON2_MEMORY_COST = config(  # KiB
+    "ARGON2_MEMORY_COST", default=RFC_9106_LOW_MEMORY.memory_cost, cast=int
+)
+ARGON2_PARALLELISM = config(
+    "ARGON2_PARALLELISM", default=RFC_9106_LOW_MEMORY.parallelism, cast=int
+)
+# Сколько хешей считается одновременно в процессе. Пиковая память Argon2 —
+# ARGON2_MAX_CONCURRENCY × ARGON2_MEMORY_COST; остальные запросы ждут в очереди,
+# не занимая CPU и не вытесняя остальные маршруты.
+ARGON2_MAX_CONCURRENCY = config(
+    "ARGON2_MAX_CONCURRENCY", default=min(4, os.cpu_count() or 1), cast=int
+)
+
+
+def make_hasher(
+    time_cost: int = ARGON2_TIME_COST,
+    memory_cost: int = ARGON2_MEMORY_COST,
+    parallelism: int = ARGON2_PARALLELISM,
+) -> PasswordHasher:
+    return PasswordHasher(
+        time_cost=time_cost,
+        memory_cost=memory_cost,
+        parallelism=parallelism,
+        hash_len=RFC_9106_LOW_MEMORY.hash_len,
+        salt_len=RFC_9106_LOW_MEMORY.salt_len,
+    )
+
+
+# PasswordHasher не хранит состояния — один на процесс
+_hasher = make_hasher()
+
+
+class Argon2Executor:
+    """
+    Отдельный ограниченный пул потоков для Argon2.
+    argon2-cffi отпускает GIL на время хеширования, поэтому хеши считаются параллельно,
+    но не больше max_workers одновременно. Пул создаётся при первом вызове
+    (после fork воркера, а не в мастер-процессе).
+    """
+
+    def __init__(self, max_workers: int = ARGON2_MAX_CONCURRENCY):
+        self.max_workers = max(1, max_workers)
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_running = 0
+        self._completed = 0
+        self._total_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="argon2"
+                    )
+        return self._pool
+
+    def _timed(self, submitted: float, fn, *args):
+        started = perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._max_running = max(self._max_running, self._running)
+            self._max_wait_seconds = max(self._max_wait_seconds, started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._total_seconds += perf_counter() - started
+
+    def run(self, fn, *args):
+        """Выполняет fn(*args) в пуле Argon2 и ждёт результат (исключения пробрасываются)"""
+        with self._lock:
+            self._queued += 1
+        return self._get_pool().submit(self._timed, perf_counter(), fn, *args).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "max_running": self._max_running,
+                "completed": self._completed,
+                "avg_ms": round(self._total_seconds / self._completed * 1000, 3)
+                if self._completed
+                else 0.0,
+                "max_wait_ms": round(self._max_wait_seconds * 1000, 3),
+            }
+
+
+argon2_executor = Argon2Executor()
+register_metrics_source("argon2", argon2_executor.stats)
+
+# Фоновые записи (сохранение пересчитанного хеша): ответ на вход их не ждёт
+_background: ThreadPoolExecutor | None = None
+_background_lock = threading.Lock()
+
+
+def run_in_background(fn, *args) -> Future:
+    """Выполняет fn(*args) в фоновом потоке; ошибка только логируется"""
+    global _background
+    if _background is None:
+        with _background_lock:
+            if _background is None:
+                _background = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="argon2-rehash"
+                )
+
+    def call():
+        try:
+            return fn(*args)
+        except Exception:
+            logger.exception("Ошибка фоновой задачи: %s", getattr(fn, "__name__", fn))
+
+    return _background.submit(call)
+
 
 class EncryptData:
     """Класс для работы с шифрованием данных"""
 
-    def __init__(self):
-        self.ph = PasswordHasher()
+    def __init__(self, hasher: PasswordHasher = None, executor: Argon2Executor = None):
+        self.ph = hasher or _hasher
+        self.executor = executor or argon2_executor
 
     def hash_password(self, password: str) -> str:
         """Создать новый Argon2-хеш"""
         logger.info("Создан новый Argon2-хеш")
-        return self.ph.hash(password)
+        return self.executor.run(self.ph.hash, password)
 
     def verify_password(
         self, stored_hash: str, password: str
@@ -25,12 +164,83 @@ class EncryptData:
         Если is_valid=True и new_hash не None -> нужно обновить хеш в базе.
         """
         if stored_hash.startswith("$argon2"):  # проверка, что Argon2
-            try:
-                self.ph.verify(stored_hash, password)
-                if self.ph.check_needs_rehash(stored_hash):
-                    # пароль верный, но параметры устарели — пересчитаем
-                    return True, self.ph.hash(password)
-                return True, None
-            except VerifyMismatchError:
-                return False, None
+            return self.executor.run(self._verify, stored_hash, password)
         return False, None
+
+    def _verify(self, stored_hash: str, password: str) -> tuple[bool, str | None]:
+        try:
+            self.ph.verify(stored_hash, password)
+        except VerifyMismatchError:
+            return False, None
+        if self.ph.check_needs_rehash(stored_hash):
+            # пароль верный, но параметры устарели — пересчитаем
+            return True, self.ph.hash(password)
+        return True, None
+
+
+def _measure(hasher: PasswordHasher, rounds: int) -> float:
+    """Медианное время одного хеша, секунды"""
+    timings = []
+    for _ in range(rounds):
+        started = perf_counter()
+        hasher.hash("calibration-password")
+        timings.append(perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate(
+    target_ms: float,
+    max_memory_kib: int = RFC_9106_LOW_MEMORY.memory_cost,
+    parallelism: int = ARGON2_PARALLELISM,
+    rounds: int = 3,
+) -> tuple[int, int, float]:
+    """
+    Подбирает (time_cost, memory_cost, ms) под целевую задержку на этом сервере.
+    Как в RFC 9106: память — максимально допустимая, time_cost — наибольший, при котором
+    хеш укладывается в цель; если уже time_cost=1 медленнее цели — память уменьшается вдвое.
+    """
+    memory_cost = max_memory_kib
+    min_memory = 8 * parallelism  # минимум Argon2
+    while True:
+        elapsed_ms = _measure(make_hasher(1, memory_cost, parallelism), rounds) * 1000
+        if elapsed_ms > target_ms and memory_cost // 2 >= min_memory:
+            memory_cost //= 2
+            continue
+        break
+    # время растёт с time_cost почти линейно — оценка, затем уточнение вниз
+    time_cost = max(1, int(target_ms / elapsed_ms))
+    while time_cost > 1:
+        measured_ms = _measure(make_hasher(time_cost, memory_cost, parallelism), rounds) * 1000
+        if measured_ms <= target_ms:
+            return time_cost, memory_cost, measured_ms
+        time_cost = max(1, int(time_cost * target_ms / measured_ms))
+    return 1, memory_cost, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Подбор параметров Argon2 под целевую задержку хеширования на этом сервере"
+    )
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument(
+        "--max-memory-mib", type=int, default=RFC_9106_LOW_MEMORY.memory_cost // 1024
+    )
+    parser.add_argument("--parallelism", type=int, default=ARGON2_PARALLELISM)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    time_cost, memory_cost, elapsed_ms = calibrate(
+        args.target_ms, args.max_memory_mib * 1024, args.parallelism, args.rounds
+    )
+    print(f"# хеш ≈ {elapsed_ms:.0f} мс (цель {args.target_ms:.0f} мс)")
+    print(
+        f"# пиковая память Argon2 ≈ {ARGON2_MAX_CONCURRENCY * memory_cost // 1024} MiB "
+        f"при ARGON2_MAX_CONCURRENCY={ARGON2_MAX_CONCURRENCY}"
+    )
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print(f"ARGON2_PARALLELISM={args.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,10 @@ class ProductIngredient(Base):
     # внешний ключ на категорию (назначение/функцию)
     category_id = Column(Integer, ForeignKey("ingredient_categories.id"), nullable=True)
     category = relationship("IngredientCategory", back_populates="ingredients")
+    # синонимы и альтернативные написания (Water, Вода, Eau → Aqua)
+    aliases = relationship(
+        "IngredientAlias", back_populates="ingredient", cascade="all, delete-orphan"
+    )
 
     def __repr__(self):
         return (
@@ -47,6 +51,79 @@ class ProductIngredient(Base):
         }
 
 
+class IngredientAlias(Base):
+    """Синоним / альтернативное написание ингредиента (латынь, английский, русский)"""
+
+    __tablename__ = "ingredient_aliases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alias = Column(String, nullable=False)  # написание как в источнике
+    # ключ поиска, см. app.analyzers.ingredient_normalizer.normalize_ingredient_key
+    normalized = Column(String, nullable=False, unique=True, index=True)
+    language = Column(String(8), nullable=True)  # la / en / ru / fr ...
+    ingredient_id = Column(
+        Integer, ForeignKey("product_ingredients.id"), nullable=False, index=True
+    )
+    ingredient = relationship("ProductIngredient", back_populates="aliases")
+
+    def __repr__(self):
+        return (
+            f"IngredientAlias(id={self.id}, alias='{self.alias}', "
+            f"ingredient_id={self.ingredient_id}, language='{self.language}')"
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "alias": self.alias,
+            "normalized": self.normalized,
+            "language": self.language,
+            "ingredient_id": self.ingredient_id,
+        }
+
+
+class IngredientChange(Base):
+    """Журнал изменений ингредиентов.
+    id — ревизия данных: воркеры запоминают последнюю применённую и дочитывают
+    изменения после неё. id выдаются при вставке, а не при фиксации, поэтому
+    пропуски перечитываются (IngredientIndex._gaps)
+    """
+
+    __tablename__ = "ingredient_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # ревизия
+    # без внешнего ключа: запись об удалении переживает сам ингредиент
+    ingredient_id = Column(Integer, nullable=False)
+    operation = Column(String(16), nullable=False)  # upsert / delete
+    changed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (
+            f"IngredientChange(id={self.id}, ingredient_id={self.ingredient_id}, "
+            f"operation='{self.operation}')"
+        )
+
+
+class ImportCheckpoint(Base):
+    """Прогресс импорта CSV: после сбоя импорт продолжается с последней записанной пачки"""
+
+    __tablename__ = "import_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(255), unique=True, nullable=False)  # имя файла
+    # размер и время изменения файла: изменённый файл импортируется заново
+    fingerprint = Column(String(64), nullable=False)
+    rows_done = Column(Integer, nullable=False, default=0)  # строк CSV уже записано
+    finished = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (
+            f"ImportCheckpoint(source='{self.source}', rows_done={self.rows_done}, "
+            f"finished={self.finished})"
+        )
+
+
 class IngredientCategory(Base):
     """Класс для категорий ингредиентов"""
 
@@ -98,6 +175,8 @@ product_ingredients_link = Table(
     Column(
         "ingredient_id", Integer, ForeignKey("product_ingredients.id"), primary_key=True
     ),
+    # позиция в составе (0 — первый): от неё зависит вес ингредиента в оценке продукта
+    Column("position", Integer, nullable=True),
 )
 
 
@@ -115,20 +194,34 @@ class Product(Base):
     barcode = Column(String(32), unique=True, nullable=False, index=True)
     name = Column(String(255), nullable=False)
     brand = Column(String(255), nullable=True)
+    category = Column(String(512), nullable=True)
 
     ingredients_text = Column(Text, nullable=True)  # Английский текст ингредиентов
     ingredients_text_ru = Column(Text, nullable=True)  # Русский текст ингредиентов
 
     image_url = Column(String(512), nullable=True)
     packaging = Column(String(255), nullable=True)
-    quantity = Column(Integer, nullable=True)
+    quantity = Column(Integer, nullable=True)  # только если вес — целое число без единиц
+    weight = Column(String(255), nullable=True)  # вес/объём как в источнике: «0.5 L», «3 x 10 g»
     countries = Column(String(255), nullable=True)
 
     created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    # Когда данные получены из OpenBeautyFacts (UTC, без tzinfo); None — продукт
+    # добавлен вручную и обновлению из API не подлежит
+    fetched_at = Column(DateTime, nullable=True, index=True)
 
-    # Связь с ингредиентами
+    # Общая оценка безопасности (app.analyzers.safety_score), пересчитывается
+    # при изменении оценок ингредиентов — по ней можно сортировать и фильтровать
+    safety_score = Column(Float, nullable=True, index=True)
+    risk_count = Column(Integer, nullable=True)  # ингредиентов с высоким риском
+    unknown_count = Column(Integer, nullable=True)  # ингредиентов без оценки
+
+    # Связь с ингредиентами (в порядке состава)
     ingredients = relationship(
-        "ProductIngredient", secondary=product_ingredients_link, backref="products"
+        "ProductIngredient",
+        secondary=product_ingredients_link,
+        backref="products",
+        order_by=product_ingredients_link.c.position,
     )
 
     def __repr__(self):
@@ -140,14 +233,20 @@ class Product(Base):
             "barcode": self.barcode,
             "name": self.name,
             "brand": self.brand,
+            "category": self.category,
             "ingredients_text": self.ingredients_text,
             "ingredients_text_ru": self.ingredients_text_ru,
             "image_url": self.image_url,
             "packaging": self.packaging,
             "quantity": self.quantity,
+            "weight": self.weight,
             "countries": self.countries,
+            "safety_score": self.safety_score,
+            "risk_count": self.risk_count,
+            "unknown_count": self.unknown_count,
             "ingredients": [i.to_dict() for i in self.ingredients],
             "created_at": self.created_at,
+            "fetched_at": self.fetched_at,
         }
 
 
@@ -158,11 +257,11 @@ class User(Base, UserMixin):
         return any(role.name == role_name for role in self.roles)
 
     def has_permission(self, permission_name: str) -> bool:
-        return any(
-            permission.name == permission_name
-            for role in self.roles
-            for permission in role.permissions
-        )
+        from app.auth.rbac.matrix import get_permission_matrix
+
+        matrix = get_permission_matrix()
+        mask = matrix.mask_for_roles(role.id for role in self.roles)
+        return matrix.allows(mask, permission_name)
 
     __tablename__ = "users"
 
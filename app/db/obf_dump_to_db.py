@@ -0,0 +1,298 @@
+import argparse
+import csv
+import gzip
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+
+from decouple import config
+from sqlalchemy import select
+
+from app.db.csv_to_db import IMPORT_CHUNK_SIZE, CSVToDB, _chunks
+from app.db.models import Product, product_ingredients_link
+from app.schemas.product_dto import ProductDTO
+from app.schemas.product_mapper import product_columns, product_from_openbeautyfacts
+from app.schemas.products_schema import OpenBeautyFactsProduct, ProductCreateSchema
+from app.services.local_product_index import OBF_DUMP_INDEX_DIR, LocalIndexWriter
+
+logger = logging.getLogger(__name__)
+
+# Импорт выгрузки OpenBeautyFacts (https://world.openbeautyfacts.org/data):
+# JSONL (openbeautyfacts-products.jsonl.gz, дельты *.json.gz) или CSV с табуляцией
+# (en.openbeautyfacts.org.products.csv.gz), сжатые gzip или нет.
+# - файл читается потоково, по строке — выгрузка в несколько ГБ не загружается в память;
+# - запись проверяется схемой OpenBeautyFactsProduct и приводится к ProductDTO тем же
+#   маппером, что и ответы API;
+# - продукты пачками upsert-ятся в products (fetched_at — время выгрузки; продукты,
+#   добавленные вручную, не трогаются) и пишутся в локальный индекс штрих-код → смещение,
+#   по которому поиск находит их без сети.
+# Строка в БД обновляется, только если её fetched_at не новее времени выгрузки: продукт,
+# недавно полученный из API, старая выгрузка не откатывает (дубли внутри одной выгрузки
+# по-прежнему — последняя запись побеждает).
+# Привязка ингредиентов и оценка для новых продуктов выгрузки не считаются — это
+# поштучная работа, которая сделала бы импорт на порядки медленнее; у продуктов, чей
+# состав выгрузка изменила, привязка пересчитывается, чтобы не остаться от старого состава.
+
+# CSV-выгрузка использует другие имена колонок, чем API
+_CSV_FALLBACKS = {
+    "ingredients_text_en": "ingredients_text",
+    "image_front_url": "image_url",
+}
+# тексты составов в CSV бывают длиннее стандартного предела модуля csv (128 КБ)
+_CSV_FIELD_LIMIT = config("OBF_DUMP_CSV_FIELD_LIMIT", default=16 * 1024 * 1024, cast=int)
+
+
+@dataclass
+class DumpImportReport:
+    source: str
+    records_read: int = 0  # записей выгрузки прочитано
+    products_written: int = 0  # продуктов записано в БД
+    products_indexed: int = 0  # продуктов в индексе после импорта
+    records_skipped: int = 0  # битые строки, неверные штрих-коды, продукты без данных
+    manual_skipped: int = 0  # продукты, добавленные вручную, — не перезаписываются
+    newer_skipped: int = 0  # продукты, полученные позже выгрузки, — не перезаписываются
+    products_relinked: int = 0  # продукты, у которых изменился состав
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records_read / self.seconds if self.seconds else 0.0
+
+
+def _open_text(file_path: Path):
+    if file_path.suffix == ".gz":
+        return gzip.open(file_path, "rt", encoding="utf-8", newline="")
+    return open(file_path, encoding="utf-8", newline="")
+
+
+def _is_csv(file_path: Path) -> bool:
+    suffixes = file_path.suffixes[-2:] if file_path.suffix == ".gz" else file_path.suffixes[-1:]
+    return bool(suffixes) and suffixes[0] in (".csv", ".tsv")
+
+
+def _read_records(file_path: Path) -> Iterator[dict | None]:
+    """Записи выгрузки по одной; None — строка, которую не удалось разобрать"""
+    with _open_text(file_path) as dump:
+        if _is_csv(file_path):
+            csv.field_size_limit(_CSV_FIELD_LIMIT)
+            header = dump.readline()
+            # выгрузка OpenBeautyFacts — табуляция без кавычек; обычный CSV — запятые
+            options = (
+                {"delimiter": "\t", "quoting": csv.QUOTE_NONE}
+                if "\t" in header
+                else {"delimiter": ","}
+            )
+            fieldnames = next(csv.reader([header], **options))
+            yield from csv.DictReader(dump, fieldnames=fieldnames, **options)
+            return
+        for line in dump:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield record if isinstance(record, dict) else None
+
+
+def _text(value) -> str | None:
+    """Значение поля выгрузки → строка (в JSONL часть полей — списки или числа)"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        value = ", ".join(str(item) for item in value if item)
+    value = str(value).strip()
+    return value or None
+
+
+def to_product(record: dict | None) -> ProductDTO | None:
+    """Запись выгрузки → ProductDTO или None (неверный штрих-код или запись)"""
+    if record is None:
+        return None
+    fields = {}
+    for name in OpenBeautyFactsProduct.model_fields:
+        value = _text(record.get(name))
+        if value is None and name in _CSV_FALLBACKS:
+            value = _text(record.get(_CSV_FALLBACKS[name]))
+        fields[name] = value
+    if not fields["product_name"] and not fields["ingredients_text_en"]:
+        # без названия и состава продукт бесполезен
+        return None
+    try:
+        barcode = ProductCreateSchema.validate_barcode(_text(record.get("code")) or "")
+        product = OpenBeautyFactsProduct.model_validate(fields)
+    except ValueError:
+        return None
+    return product_from_openbeautyfacts(barcode, product)
+
+
+class OBFDumpToDB(CSVToDB):
+    """Импорт выгрузки OpenBeautyFacts; пачки и upsert — общие с импортом CSV"""
+
+    def _existing(self, session, barcodes) -> dict:
+        """штрих-код → (id, fetched_at, ingredients_text) продуктов пачки, уже лежащих в БД"""
+        return {
+            barcode: (product_id, fetched_at, ingredients_text)
+            for barcode, product_id, fetched_at, ingredients_text in session.execute(
+                select(
+                    Product.barcode, Product.id, Product.fetched_at, Product.ingredients_text
+                ).where(Product.barcode.in_(list(barcodes)))
+            )
+        }
+
+    def _relink(self, session, product_ids: list[int]) -> bool:
+        """
+        Привязка ингредиентов и оценка заново — для продуктов с изменённым составом.
+        :return: созданы ли новые ингредиенты
+        """
+        session.execute(
+            product_ingredients_link.delete().where(
+                product_ingredients_link.c.product_id.in_(product_ids)
+            )
+        )
+        created = False
+        for product_id in product_ids:
+            product = session.get(Product, product_id)
+            self._apply_product_score(product, [])
+            created |= self._link_product_ingredients(session, product)
+        return created
+
+    def _write_products(self, session, products: dict[str, ProductDTO], fetched_at, report):
+        existing = self._existing(session, products)
+        rows, relink = [], []
+        for barcode, data in products.items():
+            current = existing.get(barcode)
+            if current is not None:
+                product_id, current_fetched_at, current_ingredients = current
+                if current_fetched_at is None:
+                    report.manual_skipped += 1
+                    continue
+                if current_fetched_at > fetched_at:
+                    report.newer_skipped += 1
+                    continue
+                # пустой состав в выгрузке не стирает текущий (upsert с coalesce)
+                if data.ingredients and data.ingredients != current_ingredients:
+                    relink.append(product_id)
+            rows.append(product_columns(data, fetched_at))
+        # условие и в самом upsert: строку могли обновить между чтением и записью
+        self._bulk_upsert(
+            session,
+            Product.__table__,
+            rows,
+            key="barcode",
+            overwrite=True,
+            version_column="fetched_at",
+        )
+        ingredients_created = self._relink(session, relink) if relink else False
+        session.commit()
+        if ingredients_created:
+            self._ingredients_changed()
+        report.products_written += len(rows)
+        report.products_relinked += len(relink)
+
+    def import_dump(
+        self,
+        file_path,
+        index_dir=OBF_DUMP_INDEX_DIR,
+        delta: bool = False,
+        dump_time: datetime = None,
+        load_db: bool = True,
+    ) -> DumpImportReport:
+        """
+        Импорт выгрузки или дельты (delta=True — индекс дополняется, а не строится заново).
+        dump_time — момент выгрузки (по умолчанию — время изменения файла), пишется в
+        fetched_at. index_dir пустой — индекс не строится; load_db=False — только индекс.
+        """
+        if load_db:
+            self._check_dialect()
+        file_path = Path(file_path)
+        if dump_time is None:
+            dump_time = datetime.fromtimestamp(file_path.stat().st_mtime, timezone.utc)
+        fetched_at = dump_time.astimezone(timezone.utc).replace(tzinfo=None)
+        report = DumpImportReport(source=file_path.name)
+        started = perf_counter()
+
+        writer = LocalIndexWriter(index_dir, delta=delta) if index_dir else None
+        try:
+            with self.get_session() as session:
+                for chunk in _chunks(_read_records(file_path), self.chunk_size):
+                    products = {}
+                    for record in chunk:
+                        data = to_product(record)
+                        if data is None:
+                            report.records_skipped += 1
+                            continue
+                        # повтор штрих-кода в пачке: последняя запись новее
+                        products[data.barcode] = data
+                    if writer is not None:
+                        for data in products.values():
+                            writer.add(data, dump_time.timestamp())
+                    if load_db and products:
+                        self._write_products(session, products, fetched_at, report)
+                    report.chunks += 1
+                    report.records_read += len(chunk)
+                    logger.debug(
+                        "Импорт %s: прочитано записей %s", report.source, report.records_read
+                    )
+            if writer is not None:
+                report.products_indexed = writer.commit()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+
+        report.seconds = perf_counter() - started
+        logger.info(
+            "Импорт выгрузки %s завершён: %s записей (%s в БД, %s в индексе, %s пропущено) "
+            "за %.2f с, %.0f записей/с",
+            report.source,
+            report.records_read,
+            report.products_written,
+            report.products_indexed,
+            report.records_skipped,
+            report.seconds,
+            report.records_per_second,
+        )
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт выгрузки OpenBeautyFacts")
+    parser.add_argument("dump", type=Path, help="JSONL/CSV выгрузка или дельта, можно .gz")
+    parser.add_argument("--delta", action="store_true", help="дополнить индекс, а не строить заново")
+    parser.add_argument("--index-dir", default=OBF_DUMP_INDEX_DIR)
+    parser.add_argument("--no-db", action="store_true", help="только индекс, без записи в БД")
+    parser.add_argument(
+        "--dump-time",
+        type=datetime.fromisoformat,
+        default=None,
+        help="момент выгрузки (ISO 8601), по умолчанию — время изменения файла",
+    )
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    importer = OBFDumpToDB(chunk_size=args.chunk_size)
+    importer.create_tables()
+    report = importer.import_dump(
+        args.dump,
+        index_dir=args.index_dir,
+        delta=args.delta,
+        dump_time=args.dump_time,
+        load_db=not args.no_db,
+    )
+    print(
+        f"{report.source}: {report.records_read} записей, {report.products_written} в БД, "
+        f"{report.products_indexed} в индексе, {report.records_skipped} пропущено, "
+        f"{report.records_per_second:.0f} записей/с"
+    )
+
+
+if __name__ == "__main__":
+    main()
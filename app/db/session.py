@@ -1,9 +1,19 @@
 # подключение/engine/Session
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
 from decouple import config
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect
+from flask import g, has_app_context
+from sqlalchemy import create_engine, exc, inspect
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 import logging
+
+from app.core.metrics import register_metrics_source
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -16,34 +26,200 @@ except Exception:
     )
     DATABASE_URL = "sqlite:///./test.db"  # Используем SQLite для тестирования
 
+# Пул соединений: один на процесс (воркер) для каждого DATABASE_URL
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=5, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=10, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=30, cast=float)
+# проверка соединения перед выдачей (переживает рестарт БД / обрыв idle-соединений)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", default=True, cast=bool)
+# пересоздавать соединения старше N секунд (меньше idle-таймаутов БД и балансировщиков)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", default=1800, cast=int)
+
 Base = declarative_base()  # Базовый класс для определения моделей (таблиц ORM)
 
 
+class _TimedQueuePool(QueuePool):
+    """QueuePool, считающий время выдачи соединения и выдачи сверх pool_size"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.max_overflow_seen = 0
+        self.timeouts = 0
+        self.total_checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+
+    def connect(self):
+        started = perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        elapsed = perf_counter() - started
+        self.checkouts += 1
+        self.total_checkout_seconds += elapsed
+        self.max_checkout_seconds = max(self.max_checkout_seconds, elapsed)
+        overflow = self.overflow()
+        if overflow > 0:
+            self.overflow_checkouts += 1
+            self.max_overflow_seen = max(self.max_overflow_seen, overflow)
+        return connection
+
+    def recreate(self):
+        # dispose() пересоздаёт пул — счётчики переносим, чтобы метрики не обнулялись
+        new_pool = super().recreate()
+        for name in (
+            "checkouts",
+            "overflow_checkouts",
+            "max_overflow_seen",
+            "timeouts",
+            "total_checkout_seconds",
+            "max_checkout_seconds",
+        ):
+            setattr(new_pool, name, getattr(self, name))
+        return new_pool
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "max_overflow_seen": self.max_overflow_seen,
+            "timeouts": self.timeouts,
+            "avg_checkout_ms": round(
+                self.total_checkout_seconds / self.checkouts * 1000, 3
+            )
+            if self.checkouts
+            else 0.0,
+            "max_checkout_ms": round(self.max_checkout_seconds * 1000, 3),
+        }
+
+
+# url → (engine, фабрика сессий)
+_engines: dict[str, tuple] = {}
+_engines_lock = threading.Lock()
+
+
+def _create_engine(db_url: str):
+    url = make_url(db_url)
+    options = {"future": True, "pool_pre_ping": DB_POOL_PRE_PING}
+    # SQLite в памяти живёт, пока открыто соединение, — для неё свой пул SQLAlchemy
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=_TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    engine = create_engine(db_url, **options)
+    logger.info(
+        "Подключение к БД создано: %s", url.render_as_string(hide_password=True)
+    )
+    return engine
+
+
+def get_engine(db_url: str = DATABASE_URL):
+    """Engine и фабрика сессий для db_url — создаются один раз на процесс"""
+    cached = _engines.get(db_url)
+    if cached is None:
+        with _engines_lock:
+            cached = _engines.get(db_url)
+            if cached is None:
+                engine = _create_engine(db_url)
+                session_factory = sessionmaker(
+                    bind=engine,  # подключение к конкретной базе
+                    autoflush=False,  # автоматическая очистка изменений перед запросами
+                    autocommit=False,  # управление транзакциями вручную
+                    class_=Session,  # используем ORM сессию
+                )
+                cached = _engines[db_url] = (engine, session_factory)
+    return cached
+
+
+def pool_stats() -> dict:
+    """Метрики пулов соединений процесса (по одному на DATABASE_URL)"""
+    result = {}
+    for engine, _ in list(_engines.values()):
+        pool = engine.pool
+        name = engine.url.render_as_string(hide_password=True)
+        result[name] = pool.stats() if isinstance(pool, _TimedQueuePool) else {
+            "pool": type(pool).__name__
+        }
+    return result
+
+
+register_metrics_source("db_pool", pool_stats)
+
+
+def _request_session(db_url: str, session_factory, engine) -> Session:
+    """
+    Сессия текущего запроса (контекста приложения Flask) для db_url.
+    Привязана к одному соединению из пула: все CRUD-вызовы запроса идут через него.
+    Закрывается в close_request_sessions (teardown_appcontext).
+    """
+    sessions = g.setdefault("_db_sessions", {})
+    entry = sessions.get(db_url)
+    if entry is None:
+        connection = engine.connect()
+        entry = sessions[db_url] = (connection, session_factory(bind=connection))
+    return entry[1]
+
+
+def close_request_sessions(exception=None) -> None:
+    """Закрывает сессии запроса и возвращает их соединения в пул"""
+    sessions = g.pop("_db_sessions", None)
+    if not sessions:
+        return
+    for connection, session in sessions.values():
+        try:
+            # незакоммиченные изменения откатываются, как при выходе из with-блока
+            session.close()
+        finally:
+            connection.close()
+
+
+@contextmanager
+def _shared_session_scope(session: Session):
+    """with-блок над сессией запроса: не закрывает её, но откатывает при ошибке"""
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+
+
 class Database:
     """Класс для работы с PostgreSQL через SQLAlchemy"""
 
     def __init__(self, db_url: str = DATABASE_URL):
-        self.engine = create_engine(
-            db_url, future=True
-        )  # создаём подключение к базе данных
-        logger.debug("Подключение к БД создано!")
-        # Создаём фабрику сессий
-        self.SessionLocal = sessionmaker(
-            bind=self.engine,  # подключение к конкретной базе
-            autoflush=False,  # автоматическая очистка изменений перед запросами
-            autocommit=False,  # управление транзакциями вручную
-            class_=Session,  # используем ORM сессию
-        )
-        logger.debug("Фабрика сессий создана!")
-        self.inspect = inspect(self.engine)
+        self.db_url = db_url
+        # engine и пул общие для всех экземпляров с тем же db_url
+        self.engine, self.SessionLocal = get_engine(db_url)
+
+    @property
+    def inspect(self):
+        """Свежий Inspector (кэширует отражённую схему, поэтому не храним его)"""
+        return inspect(self.engine)
 
     def get_session(self):
         """Метод для получения сессии через контекстный менеджер
         Пример использования:
             with db.get_session() as session:
                 # работа с базой
+
+        Внутри контекста приложения Flask возвращается общая сессия запроса
+        (одно соединение на запрос); закрывается она в конце запроса, а не после with.
+        Вне Flask (скрипты, импорт CSV) — новая сессия, закрывается после with.
         """
-        logger.debug("Получен объект сессии: %s", self.SessionLocal())
+        if has_app_context():
+            return _shared_session_scope(
+                _request_session(self.db_url, self.SessionLocal, self.engine)
+            )
         return (
             self.SessionLocal()
         )  # Возвращает объект сессии, который закрывается после выхода из блока with
@@ -0,0 +1,114 @@
+import argparse
+import logging
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+
+from app.db.crud import OtrazhenieDB
+from app.db.models import Product, product_ingredients_link
+from app.db.session import DATABASE_URL, Base
+
+logger = logging.getLogger(__name__)
+
+# Обновление схемы существующей базы до текущих моделей.
+# create_all создаёт только недостающие таблицы: в таблицы, созданные раньше,
+# новые столбцы (оценка продукта, fetched_at, weight, category, position связи
+# с ингредиентами) он не добавляет — и любой запрос к Product падает.
+# Скрипт идемпотентен, запускать можно сколько угодно раз:
+# 1. create_all — новые таблицы (синонимы, журнал изменений, прогресс импорта);
+# 2. ALTER TABLE ... ADD COLUMN для столбцов моделей, которых нет в базе
+#    (только nullable: у существующих строк значения нет), и их индексы;
+# 3. оценки продуктов, у которых их ещё нет, считаются по привязанным ингредиентам.
+# Позиции старых связей с ингредиентами остаются пустыми: такие продукты
+# сортируют состав по id ингредиента.
+
+
+@dataclass
+class UpgradeReport:
+    columns_added: list[str] = field(default_factory=list)  # «таблица.столбец»
+    indexes_created: list[str] = field(default_factory=list)
+    products_scored: int = 0
+
+
+class SchemaUpgrade(OtrazhenieDB):
+
+    def _missing_columns(self, table) -> list:
+        existing = {column["name"] for column in self.inspect.get_columns(table.name)}
+        return [column for column in table.columns if column.name not in existing]
+
+    def _add_column(self, connection, table, column) -> None:
+        if not column.nullable:
+            raise RuntimeError(
+                f"Столбец {table.name}.{column.name} NOT NULL — нужен ручной перенос данных"
+            )
+        dialect = connection.dialect
+        # IF NOT EXISTS — если два экземпляра скрипта запущены одновременно (PostgreSQL)
+        if_not_exists = "IF NOT EXISTS " if dialect.name == "postgresql" else ""
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{column.name} "
+            f"{column.type.compile(dialect=dialect)}"
+        )
+
+    def _add_columns(self, report: UpgradeReport) -> None:
+        for table in Base.metadata.sorted_tables:
+            missing = self._missing_columns(table)
+            if not missing:
+                continue
+            indexes = {index["name"] for index in self.inspect.get_indexes(table.name)}
+            with self.engine.begin() as connection:
+                for column in missing:
+                    self._add_column(connection, table, column)
+                    report.columns_added.append(f"{table.name}.{column.name}")
+                for index in table.indexes:
+                    if index.name not in indexes:
+                        index.create(connection)
+                        report.indexes_created.append(index.name)
+            logger.info(
+                "Таблица %s: добавлены столбцы %s",
+                table.name,
+                ", ".join(column.name for column in missing),
+            )
+
+    def _backfill_scores(self, report: UpgradeReport) -> None:
+        """Оценки продуктов без оценки, у которых есть привязанные ингредиенты"""
+        with self.get_session() as session:
+            product_ids = session.execute(
+                select(Product.id)
+                .where(
+                    Product.safety_score.is_(None),
+                    Product.id.in_(select(product_ingredients_link.c.product_id)),
+                )
+                .order_by(Product.id)
+            ).scalars().all()
+            report.products_scored = self._recompute_product_scores(session, product_ids)
+            session.commit()
+
+    def upgrade(self) -> UpgradeReport:
+        report = UpgradeReport()
+        self.create_tables()
+        self._add_columns(report)
+        self._backfill_scores(report)
+        logger.info(
+            "Схема обновлена: столбцов добавлено %s, индексов %s, оценок посчитано %s",
+            len(report.columns_added),
+            len(report.indexes_created),
+            report.products_scored,
+        )
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обновление схемы существующей базы")
+    parser.add_argument("--url", default=DATABASE_URL)
+    args = parser.parse_args()
+
+    report = SchemaUpgrade(args.url).upgrade()
+    print(
+        f"столбцы: {', '.join(report.columns_added) or 'без изменений'}; "
+        f"индексы: {', '.join(report.indexes_created) or 'без изменений'}; "
+        f"оценок продуктов посчитано: {report.products_scored}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+class CallerLimitExceeded(Exception):
+    """
+    Вызывающий превысил свой лимит (одновременные запросы или объём в минуту).
+    retry_after — через сколько секунд имеет смысл повторить.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        self.retry_after = retry_after
+        super().__init__(message)
@@ -0,0 +1,56 @@
+class UpstreamError(Exception):
+    """
+    Ошибка внешнего API (OpenBeautyFacts).
+    retryable — есть ли смысл повторять запрос; retry_after — сколько секунд
+    подождать перед повтором, если сервис сам это сообщил (Retry-After).
+    """
+
+    retryable = False
+
+    def __init__(self, message: str, status: int | None = None, retry_after: float | None = None):
+        self.status = status
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class UpstreamTimeout(UpstreamError):
+    """Таймаут подключения или чтения ответа"""
+
+    retryable = True
+
+
+class UpstreamUnavailable(UpstreamError):
+    """Сервис недоступен: 5xx или обрыв соединения"""
+
+    retryable = True
+
+
+class UpstreamRateLimited(UpstreamError):
+    """429 Too Many Requests"""
+
+    retryable = True
+
+
+class UpstreamBadResponse(UpstreamError):
+    """Ответ, который не исправится повтором: 4xx, битый JSON, неверная схема"""
+
+
+class CircuitOpenError(UpstreamError):
+    """
+    Запрос не отправлен: предохранитель разомкнут после серии сбоев или медленных ответов.
+    Повторять сразу бессмысленно; retry_after — через сколько секунд будет пробный запрос.
+    """
+
+
+class BulkheadFullError(UpstreamError):
+    """Запрос не отправлен: все слоты одновременных запросов к сервису заняты"""
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After в секундах (поддерживается только числовая форма)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,130 @@
+import hmac
+import json
+import logging
+
+from decouple import Csv, config
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
+
+from app.core.metrics import register_metrics_source
+from app.core.rate_limit import CallerLimiter
+from app.db.session import close_request_sessions
+from app.exceptions.rate_limit import CallerLimitExceeded
+from app.services.product_lookup_service import lookup_products_batch
+
+logger = logging.getLogger(__name__)
+batch_lookup_bp = Blueprint("batch_lookup_bp", __name__)
+
+# Ключи партнёров: "имя:ключ,имя2:ключ2"; ключ передаётся в заголовке X-API-Key.
+# Без ключа пакетный поиск доступен только вошедшим пользователям с правом products:batch
+# (с CSRF-токеном, как формы сайта).
+PARTNER_API_KEYS = config("PARTNER_API_KEYS", default="", cast=Csv())
+BATCH_PERMISSION = "products:batch"
+# лимиты на каждого партнёра (пользователя): одновременные пачки и штрих-коды в минуту
+LOOKUP_BATCH_CALLER_CONCURRENCY = config("LOOKUP_BATCH_CALLER_CONCURRENCY", default=2, cast=int)
+LOOKUP_BATCH_CALLER_BARCODES_PER_MINUTE = config(
+    "LOOKUP_BATCH_CALLER_BARCODES_PER_MINUTE", default=3000, cast=int
+)
+
+batch_limiter = CallerLimiter(
+    "batch_lookup",
+    max_concurrent=LOOKUP_BATCH_CALLER_CONCURRENCY,
+    per_minute=LOOKUP_BATCH_CALLER_BARCODES_PER_MINUTE,
+)
+register_metrics_source("batch_lookup_callers", batch_limiter.stats)
+
+
+def _partner_keys(entries) -> dict[str, str]:
+    """ключ → имя партнёра; записи без имени или ключа пропускаются"""
+    keys = {}
+    for entry in entries:
+        name, _, key = entry.partition(":")
+        if name.strip() and key.strip():
+            keys[key.strip()] = name.strip()
+        else:
+            logger.warning("PARTNER_API_KEYS: запись без имени или ключа пропущена")
+    return keys
+
+
+_partners = _partner_keys(PARTNER_API_KEYS)
+
+
+def _find_partner(api_key: str) -> str | None:
+    # сравнение за постоянное время — ключ не подбирается по времени ответа
+    found = None
+    for key, name in _partners.items():
+        if hmac.compare_digest(key.encode(), api_key.encode()):
+            found = name
+    return found
+
+
+def _authenticate():
+    """
+    Вызывающий пакетного поиска: ("partner:<имя>" или "user:<id>", None)
+    либо (None, ответ 401/403). Вошедший пользователь проходит и проверку CSRF.
+    """
+    api_key = request.headers.get("X-API-Key")
+    if api_key:
+        partner = _find_partner(api_key)
+        if partner is None:
+            logger.warning("Пакетный поиск: неверный ключ партнёра")
+            return None, (jsonify(success=False, message="Неверный ключ API"), 401)
+        return f"partner:{partner}", None
+    if not current_user.is_authenticated:
+        return None, (jsonify(success=False, message="Нужен ключ API (X-API-Key)"), 401)
+    if not current_user.has_permission(BATCH_PERMISSION):
+        return None, (jsonify(success=False, message="Недостаточно прав"), 403)
+    # запрос из браузера с cookie сессии — защищён CSRF, как формы сайта
+    current_app.extensions["csrf"].protect()
+    return f"user:{current_user.id}", None
+
+
+@batch_lookup_bp.route("/api/products/batch", methods=["POST"], endpoint="batch_lookup")
+def batch_lookup():
+    """
+    Пакетный поиск продуктов по штрих-кодам для партнёров (полка, список заказа).
+    Тело — JSON {"barcodes": [...]} или просто список штрих-кодов.
+    Ответ — NDJSON: по строке {"barcode", "status", "source", "product", "error"} на каждый
+    штрих-код, в порядке готовности (status: found / not_found / invalid / error).
+    Доступ — по ключу партнёра (X-API-Key, без CSRF: вызывается не из формы сайта,
+    а программами партнёров) или вошедшему пользователю с правом products:batch.
+    На каждого вызывающего — лимиты batch_limiter (429 и Retry-After при превышении).
+    """
+    caller, denied = _authenticate()
+    if denied is not None:
+        return denied
+
+    payload = request.get_json(silent=True)
+    barcodes = payload.get("barcodes") if isinstance(payload, dict) else payload
+    if not isinstance(barcodes, list) or not barcodes:
+        logger.warning("Пакетный поиск: нет списка штрих-кодов")
+        return jsonify(success=False, message="Ожидается JSON со списком barcodes"), 400
+    try:
+        results = lookup_products_batch(barcodes)
+    except ValueError as error:
+        logger.warning("Пакетный поиск отклонён: %s", error)
+        return jsonify(success=False, message=str(error)), 413
+    try:
+        batch_limiter.acquire(caller, cost=len(barcodes))
+    except CallerLimitExceeded as error:
+        response = jsonify(success=False, message=str(error))
+        response.headers["Retry-After"] = str(int(error.retry_after or 1))
+        return response, 429
+    logger.info("Пакетный поиск: %s, получено штрих-кодов %s", caller, len(barcodes))
+
+    def generate():
+        for result in results:
+            yield json.dumps(result.to_dict(), ensure_ascii=False) + "\n"
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        # прокси (nginx) не должен копить ответ целиком — строки нужны по мере готовности
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-store"},
+    )
+    # слот занят, пока ответ отдаётся (поиск идёт по мере чтения), а не до return
+    response.call_on_close(lambda: batch_limiter.release(caller))
+    # соединение запроса (проверка пользователя) не держим, пока идут ответы API:
+    # teardown потокового ответа наступает только после последней строки
+    close_request_sessions()
+    return response
@@ -1,6 +1,6 @@
-import numpy as np
 from flask import Blueprint, flash, redirect, render_template, url_for
 
+from app.analyzers import barcode_decoder
 from app.forms import ScanForm
 from app.services.product_lookup_service import get_product_info_from_api
 import logging
@@ -12,25 +12,28 @@ handle_scan_bp = Blueprint("handle_scan_bp", __name__)
 def decode_barcode(image_data):
     """
     Принимает бинарные данные изображения.
-    Декодирует штрих-код (или QR-код) из изображения с помощью OpenCV и pyzbar.
+    Декодирует штрих-код (или QR-код) из изображения с помощью OpenCV и pyzbar:
+    сначала в уменьшенном кадре и найденных в нём областях, полное разрешение —
+    только если там кода нет (app.analyzers.barcode_decoder).
     Возвращает строковое значение распознанного кода или None, если код не найден.
     """
-    # lazy imports для усиления устойчивости
     try:
-        import cv2
-        import pyzbar.pyzbar as pyzbar
-    except ImportError:
+        result = barcode_decoder.decode(image_data)
+    except RuntimeError:
+        # чтобы приложение не падало при отсутствии системных библиотек в CI/контейнере
         logger.exception("OpenCV или pyzbar не установлены, сканирование с камеры недоступно")
         return None
-    nparr = np.frombuffer(image_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    # чтобы приложение не падало при отсутствии системных библиотек в CI/контейнере
-    if img is None:
-        logger.warning("Не удалось декодировать изображение")
+    except Exception:
+        # битое загруженное изображение — «код не найден», а не ошибка 500
+        logger.exception("Ошибка распознавания штрих-кода")
         return None
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    barcodes = pyzbar.decode(gray)
-    return barcodes[0].data.decode("utf-8") if barcodes else None
+    logger.info(
+        "Штрих-код %s: этап=%s, %.0f мс",
+        "распознан" if result.value else "не найден",
+        result.stage,
+        sum(result.timings.values()) * 1000,
+    )
+    return result.value
 
 
 @handle_scan_bp.route("/handle-scan", methods=["GET", "POST"], endpoint="handle_scan")
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+import logging
+
+from app.auth.rbac.permissions import permission_required
+from app.core.metrics import collect_metrics
+
+metrics_bp = Blueprint("metrics_bp", __name__)
+
+logger = logging.getLogger(__name__)
+
+
+@metrics_bp.route("/internal/metrics", methods=["GET"], endpoint="metrics")
+@permission_required("admin:panel")
+def metrics():
+    """
+    Счётчики процесса (индексы, кэши, пулы соединений) в JSON.
+    Значения относятся к текущему воркеру, а не ко всему кластеру.
+    """
+    logger.debug("Запрошены метрики процесса")
+    return jsonify(collect_metrics())
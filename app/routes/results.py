@@ -1,69 +1,81 @@
 from flask import Blueprint, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
 
+from app.analyzers.composition_tokenizer import iter_ingredients
+from app.analyzers.ingredient_normalizer import normalize_ingredient_key
+from app.analyzers.safety_score import compute_product_score
 from app.db import crud
 from app.forms import CompositionForm
 from app.auth.rbac.permissions import permission_required
+from app.services.analysis_cache import analysis_cache, composition_key
+from app.services.ingredient_index import ingredient_index
 import logging
 results_bp = Blueprint("results_bp", __name__)
 
 logger = logging.getLogger(__name__)
 
-def load_ingredients_database():
+def _probable_match(ingredient_name: str):
     """
-    Подгружаем данные из бд и преобразуем в словарь
-    Ключ — имя ингредиента в нижнем регистре, значение — словарь из данных бд
-    Если ошибка, выводит предупреждение
+    Нечёткое совпадение для ингредиента с опечаткой («glycerine», «phenoxyethanl»).
+    Возвращает копию записи индекса с пометкой match="probable", исходным написанием
+    и уверенностью совпадения, либо None.
     """
-    try:
-        db_data = crud.OtrazhenieDB().select_all_ingredients_with_names()
-        logger.info("Загрузка базы данных ингредиентов")
-        ingredients_dict = {}
-        for row in db_data:
-            db_dict = {
-                "name": row[1],
-                "function": row[2],
-                "safety_score": row[3],
-                "description": row[4],
-            }
-            ingredients_dict[row[1].lower()] = db_dict
-        logger.info(
-            "База данных ингредиентов успешно загружена: %s элементов",
-            len(ingredients_dict),
-        )
-        return ingredients_dict
-    except FileNotFoundError:
-        logger.exception("Не удалось загрузить базу данных ингредиентов")
-        return {}
+    found = ingredient_index.fuzzy_match(ingredient_name)
+    if not found:
+        return None
+    entry, confidence = found
+    logger.info(
+        "Вероятное совпадение ингредиента: %s → %s (%.2f)",
+        ingredient_name,
+        entry["name"],
+        confidence,
+    )
+    return {
+        **entry,
+        "match": "probable",
+        "query": ingredient_name,
+        "confidence": confidence,
+    }
 
 
 def analyze_composition(composition: str):
     """
     Возвращает список словарей с данными по каждому ингредиенту из строки состава.
+    Данные берутся из общего индекса процесса (app.services.ingredient_index).
+    Если точного совпадения нет — пробуем нечёткий поиск («вероятное совпадение»).
     Если ингредиент отсутствует в БД — заполняем placeholder-значениями.
+    Одинаковые (после нормализации) составы берутся из кэша, пока не изменились данные.
     """
-    normalized_ingredients = [
-        i.strip().lower() for i in composition.split(",") if i.strip()
+    tokens = [
+        key
+        for key in map(normalize_ingredient_key, iter_ingredients(composition))
+        if key
     ]
+    key = composition_key(tokens, ingredient_index.revision)
+    analysis_result = analysis_cache.get_or_compute(key, lambda: _analyze_tokens(tokens))
     logger.info(
         "Анализ состава, количество ингредиентов=%s",
-        len(normalized_ingredients)
+        len(analysis_result)
     )
-    db_data = load_ingredients_database() or {}
+    logger.info("Анализ состава завершен")
+    return list(analysis_result)
+
+
+def _analyze_tokens(tokens: list[str]) -> list[dict]:
     analysis_result = []
-    for ingredient_name in normalized_ingredients:
+    for ingredient_name in tokens:
+        entry = ingredient_index.get(ingredient_name)
+        if entry is None:
+            entry = _probable_match(ingredient_name)
         analysis_result.append(
-            db_data.get(
-                ingredient_name,
-                {
-                    "name": ingredient_name,
-                    "function": "Неизвестно",
-                    "safety_score": "?",
-                    "description": "Не найден в базе данных",
-                },
-            )
+            entry
+            or {
+                "name": ingredient_name,
+                "function": "Неизвестно",
+                "safety_score": "?",
+                "description": "Не найден в базе данных",
+            }
         )
-    logger.info("Анализ состава завершен")
     return analysis_result
 
 
@@ -101,11 +113,15 @@ def results_page():
     if not composition:
         logger.warning("На странице результатов отображается пустой состав")
     analysis = analyze_composition(composition)
+    product_score = compute_product_score(
+        ingredient["safety_score"] for ingredient in analysis
+    )
     # return render_template("results.html",
     return render_template(
         "fullpage/results.html",
         composition=composition,
         analysis=analysis,
+        product_score=product_score,
         active_tab="scanner",
     )
 
@@ -154,19 +170,15 @@ def ingredient_detail(name: str):
     """
     Детальная страница ингредиента: описание, функция, рейтинг безопасности.
     """
-    db_data = load_ingredients_database() or {}
     key = (name or "").strip().lower()
     logger.info("Запрошенная информация об ингредиенте: %s", key)
 
-    data = db_data.get(
-        key,
-        {
-            "name": name,
-            "function": "Неизвестно",
-            "safety_score": "?",
-            "description": "Не найден в базе данных",
-        },
-    )
+    data = ingredient_index.get(key) or {
+        "name": name,
+        "function": "Неизвестно",
+        "safety_score": "?",
+        "description": "Не найден в базе данных",
+    }
     if data.get("function") == "Неизвестно":
         logger.warning("Ингредиент не найден: %s", key)
     # Рендерим fullpage-шаблон с деталями
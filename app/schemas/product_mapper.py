@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from app.schemas.product_dto import ProductDTO
+
+# Единственное место, где ProductDTO собирается из внешних форм продукта:
+# ответа OpenBeautyFacts, строки таблицы products — и раскладывается обратно в колонки.
+# Синхронный и асинхронный поиск, импорт дампа и запись в БД используют одни функции.
+
+def product_from_openbeautyfacts(barcode: str, product) -> ProductDTO:
+    """OpenBeautyFactsProduct → ProductDTO"""
+    return ProductDTO.model_validate(
+        {
+            "barcode": barcode,
+            "name": product.product_name or "Неизвестно",
+            "brand": product.brands or "",
+            "category": product.categories or "",
+            "ingredients": product.ingredients_text_en or "",
+            "image_url": product.image_front_url,
+            "additional_info": {
+                "Упаковка": product.packaging or "",
+                "Вес": product.quantity or "",
+                "Страна": product.countries or "",
+            },
+        }
+    )
+
+
+def product_from_row(row) -> ProductDTO:
+    """Строка/ORM-объект таблицы products → ProductDTO"""
+    return ProductDTO.model_validate(
+        {
+            "barcode": row.barcode,
+            "name": row.name,
+            "brand": row.brand or "",
+            "category": row.category or "",
+            "ingredients": row.ingredients_text or "",
+            "image_url": row.image_url,
+            "additional_info": {
+                "Упаковка": row.packaging or "",
+                # строки, записанные до колонки weight, знают только quantity
+                "Вес": row.weight
+                or (str(row.quantity) if row.quantity is not None else ""),
+                "Страна": row.countries or "",
+            },
+        }
+    )
+
+
+def product_columns(dto: ProductDTO, fetched_at: datetime | None = None) -> dict:
+    """ProductDTO → аргументы OtrazhenieDB.add_product / save_fetched_product"""
+    info = dto.additional_info
+    weight = (info.weight or "").strip()
+    return {
+        "barcode": dto.barcode,
+        "name": dto.name[:255],
+        "brand": dto.brand[:255] or None,
+        "category": dto.category[:512] or None,
+        "ingredients_text": dto.ingredients or None,
+        "image_url": dto.image_url[:512] if dto.image_url else None,
+        "packaging": (info.packaging or "")[:255] or None,
+        # вес хранится как есть; целочисленная quantity — только для «50», не для «0.5 L»
+        "quantity": int(weight) if weight.isdigit() else None,
+        "weight": weight[:255] or None,
+        "countries": (info.country or "")[:255] or None,
+        "fetched_at": fetched_at,
+    }
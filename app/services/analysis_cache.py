@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import sys
+import threading
+from typing import Callable, Iterable
+
+from cachetools import TTLCache
+from decouple import config
+
+from app.core.metrics import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+# Кэш результатов анализа состава (/results, редирект после /analyze, обновление страницы).
+# Ключ — хэш списка нормализованных токенов и ревизия индекса ингредиентов:
+# после любого изменения ингредиентов ревизия растёт, и старые результаты просто
+# перестают находиться (и вытесняются по LRU/TTL), отдельная инвалидация не нужна.
+ANALYSIS_CACHE_MAX_BYTES = config(
+    "ANALYSIS_CACHE_MAX_BYTES", default=32 * 1024 * 1024, cast=int
+)
+ANALYSIS_CACHE_TTL_SECONDS = config("ANALYSIS_CACHE_TTL_SECONDS", default=600, cast=float)
+
+
+def composition_key(tokens: Iterable[str], revision: int) -> tuple[int, bytes]:
+    """Ключ кэша: (ревизия индекса, blake2b-хэш нормализованных токенов)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for token in tokens:
+        digest.update(token.encode("utf-8"))
+        digest.update(b"\x1f")  # разделитель: «a b» + «c» ≠ «a» + «b c»
+    return revision, digest.digest()
+
+
+def estimate_size(result: tuple[dict, ...]) -> int:
+    """
+    Оценка памяти результата в байтах: кортеж, словари и их значения.
+    Записи индекса общие с индексом и фактически памяти не занимают,
+    но считаются полностью — оценка получается с запасом.
+    """
+    size = sys.getsizeof(result)
+    for item in result:
+        size += sys.getsizeof(item)
+        for value in item.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class _SizedTTLCache(TTLCache):
+    """TTLCache, считающий вытеснения по размеру (истечение TTL сюда не попадает)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class AnalysisCache:
+    """
+    LRU/TTL-кэш результатов анализа состава с ограничением по памяти в байтах.
+    Результаты хранятся кортежами: они общие для всех запросов, изменять их нельзя.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = ANALYSIS_CACHE_MAX_BYTES,
+        ttl: float = ANALYSIS_CACHE_TTL_SECONDS,
+    ):
+        self._cache = _SizedTTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=estimate_size)
+        # cachetools не потокобезопасен
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._too_large = 0
+
+    def get_or_compute(
+        self, key: tuple[int, bytes], compute: Callable[[], list[dict]]
+    ) -> tuple[dict, ...]:
+        """Результат из кэша или compute() (вызывается без блокировки)"""
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._hits += 1
+                return result
+            self._misses += 1
+
+        result = tuple(compute())
+        try:
+            with self._lock:
+                self._cache[key] = result
+        except ValueError:
+            # один результат больше всего кэша — не кэшируем
+            self._too_large += 1
+            logger.warning("Результат анализа не помещается в кэш: %s байт", estimate_size(result))
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        """Размер, попадания/промахи и вытеснения кэша"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._cache),
+                "bytes": self._cache.currsize,
+                "max_bytes": self._cache.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._cache.evictions,
+                "too_large": self._too_large,
+            }
+
+
+analysis_cache = AnalysisCache()
+register_metrics_source("analysis_cache", analysis_cache.stats)
@@ -0,0 +1,229 @@
+import importlib
+import json
+import logging
+import math
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator
+
+from app.schemas.product_dto import ProductDTO
+
+logger = logging.getLogger(__name__)
+
+# Общее (L2) хранилище кэша продуктов: одно на все воркеры и переживает деплой.
+# Значение — компактная бинарная запись: заголовок (версия формата, время получения,
+# найден ли продукт) + zlib-сжатый JSON-массив полей ProductDTO без имён ключей.
+
+_HEADER = struct.Struct("!Bd?")
+_FORMAT_VERSION = 1
+# порядок полей в массиве; новое поле — в конец и новая версия формата
+_FIELDS = ("barcode", "name", "brand", "category", "ingredients", "image_url")
+_INFO_FIELDS = ("packaging", "weight", "country")
+_INFO_ALIASES = ("Упаковка", "Вес", "Страна")
+
+
+def dump_product(data: ProductDTO | None, fetched_at: float) -> bytes:
+    """Запись L2: data=None — «не найден»"""
+    header = _HEADER.pack(_FORMAT_VERSION, fetched_at, data is not None)
+    if data is None:
+        return header
+    values = [getattr(data, name) for name in _FIELDS]
+    values += [getattr(data.additional_info, name) for name in _INFO_FIELDS]
+    payload = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return header + zlib.compress(payload.encode("utf-8"))
+
+
+def load_product(raw: bytes) -> tuple[ProductDTO | None, float] | None:
+    """(data, fetched_at) или None — запись другой версии формата или повреждена"""
+    try:
+        version, fetched_at, found = _HEADER.unpack_from(raw)
+        if version != _FORMAT_VERSION:
+            return None
+        if not found:
+            return None, fetched_at
+        values = json.loads(zlib.decompress(raw[_HEADER.size:]))
+        product = dict(zip(_FIELDS, values))
+        product["additional_info"] = dict(zip(_INFO_ALIASES, values[len(_FIELDS):]))
+        return ProductDTO.model_validate(product), fetched_at
+    except Exception:
+        logger.warning("Повреждённая запись кэша продуктов", exc_info=True)
+        return None
+
+
+class CacheBackend:
+    """L2-хранилище: штрих-код → bytes с временем жизни"""
+
+    name = "base"
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def scan(self, limit: int) -> Iterator[tuple[str, bytes]]:
+        """До limit живых записей (для прогрева L1)"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """L2 в памяти процесса — замена Redis в тестах и локальной разработке"""
+
+    name = "memory"
+
+    def __init__(self, timer=time.time):
+        self.timer = timer
+        self._data: dict[str, tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] <= self.timer():
+                del self._data[key]
+                return None
+            return item[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, self.timer() + ttl)
+
+    def scan(self, limit):
+        now = self.timer()
+        with self._lock:
+            items = [(key, value) for key, (value, expires) in self._data.items() if expires > now]
+        return iter(items[:limit])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    L2 в локальном файле SQLite: общий для воркеров на одной машине, переживает рестарт.
+    WAL — читатели не ждут писателя; соединение своё у каждого потока.
+    """
+
+    name = "sqlite"
+    # просроченные записи удаляются раз в столько записей
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, timer=time.time):
+        self.path = path
+        self.timer = timer
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS product_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM product_cache WHERE key = ? AND expires_at > ?",
+            (key, self.timer()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = self.timer()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO product_cache (key, value, stored_at, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                connection.execute("DELETE FROM product_cache WHERE expires_at <= ?", (now,))
+
+    def scan(self, limit):
+        # самые свежие записи — они вероятнее всего понадобятся
+        return iter(
+            self._connection().execute(
+                "SELECT key, value FROM product_cache WHERE expires_at > ? "
+                "ORDER BY stored_at DESC LIMIT ?",
+                (self.timer(), limit),
+            ).fetchall()
+        )
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM product_cache")
+
+
+class RedisBackend(CacheBackend):
+    """L2 в Redis: общий для всех воркеров и серверов. Пакет redis — optional"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "otrazhenie:product:"):
+        try:
+            redis = importlib.import_module("redis")
+        except ModuleNotFoundError as error:
+            raise RuntimeError(
+                "Для LOOKUP_L2_BACKEND=redis нужен пакет redis (pip install redis)"
+            ) from error
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, math.ceil(ttl)))
+
+    def scan(self, limit):
+        keys = []
+        for key in self.client.scan_iter(match=self.prefix + "*", count=500):
+            keys.append(key)
+            if len(keys) >= limit:
+                break
+        if not keys:
+            return iter(())
+        values = self.client.mget(keys)
+        start = len(self.prefix)
+        return (
+            (key.decode()[start:], value)
+            for key, value in zip(keys, values)
+            if value is not None
+        )
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*", count=500))
+        if keys:
+            self.client.delete(*keys)
+
+
+def make_backend(kind: str, location: str = "") -> CacheBackend | None:
+    """L2 по настройке: none / memory / sqlite (location — путь) / redis (location — URL)"""
+    kind = (kind or "none").lower()
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(location or "product_cache.sqlite3")
+    if kind == "redis":
+        return RedisBackend(location or "redis://localhost:6379/0")
+    raise ValueError(f"Неизвестный LOOKUP_L2_BACKEND: {kind}")
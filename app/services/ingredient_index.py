@@ -0,0 +1,381 @@
+import logging
+import threading
+from time import monotonic, perf_counter
+from typing import Iterable
+
+from decouple import config
+
+from app.analyzers.fuzzy_matcher import FuzzyMatcher
+from app.analyzers.ingredient_normalizer import (
+    normalize_ingredient_key,
+    split_parenthetical,
+    split_slash_forms,
+)
+from app.core.metrics import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в секундах) воркер сверяет свою ревизию с журналом ingredient_changes.
+# Проверка — один SELECT max(id) по первичному ключу, её можно делать хоть на каждый запрос (0).
+POLL_INTERVAL_SECONDS = config("INGREDIENT_INDEX_POLL_SECONDS", default=1.0, cast=float)
+# Если изменений накопилось больше — дешевле перечитать таблицу целиком
+MAX_DELTA_CHANGES = config("INGREDIENT_INDEX_MAX_DELTA", default=5000, cast=int)
+# id журнала — автоинкремент, а не порядок фиксации: транзакция, получившая id N, может
+# зафиксироваться позже N+1. Пропуски в применённых id считаются незавершёнными
+# транзакциями и перечитываются при каждой сверке, пока не заполнятся или не пройдёт
+# INGREDIENT_INDEX_GAP_SECONDS (откатившаяся транзакция оставляет пропуск навсегда)
+GAP_SECONDS = config("INGREDIENT_INDEX_GAP_SECONDS", default=60.0, cast=float)
+# сколько последних id журнала проверить на пропуски после полной загрузки
+_RELOAD_GAP_WINDOW = 1000
+# Минимальная уверенность нечёткого совпадения («вероятное совпадение» на /results)
+FUZZY_MIN_CONFIDENCE = config("FUZZY_MATCH_MIN_CONFIDENCE", default=0.75, cast=float)
+
+
+class DatabaseIngredientSource:
+    """Источник данных индекса: таблица ингредиентов и журнал изменений в БД"""
+
+    def _db(self):
+        from app.db.crud import OtrazhenieDB
+
+        return OtrazhenieDB()
+
+    def load_all(self) -> Iterable:
+        """Все ингредиенты с названиями категорий одним JOIN-запросом"""
+        return self._db().select_all_ingredients_with_names()
+
+    def load_by_ids(self, ingredient_ids) -> Iterable:
+        """Только указанные ингредиенты (удалённых в ответе не будет)"""
+        return self._db().select_ingredients_with_names_by_ids(ingredient_ids)
+
+    def load_aliases(self, ingredient_ids=None) -> Iterable:
+        """Синонимы (ingredient_id, normalized) — все или только для указанных id"""
+        return self._db().select_ingredient_aliases(ingredient_ids)
+
+    def latest_revision(self) -> int:
+        return self._db().get_ingredient_revision()
+
+    def changes_since(self, revision: int, limit: int) -> list:
+        return self._db().select_ingredient_changes_since(revision, limit=limit)
+
+
+def _row_to_entry(row) -> dict:
+    """Строка выборки (id, name, function, safety_score, description) → запись индекса"""
+    return {
+        "id": row[0],
+        "name": row[1],
+        "function": row[2],
+        "safety_score": row[3],
+        "description": row[4],
+    }
+
+
+def _index_rows(entries: dict, keys_by_id: dict, rows, aliases) -> None:
+    """
+    Раскладывает строки ингредиентов и их синонимы по ключам индекса.
+    Каноническое название важнее синонима: синоним не перекрывает чужое название,
+    а название вытесняет совпавший с ним чужой синоним.
+    """
+    for row in rows:
+        key = normalize_ingredient_key(row[1])
+        previous = entries.get(key)
+        if previous is not None and previous["id"] != row[0]:
+            owner_keys = keys_by_id.get(previous["id"])
+            if owner_keys and key in owner_keys:
+                owner_keys.remove(key)
+        entries[key] = _row_to_entry(row)
+        keys_by_id.setdefault(row[0], []).append(key)
+
+    for ingredient_id, alias_key in aliases:
+        keys = keys_by_id.get(ingredient_id)
+        # синонимы ингредиентов, которых нет в индексе (без категории), пропускаем
+        if not keys or alias_key in entries:
+            continue
+        entries[alias_key] = entries[keys[0]]
+        keys.append(alias_key)
+
+
+class IngredientIndex:
+    """
+    Общий для процесса (воркера) индекс ингредиентов: нормализованный ключ → данные из БД.
+    В одном словаре лежат и канонические названия, и синонимы из ingredient_aliases,
+    поэтому «Aqua», «Water» и «Вода» находятся одним обращением к словарю.
+
+    - при первом обращении таблица читается целиком, дальше воркер дочитывает только
+      изменённые строки по журналу ingredient_changes (общему для всех воркеров);
+    - чтение без блокировок: обновление строит новый словарь и подменяет ссылку целиком;
+    - revision — номер последней применённой записи журнала, по нему можно проверять
+      актуальность производных данных (кэшей анализа и т.п.).
+
+    Записи индекса общие для всех запросов — изменять их нельзя.
+    """
+
+    def __init__(
+        self,
+        source=None,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+        max_delta: int = MAX_DELTA_CHANGES,
+        gap_seconds: float = GAP_SECONDS,
+    ):
+        self._source = source or DatabaseIngredientSource()
+        self._poll_interval = poll_interval
+        self._max_delta = max_delta
+        self._gap_seconds = gap_seconds
+        # пропущенный id журнала → monotonic(), после которого его больше не ждём
+        self._gaps: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._keys_by_id: dict[int, list[str]] = {}
+        self._loaded = False
+        self._revision = 0
+        self._next_check = 0.0
+        # (нечёткий индекс, словарь по которому он собран) — строится лениво,
+        # пересобирается после любого обновления словаря
+        self._fuzzy: tuple[FuzzyMatcher, dict] | None = None
+        self._fuzzy_hits = 0
+        self._fuzzy_misses = 0
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        self._delta_updates = 0
+        self._delta_rows = 0
+        self._reload_errors = 0
+        self._last_reload_seconds = 0.0
+        self._total_reload_seconds = 0.0
+
+    @property
+    def revision(self) -> int:
+        """Ревизия данных индекса (id последней применённой записи журнала)"""
+        self._ensure_fresh()
+        return self._revision
+
+    def invalidate(self) -> None:
+        """Помечает индекс устаревшим: следующее обращение перечитает таблицу целиком"""
+        logger.info("Индекс ингредиентов помечен устаревшим")
+        self._loaded = False
+
+    def mark_dirty(self) -> None:
+        """Следующее обращение сразу сверится с журналом, не дожидаясь интервала опроса"""
+        self._next_check = 0.0
+
+    def get(self, name: str) -> dict | None:
+        """Ищет ингредиент по названию или синониму (см. normalize_ingredient_key)"""
+        entry = self._resolve(self._ensure_fresh(), normalize_ingredient_key(name))
+        if entry is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return entry
+
+    def resolve_id(self, name: str) -> int | None:
+        """id канонического ингредиента для названия или синонима, None если не найден"""
+        entry = self.get(name)
+        return entry["id"] if entry else None
+
+    def fuzzy_match(
+        self, name: str, min_confidence: float = FUZZY_MIN_CONFIDENCE
+    ) -> tuple[dict, float] | None:
+        """
+        Нечёткий поиск для названий с опечатками: (запись индекса, уверенность) или None.
+        Вызывать после неудачного get(): точные совпадения здесь не проверяются отдельно.
+        """
+        entries = self._ensure_fresh()
+        fuzzy = self._fuzzy
+        if fuzzy is None or fuzzy[1] is not entries:
+            with self._lock:
+                fuzzy = self._fuzzy
+                if fuzzy is None or fuzzy[1] is not self._entries:
+                    started = perf_counter()
+                    fuzzy = (FuzzyMatcher(self._entries.keys()), self._entries)
+                    self._fuzzy = fuzzy
+                    logger.info(
+                        "Нечёткий индекс ингредиентов построен: %s ключей, %.1f мс",
+                        len(fuzzy[0]),
+                        (perf_counter() - started) * 1000,
+                    )
+        matcher, entries = fuzzy
+
+        match = matcher.match(normalize_ingredient_key(name), min_confidence)
+        if match is None:
+            self._fuzzy_misses += 1
+            return None
+        self._fuzzy_hits += 1
+        return entries[match.key], match.confidence
+
+    @staticmethod
+    def _resolve(entries: dict[str, dict], key: str) -> dict | None:
+        entry = entries.get(key)
+        if entry is None:
+            # «Aqua/Water/Eau» — перечисление синонимов через косую черту,
+            # «Parfum (Fragrance)» — название с пояснением в скобках
+            for part in split_slash_forms(key) or split_parenthetical(key):
+                entry = entries.get(part)
+                if entry is not None:
+                    break
+        return entry
+
+    def snapshot(self) -> dict[str, dict]:
+        """Текущий словарь индекса целиком (только для чтения)"""
+        return self._ensure_fresh()
+
+    def stats(self) -> dict:
+        """Счётчики индекса: попадания/промахи, перезагрузки и дельта-обновления"""
+        lookups = self._hits + self._misses
+        return {
+            "revision": self._revision,
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "reloads": self._reloads,
+            "delta_updates": self._delta_updates,
+            "delta_rows": self._delta_rows,
+            "pending_gaps": len(self._gaps),
+            "fuzzy_hits": self._fuzzy_hits,
+            "fuzzy_misses": self._fuzzy_misses,
+            "reload_errors": self._reload_errors,
+            "last_reload_seconds": round(self._last_reload_seconds, 6),
+            "total_reload_seconds": round(self._total_reload_seconds, 6),
+        }
+
+    def _ensure_fresh(self) -> dict[str, dict]:
+        if self._loaded and monotonic() < self._next_check:
+            return self._entries
+        with self._lock:
+            # другой поток мог уже обновить индекс, пока мы ждали блокировку
+            if not self._loaded:
+                self._reload()
+            elif monotonic() >= self._next_check:
+                self._apply_changes()
+        return self._entries
+
+    def _schedule_next_check(self) -> None:
+        self._next_check = monotonic() + self._poll_interval
+
+    def _reload(self) -> None:
+        started = perf_counter()
+        try:
+            # ревизию читаем ДО данных: изменения, попавшие между запросами,
+            # будут применены повторно при следующей сверке (это безопасно)
+            revision = self._source.latest_revision()
+            # незафиксированные на момент загрузки записи ниже revision дочитаем потом
+            recent = self._source.changes_since(
+                max(0, revision - _RELOAD_GAP_WINDOW), _RELOAD_GAP_WINDOW
+            )
+            entries = {}
+            keys_by_id = {}
+            _index_rows(
+                entries, keys_by_id, self._source.load_all(), self._source.load_aliases()
+            )
+        except Exception:
+            # оставляем прежние данные и пробуем снова при следующем обращении
+            self._reload_errors += 1
+            logger.exception("Не удалось загрузить индекс ингредиентов")
+            return
+        duration = perf_counter() - started
+
+        self._entries = entries
+        self._keys_by_id = keys_by_id
+        self._revision = revision
+        self._gaps = {}
+        self._track_gaps(recent, max(0, revision - _RELOAD_GAP_WINDOW), revision)
+        self._reloads += 1
+        self._last_reload_seconds = duration
+        self._total_reload_seconds += duration
+        self._loaded = True
+        self._schedule_next_check()
+        logger.info(
+            "Индекс ингредиентов загружен: %s элементов, revision=%s, %.1f мс",
+            len(entries),
+            self._revision,
+            duration * 1000,
+        )
+
+    def _apply_changes(self) -> None:
+        try:
+            latest = self._source.latest_revision()
+            self._expire_gaps()
+            if latest == self._revision and not self._gaps:
+                self._schedule_next_check()
+                return
+            if latest < self._revision:
+                # журнал пересоздан или очищен — доверять дельте нельзя
+                logger.warning(
+                    "Ревизия журнала ингредиентов уменьшилась: %s → %s",
+                    self._revision,
+                    latest,
+                )
+                self._reload()
+                return
+
+            # с первого пропуска: уже применённые записи после него применятся повторно
+            since = min(self._gaps, default=self._revision + 1) - 1
+            changes = self._source.changes_since(since, self._max_delta + 1)
+            if len(changes) > self._max_delta:
+                logger.info(
+                    "Слишком много изменений ингредиентов (> %s), полная перезагрузка",
+                    self._max_delta,
+                )
+                self._reload()
+                return
+
+            # записи до revision, кроме заполнивших пропуск, уже применены
+            fresh = [
+                change
+                for change in changes
+                if change[0] > self._revision or change[0] in self._gaps
+            ]
+            if not fresh:
+                self._track_gaps(changes, since, self._revision)
+                self._schedule_next_check()
+                return
+            changed_ids = {change[1] for change in fresh}
+            rows = self._source.load_by_ids(changed_ids)
+            aliases = self._source.load_aliases(changed_ids)
+        except Exception:
+            self._reload_errors += 1
+            self._schedule_next_check()
+            logger.exception("Не удалось применить изменения индекса ингредиентов")
+            return
+
+        entries = dict(self._entries)
+        keys_by_id = dict(self._keys_by_id)
+        # сначала убираем старые ключи (имя могло поменяться, строка — удалиться)
+        for ingredient_id in changed_ids:
+            for old_key in keys_by_id.pop(ingredient_id, ()):
+                entries.pop(old_key, None)
+        _index_rows(entries, keys_by_id, rows, aliases)
+
+        self._entries = entries
+        self._keys_by_id = keys_by_id
+        self._revision = max(self._revision, changes[-1][0])
+        self._track_gaps(changes, since, self._revision)
+        self._delta_updates += 1
+        self._delta_rows += len(changed_ids)
+        self._schedule_next_check()
+        logger.info(
+            "Индекс ингредиентов обновлён по журналу: %s ингредиентов, revision=%s",
+            len(changed_ids),
+            self._revision,
+        )
+
+    def _track_gaps(self, changes, low: int, high: int) -> None:
+        """Запоминает id из (low, high], которых нет в changes; заполненные — забывает"""
+        seen = {change[0] for change in changes}
+        for revision in seen:
+            self._gaps.pop(revision, None)
+        deadline = monotonic() + self._gap_seconds
+        for revision in range(low + 1, high + 1):
+            if revision not in seen:
+                self._gaps.setdefault(revision, deadline)
+
+    def _expire_gaps(self) -> None:
+        now = monotonic()
+        expired = [revision for revision, deadline in self._gaps.items() if deadline <= now]
+        for revision in expired:
+            del self._gaps[revision]
+        if expired:
+            logger.info("Пропуски журнала ингредиентов больше не ждём: %s", expired)
+
+
+ingredient_index = IngredientIndex()
+register_metrics_source("ingredient_index", ingredient_index.stats)
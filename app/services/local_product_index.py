@@ -0,0 +1,241 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from decouple import config
+
+from app.core.metrics import register_metrics_source
+from app.schemas.product_dto import ProductDTO
+from app.services.cache_backends import dump_product, load_product
+
+logger = logging.getLogger(__name__)
+
+# Локальный индекс продуктов из выгрузки OpenBeautyFacts (app.db.obf_dump_to_db) —
+# поиск по штрих-коду без сети и без БД. Каталог OBF_DUMP_INDEX_DIR:
+# - products-<время>.dat — записи подряд в формате L2-кэша (dump_product):
+#   заголовок + zlib-сжатый JSON, несколько сотен байт на продукт;
+# - products.idx — заголовок (сигнатура, число записей, имя .dat) и отсортированный
+#   массив записей фиксированной длины: штрих-код (14 байт), смещение, длина.
+# Индекс читается через mmap бинарным поиском — в память процесса не загружается.
+# Дельта только дописывает в .dat и заменяет .idx (os.replace): старые смещения
+# остаются верными, читатели видят либо старый, либо новый индекс целиком.
+OBF_DUMP_INDEX_DIR = config("OBF_DUMP_INDEX_DIR", default="")
+# как часто проверять, не заменён ли индекс новой выгрузкой
+OBF_DUMP_INDEX_CHECK_SECONDS = config("OBF_DUMP_INDEX_CHECK_SECONDS", default=5.0, cast=float)
+
+INDEX_FILE = "products.idx"
+_MAGIC = b"OBFIDX1\n"
+_HEADER = struct.Struct("!8sQ64s")
+_ENTRY = struct.Struct("!14sQI")
+_KEY_SIZE = 14
+
+
+def _key(barcode: str) -> bytes | None:
+    """Ключ индекса: штрих-код, дополненный нулевыми байтами до 14 (EAN-8…ITF-14)"""
+    raw = barcode.encode("ascii", errors="ignore")
+    if not raw or len(raw) > _KEY_SIZE:
+        return None
+    return raw.ljust(_KEY_SIZE, b"\0")
+
+
+def _read_header(buffer) -> tuple[int, str]:
+    magic, count, data_name = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError("Неизвестный формат индекса продуктов")
+    return count, data_name.rstrip(b"\0").decode()
+
+
+class LocalIndexWriter:
+    """
+    Запись индекса. delta=False — новый .dat и индекс с нуля (старые файлы заменяются
+    только в commit), delta=True — дописывает к текущему индексу, новые записи
+    заменяют старые с тем же штрих-кодом. Память — O(число продуктов), не O(размер выгрузки).
+    """
+
+    def __init__(self, directory, delta: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: dict[bytes, tuple[int, int]] = {}
+        index_path = self.directory / INDEX_FILE
+        self._new_data = not (delta and index_path.exists())
+        if not self._new_data:
+            with open(index_path, "rb") as index_file:
+                count, self.data_name = _read_header(index_file.read(_HEADER.size))
+                for _ in range(count):
+                    key, offset, length = _ENTRY.unpack(index_file.read(_ENTRY.size))
+                    self._entries[key] = (offset, length)
+            self._previous_data = None
+        else:
+            self.data_name = f"products-{time.time_ns()}.dat"
+            self._previous_data = self._current_data_name()
+        self._data = open(self.directory / self.data_name, "ab")
+        self._offset = self._data.tell()
+
+    def _current_data_name(self) -> str | None:
+        try:
+            with open(self.directory / INDEX_FILE, "rb") as index_file:
+                return _read_header(index_file.read(_HEADER.size))[1]
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def add(self, data: ProductDTO, fetched_at: float) -> bool:
+        key = _key(data.barcode)
+        if key is None:
+            return False
+        record = dump_product(data, fetched_at)
+        self._data.write(record)
+        self._entries[key] = (self._offset, len(record))
+        self._offset += len(record)
+        return True
+
+    def commit(self) -> int:
+        """Сохраняет индекс; возвращает число продуктов в нём"""
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        self._data.close()
+        tmp_path = self.directory / (INDEX_FILE + ".tmp")
+        with open(tmp_path, "wb") as index_file:
+            index_file.write(
+                _HEADER.pack(_MAGIC, len(self._entries), self.data_name.encode())
+            )
+            for key in sorted(self._entries):
+                index_file.write(_ENTRY.pack(key, *self._entries[key]))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(tmp_path, self.directory / INDEX_FILE)
+        # открытые читателями mmap старого .dat остаются действительными до закрытия
+        if self._previous_data and self._previous_data != self.data_name:
+            (self.directory / self._previous_data).unlink(missing_ok=True)
+        logger.info("Индекс продуктов сохранён: %s записей", len(self._entries))
+        return len(self._entries)
+
+    def abort(self) -> None:
+        self._data.close()
+        if self._new_data:
+            # индекс на этот .dat так и не сослался
+            (self.directory / self.data_name).unlink(missing_ok=True)
+
+
+class _Mapping:
+    """Открытые mmap индекса и данных одного поколения"""
+
+    def __init__(self, directory: Path):
+        index_path = directory / INDEX_FILE
+        self.stat = os.stat(index_path)
+        with open(index_path, "rb") as index_file:
+            self.index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count, data_name = _read_header(self.index)
+        with open(directory / data_name, "rb") as data_file:
+            size = os.fstat(data_file.fileno()).st_size
+            self.data = (
+                mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+
+    def find(self, key: bytes) -> tuple[int, int] | None:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = _HEADER.size + middle * _ENTRY.size
+            current = self.index[position:position + _KEY_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                _, offset, length = _ENTRY.unpack_from(self.index, position)
+                return offset, length
+        return None
+
+
+class LocalProductIndex:
+    """Чтение индекса; новая выгрузка подхватывается без перезапуска (проверка раз в check_interval)"""
+
+    def __init__(
+        self,
+        directory,
+        check_interval: float = OBF_DUMP_INDEX_CHECK_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.directory = Path(directory)
+        self.check_interval = check_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._mapping: _Mapping | None = None
+        self._checked_at = None
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+
+    def _current(self) -> _Mapping | None:
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._mapping
+        self._checked_at = now
+        try:
+            stat = os.stat(self.directory / INDEX_FILE)
+        except FileNotFoundError:
+            return self._mapping
+        mapping = self._mapping
+        if mapping is None or (stat.st_ino, stat.st_mtime_ns) != (
+            mapping.stat.st_ino,
+            mapping.stat.st_mtime_ns,
+        ):
+            self._mapping = _Mapping(self.directory)
+            self._reloads += 1
+            logger.info("Индекс продуктов загружен: %s записей", self._mapping.count)
+            # старое поколение закроет сборщик мусора: его ещё может читать другой поток
+        return self._mapping
+
+    def get(self, barcode: str) -> tuple[ProductDTO, float] | None:
+        """(продукт, время выгрузки) или None — штрих-кода в выгрузке нет"""
+        key = _key(barcode)
+        with self._lock:
+            mapping = self._current()
+            found = mapping.find(key) if mapping is not None and key is not None else None
+            if found is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        offset, length = found
+        loaded = load_product(bytes(mapping.data[offset:offset + length]))
+        if loaded is None or loaded[0] is None:
+            return None
+        return loaded
+
+    def __len__(self) -> int:
+        with self._lock:
+            mapping = self._current()
+            return mapping.count if mapping is not None else 0
+
+    def stats(self) -> dict:
+        size = len(self)
+        with self._lock:
+            return {
+                "size": size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "reloads": self._reloads,
+            }
+
+
+_index: LocalProductIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalProductIndex | None:
+    """Индекс процесса или None, если OBF_DUMP_INDEX_DIR не задан"""
+    global _index
+    if _index is None and OBF_DUMP_INDEX_DIR:
+        with _index_lock:
+            if _index is None:
+                _index = LocalProductIndex(OBF_DUMP_INDEX_DIR)
+    return _index
+
+
+register_metrics_source(
+    "local_product_index", lambda: _index.stats() if _index is not None else {}
+)
@@ -0,0 +1,209 @@
+import asyncio
+import importlib
+import logging
+from time import perf_counter
+
+from app.core.bulkhead import AsyncBulkhead
+from app.core.metrics import register_metrics_source
+from app.exceptions.upstream import (
+    UpstreamBadResponse,
+    UpstreamTimeout,
+    UpstreamUnavailable,
+)
+from app.schemas.products_schema import OpenBeautyFactsResponse
+from app.services.openbeautyfacts_client import (
+    OBF_BASE_URL,
+    OBF_BULKHEAD_WAIT_SECONDS,
+    OBF_CONNECT_TIMEOUT,
+    OBF_MAX_CONCURRENT,
+    OBF_MAX_RESPONSE_BYTES,
+    OBF_POOL_MAXSIZE,
+    OBF_READ_TIMEOUT,
+    OBF_USER_AGENT,
+    PRODUCT_FIELDS,
+    check_status,
+    openbeautyfacts_breaker,
+    parse_product_response,
+    product_url,
+)
+
+logger = logging.getLogger(__name__)
+
+# Асинхронный клиент OpenBeautyFacts (aiohttp) для Telegram-бота и async API:
+# один на event loop, с пулом keep-alive соединений. Разбор статусов и ответа,
+# настройки и предохранитель — общие с синхронным клиентом; bulkhead — свой на loop.
+# aiohttp — необязательная зависимость (группа async в pyproject.toml):
+# нужна только асинхронному поиску.
+
+
+def _aiohttp():
+    try:
+        return importlib.import_module("aiohttp")
+    except ModuleNotFoundError as error:
+        raise RuntimeError(
+            "Для асинхронного поиска продуктов нужен пакет aiohttp: "
+            "poetry install -E async (или pip install 'otrazhenie[async]')"
+        ) from error
+
+
+class AsyncOpenBeautyFactsClient:
+    """HTTP-клиент OpenBeautyFacts на aiohttp; создаётся внутри работающего event loop"""
+
+    def __init__(
+        self,
+        base_url: str = OBF_BASE_URL,
+        connect_timeout: float = OBF_CONNECT_TIMEOUT,
+        read_timeout: float = OBF_READ_TIMEOUT,
+        pool_maxsize: int = OBF_POOL_MAXSIZE,
+        max_response_bytes: int = OBF_MAX_RESPONSE_BYTES,
+        session=None,
+    ):
+        aiohttp = _aiohttp()
+        self._aiohttp = aiohttp
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_response_bytes = max_response_bytes
+        self.session = session or aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_maxsize),
+            headers={
+                "User-Agent": OBF_USER_AGENT,
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip",
+            },
+        )
+        self._requests = 0
+        self._errors = 0
+        self._bytes = 0
+        self._total_seconds = 0.0
+
+    def _timeout(self, timeout: float | None):
+        connect, read = self.connect_timeout, self.read_timeout
+        if timeout is not None:
+            connect, read = min(connect, timeout), min(read, timeout)
+        # total — весь запрос целиком, включая чтение тела
+        return self._aiohttp.ClientTimeout(
+            total=timeout, sock_connect=connect, sock_read=read
+        )
+
+    async def _read_body(self, response) -> bytes:
+        if response.content_length and response.content_length > self.max_response_bytes:
+            raise UpstreamBadResponse(
+                f"Ответ OpenBeautyFacts слишком большой: {response.content_length} байт",
+                status=response.status,
+            )
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body += chunk
+            if len(body) > self.max_response_bytes:
+                raise UpstreamBadResponse(
+                    "Ответ OpenBeautyFacts больше "
+                    f"{self.max_response_bytes} байт после распаковки",
+                    status=response.status,
+                )
+        return bytes(body)
+
+    async def fetch_product(
+        self, barcode: str, timeout: float = None
+    ) -> OpenBeautyFactsResponse | None:
+        """То же, что OpenBeautyFactsClient.fetch_product, без блокировки event loop"""
+        started = perf_counter()
+        try:
+            return await self._fetch(barcode, timeout)
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._requests += 1
+            self._total_seconds += perf_counter() - started
+
+    async def _fetch(self, barcode: str, timeout: float | None) -> OpenBeautyFactsResponse | None:
+        try:
+            async with self.session.get(
+                product_url(self.base_url, barcode),
+                params={"fields": PRODUCT_FIELDS},
+                timeout=self._timeout(timeout),
+            ) as response:
+                status = response.status
+                logger.debug("Ответ API получен: %s", status)
+                if not check_status(status, response.headers.get("Retry-After")):
+                    return None
+                body = await self._read_body(response)
+        except asyncio.TimeoutError as error:
+            raise UpstreamTimeout(f"Таймаут OpenBeautyFacts: {error!r}") from error
+        except self._aiohttp.ClientError as error:
+            raise UpstreamUnavailable(
+                f"Ошибка соединения с OpenBeautyFacts: {error}"
+            ) from error
+
+        self._bytes += len(body)
+        return parse_product_response(body, status)
+
+    async def close(self) -> None:
+        await self.session.close()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self._requests,
+            "errors": self._errors,
+            "bytes_received": self._bytes,
+            "avg_ms": round(self._total_seconds / self._requests * 1000, 3)
+            if self._requests
+            else 0.0,
+        }
+
+
+# клиент и bulkhead привязаны к event loop, в котором созданы: loop → объект
+_client: tuple[asyncio.AbstractEventLoop, AsyncOpenBeautyFactsClient] | None = None
+_bulkhead: tuple[asyncio.AbstractEventLoop, AsyncBulkhead] | None = None
+
+
+def get_async_openbeautyfacts_client() -> AsyncOpenBeautyFactsClient:
+    """Клиент текущего event loop (создаётся при первом запросе)"""
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client[0] is not loop:
+        _client = loop, AsyncOpenBeautyFactsClient()
+    return _client[1]
+
+
+def _get_bulkhead() -> AsyncBulkhead:
+    global _bulkhead
+    loop = asyncio.get_running_loop()
+    if _bulkhead is None or _bulkhead[0] is not loop:
+        _bulkhead = loop, AsyncBulkhead(
+            "openbeautyfacts_async",
+            max_concurrent=OBF_MAX_CONCURRENT,
+            max_wait=OBF_BULKHEAD_WAIT_SECONDS,
+        )
+    return _bulkhead[1]
+
+
+async def close_async_openbeautyfacts_client() -> None:
+    """Закрывает клиент (при остановке бота)"""
+    global _client
+    current, _client = _client, None
+    if current is not None:
+        await current[1].close()
+
+
+async def fetch_product_guarded_async(
+    barcode: str, timeout: float = None, client: AsyncOpenBeautyFactsClient = None
+) -> OpenBeautyFactsResponse | None:
+    """
+    fetch_product через общий с синхронным клиентом предохранитель и bulkhead event loop.
+    Ошибки — как у fetch_product_guarded.
+    """
+    client = client or get_async_openbeautyfacts_client()
+    return await openbeautyfacts_breaker.call_async(
+        _get_bulkhead().call, client.fetch_product, barcode, timeout=timeout
+    )
+
+
+register_metrics_source(
+    "openbeautyfacts_async",
+    lambda: {
+        **(_client[1].stats() if _client is not None else {}),
+        **({"bulkhead": _bulkhead[1].stats()} if _bulkhead is not None else {}),
+    },
+)
@@ -0,0 +1,274 @@
+import json
+import logging
+import threading
+from time import perf_counter
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+
+from app.core.bulkhead import Bulkhead
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.metrics import register_metrics_source
+from app.exceptions.upstream import (
+    BulkheadFullError,
+    UpstreamBadResponse,
+    UpstreamRateLimited,
+    UpstreamTimeout,
+    UpstreamUnavailable,
+    parse_retry_after,
+)
+from app.schemas.products_schema import OpenBeautyFactsProduct, OpenBeautyFactsResponse
+
+logger = logging.getLogger(__name__)
+
+# Клиент OpenBeautyFacts: один на процесс, с пулом keep-alive соединений.
+# requests (urllib3) работает только по HTTP/1.1 — HTTP/2 потребовал бы другой
+# HTTP-клиент; переиспользование соединений снимает основную цену (TCP + TLS на запрос).
+OBF_BASE_URL = config("OBF_BASE_URL", default="https://world.openbeautyfacts.org")
+OBF_CONNECT_TIMEOUT = config("OBF_CONNECT_TIMEOUT", default=2.0, cast=float)
+# таймаут чтения в requests — на каждое чтение из сокета, а не на весь ответ
+OBF_READ_TIMEOUT = config("OBF_READ_TIMEOUT", default=5.0, cast=float)
+OBF_POOL_MAXSIZE = config("OBF_POOL_MAXSIZE", default=10, cast=int)
+# предел распакованного ответа: продукт с нужными полями — единицы КБ
+OBF_MAX_RESPONSE_BYTES = config("OBF_MAX_RESPONSE_BYTES", default=1024 * 1024, cast=int)
+OBF_USER_AGENT = config(
+    "OBF_USER_AGENT",
+    default="Otrazhenie/0.0.1 (+https://github.com/nikewalce/Otrazhenie)",
+)
+
+# Предохранитель: из последних OBF_BREAKER_WINDOW запросов (не меньше OBF_BREAKER_MIN_CALLS)
+# половина сбоев или 80% ответов дольше OBF_BREAKER_SLOW_CALL_SECONDS — запросы
+# не отправляются OBF_BREAKER_OPEN_SECONDS, затем OBF_BREAKER_HALF_OPEN_CALLS пробных
+OBF_BREAKER_WINDOW = config("OBF_BREAKER_WINDOW", default=20, cast=int)
+OBF_BREAKER_MIN_CALLS = config("OBF_BREAKER_MIN_CALLS", default=10, cast=int)
+OBF_BREAKER_FAILURE_RATE = config("OBF_BREAKER_FAILURE_RATE", default=0.5, cast=float)
+OBF_BREAKER_SLOW_CALL_SECONDS = config("OBF_BREAKER_SLOW_CALL_SECONDS", default=2.0, cast=float)
+OBF_BREAKER_SLOW_CALL_RATE = config("OBF_BREAKER_SLOW_CALL_RATE", default=0.8, cast=float)
+OBF_BREAKER_OPEN_SECONDS = config("OBF_BREAKER_OPEN_SECONDS", default=30.0, cast=float)
+OBF_BREAKER_HALF_OPEN_CALLS = config("OBF_BREAKER_HALF_OPEN_CALLS", default=3, cast=int)
+# Bulkhead: не больше OBF_MAX_CONCURRENT запросов одновременно на процесс (по умолчанию —
+# размер пула соединений), следующий ждёт слот OBF_BULKHEAD_WAIT_SECONDS и получает отказ
+OBF_MAX_CONCURRENT = config("OBF_MAX_CONCURRENT", default=OBF_POOL_MAXSIZE, cast=int)
+OBF_BULKHEAD_WAIT_SECONDS = config("OBF_BULKHEAD_WAIT_SECONDS", default=0.1, cast=float)
+
+# запрашиваем только поля, которые читает OpenBeautyFactsProduct
+PRODUCT_FIELDS = ",".join(OpenBeautyFactsProduct.model_fields)
+
+
+def product_url(base_url: str, barcode: str) -> str:
+    return f"{base_url}/api/v0/product/{barcode}.json"
+
+
+def check_status(status: int, retry_after: str | None) -> bool:
+    """
+    Разбор HTTP-статуса ответа (общий для синхронного и асинхронного клиентов):
+    True — тело нужно читать, False — продукта нет (404), сбои — UpstreamError.
+    """
+    if status == 429:
+        raise UpstreamRateLimited(
+            "OpenBeautyFacts: слишком много запросов",
+            status=status,
+            retry_after=parse_retry_after(retry_after),
+        )
+    if status >= 500:
+        raise UpstreamUnavailable(f"OpenBeautyFacts: HTTP {status}", status=status)
+    if status == 404:
+        return False
+    if status >= 400:
+        raise UpstreamBadResponse(f"OpenBeautyFacts: HTTP {status}", status=status)
+    return True
+
+
+def parse_product_response(body: bytes, status: int) -> OpenBeautyFactsResponse:
+    try:
+        return OpenBeautyFactsResponse.model_validate(json.loads(body))
+    except ValueError as error:
+        # json.JSONDecodeError и pydantic.ValidationError — оба ValueError
+        raise UpstreamBadResponse(
+            f"Ответ OpenBeautyFacts не прошёл валидацию: {error}", status=status
+        ) from error
+
+
+class OpenBeautyFactsClient:
+    """HTTP-клиент OpenBeautyFacts; base_url и session подменяются в тестах"""
+
+    def __init__(
+        self,
+        base_url: str = OBF_BASE_URL,
+        connect_timeout: float = OBF_CONNECT_TIMEOUT,
+        read_timeout: float = OBF_READ_TIMEOUT,
+        pool_maxsize: int = OBF_POOL_MAXSIZE,
+        max_response_bytes: int = OBF_MAX_RESPONSE_BYTES,
+        session: requests.Session = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_response_bytes = max_response_bytes
+        self.session = session or self._make_session(pool_maxsize)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._bytes = 0
+        self._total_seconds = 0.0
+
+    @staticmethod
+    def _make_session(pool_maxsize: int) -> requests.Session:
+        session = requests.Session()
+        # повторы — в RetryPolicy сервиса, здесь только пул соединений
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {
+                "User-Agent": OBF_USER_AGENT,
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip",
+            }
+        )
+        return session
+
+    def _timeouts(self, timeout: float | None) -> tuple[float, float]:
+        if timeout is None:
+            return self.connect_timeout, self.read_timeout
+        return min(self.connect_timeout, timeout), min(self.read_timeout, timeout)
+
+    def _read_body(self, response: requests.Response) -> bytes:
+        """Тело ответа (gzip распаковывается), не больше max_response_bytes"""
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_response_bytes:
+            raise UpstreamBadResponse(
+                f"Ответ OpenBeautyFacts слишком большой: {length} байт",
+                status=response.status_code,
+            )
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) > self.max_response_bytes:
+                raise UpstreamBadResponse(
+                    "Ответ OpenBeautyFacts больше "
+                    f"{self.max_response_bytes} байт после распаковки",
+                    status=response.status_code,
+                )
+        return bytes(body)
+
+    def fetch_product(
+        self, barcode: str, timeout: float = None
+    ) -> OpenBeautyFactsResponse | None:
+        """
+        Ответ API по штрих-коду. None — продукта нет (HTTP 404);
+        сбои — UpstreamError (retryable: таймауты, обрывы, 5xx, 429).
+        """
+        started = perf_counter()
+        try:
+            return self._fetch(barcode, timeout)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._requests += 1
+                self._total_seconds += perf_counter() - started
+
+    def _fetch(self, barcode: str, timeout: float | None) -> OpenBeautyFactsResponse | None:
+        try:
+            with self.session.get(
+                product_url(self.base_url, barcode),
+                params={"fields": PRODUCT_FIELDS},
+                timeout=self._timeouts(timeout),
+                stream=True,
+            ) as response:
+                status = response.status_code
+                logger.debug("Ответ API получен: %s", status)
+                if not check_status(status, response.headers.get("Retry-After")):
+                    return None
+                body = self._read_body(response)
+        except requests.Timeout as error:
+            raise UpstreamTimeout(f"Таймаут OpenBeautyFacts: {error}") from error
+        except requests.RequestException as error:
+            raise UpstreamUnavailable(
+                f"Ошибка соединения с OpenBeautyFacts: {error}"
+            ) from error
+
+        with self._lock:
+            self._bytes += len(body)
+        return parse_product_response(body, status)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "errors": self._errors,
+                "bytes_received": self._bytes,
+                "avg_ms": round(self._total_seconds / self._requests * 1000, 3)
+                if self._requests
+                else 0.0,
+            }
+
+
+_client: OpenBeautyFactsClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_openbeautyfacts_client() -> OpenBeautyFactsClient:
+    """Клиент процесса (создаётся при первом запросе — уже в воркере, после fork)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenBeautyFactsClient()
+    return _client
+
+
+def set_openbeautyfacts_client(client: OpenBeautyFactsClient | None) -> None:
+    """Подменяет клиент процесса (тесты, заглушка API); None — вернуть клиент по умолчанию"""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None and previous is not client:
+        previous.close()
+
+
+openbeautyfacts_breaker = CircuitBreaker(
+    "openbeautyfacts",
+    window_size=OBF_BREAKER_WINDOW,
+    min_calls=OBF_BREAKER_MIN_CALLS,
+    failure_rate_threshold=OBF_BREAKER_FAILURE_RATE,
+    slow_call_seconds=OBF_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate_threshold=OBF_BREAKER_SLOW_CALL_RATE,
+    open_seconds=OBF_BREAKER_OPEN_SECONDS,
+    half_open_calls=OBF_BREAKER_HALF_OPEN_CALLS,
+    # отказ bulkhead — запрос не отправлялся, о здоровье API он ничего не говорит
+    ignore=lambda error: isinstance(error, BulkheadFullError),
+)
+openbeautyfacts_bulkhead = Bulkhead(
+    "openbeautyfacts", max_concurrent=OBF_MAX_CONCURRENT, max_wait=OBF_BULKHEAD_WAIT_SECONDS
+)
+
+
+def fetch_product_guarded(
+    barcode: str, timeout: float = None, client: OpenBeautyFactsClient = None
+) -> OpenBeautyFactsResponse | None:
+    """
+    fetch_product через предохранитель и bulkhead процесса. Разомкнутый предохранитель —
+    CircuitOpenError сразу, без запроса; занятые слоты — BulkheadFullError.
+    Обе ошибки не retryable: повтор только добавил бы нагрузки.
+    """
+    client = client or get_openbeautyfacts_client()
+    return openbeautyfacts_breaker.call(
+        openbeautyfacts_bulkhead.call, client.fetch_product, barcode, timeout=timeout
+    )
+
+
+register_metrics_source(
+    "openbeautyfacts", lambda: _client.stats() if _client is not None else {}
+)
+register_metrics_source("openbeautyfacts_breaker", openbeautyfacts_breaker.stats)
+register_metrics_source("openbeautyfacts_bulkhead", openbeautyfacts_bulkhead.stats)
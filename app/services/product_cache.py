@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from cachetools import TLRUCache
+
+from app.schemas.product_dto import ProductDTO
+from app.services.cache_backends import CacheBackend, dump_product, load_product
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """Запись кэша продуктов: data=None — «продукт не найден» (негативная запись)"""
+
+    data: ProductDTO | None
+    # время получения от API — по часам системы (time.time), чтобы записи из общего
+    # L2-хранилища были сравнимы между процессами
+    fetched_at: float
+
+    @property
+    def found(self) -> bool:
+        return self.data is not None
+
+
+class ProductCache:
+    """
+    Кэш результатов поиска продуктов по штрих-коду (L1, в памяти процесса, LRU).
+
+    - найденный продукт свеж ttl секунд, затем ещё stale_ttl секунд хранится как
+      устаревший: его можно отдать сразу и обновить в фоне (stale-while-revalidate)
+      или отдать, если API недоступен (stale-if-error);
+    - «не найден» хранится negative_ttl секунд и устаревшим не бывает —
+      опечатка в штрих-коде не должна каждый раз уходить в API.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        stale_ttl: float,
+        negative_ttl: float,
+        timer=time.time,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.timer = timer
+        # время жизни у каждой записи своё: у негативных — короче
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._expires_at, timer=timer)
+        # cachetools не потокобезопасен
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+
+    def _expires_at(self, _key, entry: CacheEntry, _now: float) -> float:
+        if entry.found:
+            return entry.fetched_at + self.ttl + self.stale_ttl
+        return entry.fetched_at + self.negative_ttl
+
+    def get(self, barcode: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._cache.get(barcode)
+            if entry is None:
+                self._misses += 1
+            elif not entry.found:
+                self._negative_hits += 1
+            elif self.is_fresh(entry):
+                self._hits += 1
+            else:
+                self._stale_hits += 1
+            return entry
+
+    def peek(self, barcode: str) -> CacheEntry | None:
+        """Запись без учёта в статистике (повторная проверка внутри одного поиска)"""
+        with self._lock:
+            return self._cache.get(barcode)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        ttl = self.ttl if entry.found else self.negative_ttl
+        return self.timer() < entry.fetched_at + ttl
+
+    def put(self, barcode: str, data: ProductDTO | None) -> CacheEntry:
+        entry = CacheEntry(data=data, fetched_at=self.timer())
+        self.put_entry(barcode, entry)
+        return entry
+
+    def put_entry(self, barcode: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._cache[barcode] = entry
+
+    # asyncio: L1 в памяти процесса — обращение не блокирует event loop
+    async def get_async(self, barcode: str) -> CacheEntry | None:
+        return self.get(barcode)
+
+    async def peek_async(self, barcode: str) -> CacheEntry | None:
+        return self.peek(barcode)
+
+    async def put_async(self, barcode: str, data: ProductDTO | None) -> CacheEntry:
+        return self.put(barcode, data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "negative_hits": self._negative_hits,
+                "misses": self._misses,
+            }
+
+
+class TieredProductCache:
+    """
+    Двухуровневый кэш: L1 — ProductCache процесса, L2 — общее хранилище (CacheBackend).
+    Промах или устаревшая запись в L1 проверяются в L2 (его мог обновить другой воркер),
+    запись идёт в оба уровня. Сбой L2 не ломает поиск — только логируется.
+    Интерфейс тот же, что у ProductCache.
+    """
+
+    def __init__(
+        self,
+        l1: ProductCache,
+        l2: CacheBackend | None,
+        l2_ttl: float,
+        l2_negative_ttl: float,
+    ):
+        self.l1 = l1
+        self.l2 = l2
+        self.l2_ttl = l2_ttl
+        self.l2_negative_ttl = l2_negative_ttl
+        self._lock = threading.Lock()
+        self._l2_hits = 0
+        self._l2_misses = 0
+        self._l2_errors = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _from_l2(self, barcode: str) -> CacheEntry | None:
+        try:
+            raw = self.l2.get(barcode)
+        except Exception:
+            self._count("_l2_errors")
+            logger.warning("L2-кэш продуктов недоступен (чтение)", exc_info=True)
+            return None
+        loaded = load_product(raw) if raw is not None else None
+        if loaded is None:
+            self._count("_l2_misses")
+            return None
+        entry = CacheEntry(data=loaded[0], fetched_at=loaded[1])
+        if not entry.found and not self.l1.is_fresh(entry):
+            # негативная запись живёт в L2 дольше, чем считается свежей
+            self._count("_l2_misses")
+            return None
+        self._count("_l2_hits")
+        return entry
+
+    def _lookup(self, entry: CacheEntry | None, barcode: str) -> CacheEntry | None:
+        if self.l2 is None or (entry is not None and self.l1.is_fresh(entry)):
+            return entry
+        shared = self._from_l2(barcode)
+        if shared is not None and (entry is None or shared.fetched_at > entry.fetched_at):
+            self.l1.put_entry(barcode, shared)
+            return shared
+        return entry
+
+    def get(self, barcode: str) -> CacheEntry | None:
+        return self._lookup(self.l1.get(barcode), barcode)
+
+    def peek(self, barcode: str) -> CacheEntry | None:
+        return self._lookup(self.l1.peek(barcode), barcode)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return self.l1.is_fresh(entry)
+
+    def put(self, barcode: str, data: ProductDTO | None) -> CacheEntry:
+        entry = self.l1.put(barcode, data)
+        if self.l2 is not None:
+            ttl = self.l2_ttl if entry.found else self.l2_negative_ttl
+            try:
+                self.l2.set(barcode, dump_product(data, entry.fetched_at), ttl)
+            except Exception:
+                self._count("_l2_errors")
+                logger.warning("L2-кэш продуктов недоступен (запись)", exc_info=True)
+        return entry
+
+    # --- asyncio: L1 читается сразу (память процесса), L2 — в пуле потоков,
+    # чтобы сетевой или дисковый ввод-вывод не блокировал event loop ---
+
+    async def _lookup_async(self, entry: CacheEntry | None, barcode: str) -> CacheEntry | None:
+        if self.l2 is None or (entry is not None and self.l1.is_fresh(entry)):
+            return entry
+        return await asyncio.to_thread(self._lookup, entry, barcode)
+
+    async def get_async(self, barcode: str) -> CacheEntry | None:
+        return await self._lookup_async(self.l1.get(barcode), barcode)
+
+    async def peek_async(self, barcode: str) -> CacheEntry | None:
+        return await self._lookup_async(self.l1.peek(barcode), barcode)
+
+    async def put_async(self, barcode: str, data: ProductDTO | None) -> CacheEntry:
+        if self.l2 is None:
+            return self.l1.put(barcode, data)
+        return await asyncio.to_thread(self.put, barcode, data)
+
+    def warm(self, limit: int) -> int:
+        """Заполняет L1 записями из L2 (при старте воркера); возвращает число записей"""
+        if self.l2 is None or limit <= 0:
+            return 0
+        loaded = 0
+        try:
+            for barcode, raw in self.l2.scan(limit):
+                item = load_product(raw)
+                if item is None:
+                    continue
+                entry = CacheEntry(data=item[0], fetched_at=item[1])
+                if entry.found or self.l1.is_fresh(entry):
+                    self.l1.put_entry(barcode, entry)
+                    loaded += 1
+        except Exception:
+            self._count("_l2_errors")
+            logger.warning("Прогрев кэша продуктов из L2 не удался", exc_info=True)
+        logger.info("Кэш продуктов прогрет из L2: записей=%s", loaded)
+        return loaded
+
+    def clear(self) -> None:
+        """Очищает только L1: L2 общий для всех процессов"""
+        self.l1.clear()
+
+    def __len__(self) -> int:
+        return len(self.l1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            l2 = {
+                "l2_backend": self.l2.name if self.l2 is not None else None,
+                "l2_hits": self._l2_hits,
+                "l2_misses": self._l2_misses,
+                "l2_errors": self._l2_errors,
+            }
+        return {**self.l1.stats(), **l2}
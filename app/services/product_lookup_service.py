@@ -1,78 +1,709 @@
-from time import sleep
-from typing import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Awaitable, Callable, Iterable, Iterator
+import asyncio
 import logging
-from cachetools import TTLCache
+import threading
+from decouple import config
 
-from app.analyzers.qr_reader import get_cosmetic_info
+from app.analyzers.qr_reader import fetch_cosmetic_info, fetch_cosmetic_info_async
+from app.core.metrics import register_metrics_source
+from app.core.retry import RetryPolicy
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+from app.db.crud import OtrazhenieDB
+from app.exceptions.upstream import BulkheadFullError, CircuitOpenError, UpstreamError
 from app.schemas.product_dto import ProductDTO
+from app.schemas.product_mapper import product_columns, product_from_row
+from app.schemas.products_schema import ProductCreateSchema
+from app.services.cache_backends import make_backend
+from app.services.local_product_index import get_local_index
+from app.services.product_cache import ProductCache, TieredProductCache
 
 logger = logging.getLogger(__name__)
 
 # - нормализацией ответа OpenBeautyFacts в внутренний DTO
-# изоляция внешних зависимостей + управление надежностью Route → Service → (Cache → Retry → API) → DTO → Route
-cache = TTLCache(
-    maxsize=1000, ttl=300
-)  # maxsize - текущий размер кэша, ttl - Значение времени жизни элементов в кэше (5 минут)
+# изоляция внешних зависимостей + управление надежностью
+# Route → Service → (Cache → DB → выгрузка OBF → Retry → Breaker → Bulkhead → API
+#       → DB write-back) → DTO → Route
+
+# Кэш: найденный продукт свеж LOOKUP_CACHE_TTL_SECONDS (5 минут), затем ещё
+# LOOKUP_STALE_TTL_SECONDS отдаётся устаревшим (с фоновым обновлением или при сбое API);
+# «не найден» помнится LOOKUP_NEGATIVE_TTL_SECONDS
+LOOKUP_CACHE_SIZE = config("LOOKUP_CACHE_SIZE", default=1000, cast=int)
+LOOKUP_CACHE_TTL_SECONDS = config("LOOKUP_CACHE_TTL_SECONDS", default=300, cast=float)
+LOOKUP_STALE_TTL_SECONDS = config("LOOKUP_STALE_TTL_SECONDS", default=3600, cast=float)
+LOOKUP_NEGATIVE_TTL_SECONDS = config("LOOKUP_NEGATIVE_TTL_SECONDS", default=60, cast=float)
+# True — устаревшая запись отдаётся сразу, обновление идёт в фоне;
+# False — обновление синхронно, устаревшая запись отдаётся только при сбое API
+LOOKUP_STALE_WHILE_REVALIDATE = config(
+    "LOOKUP_STALE_WHILE_REVALIDATE", default=True, cast=bool
+)
+LOOKUP_REFRESH_WORKERS = config("LOOKUP_REFRESH_WORKERS", default=2, cast=int)
+
+# L2 — общий кэш воркеров: none / memory / sqlite (LOOKUP_L2_LOCATION — путь к файлу) /
+# redis (LOOKUP_L2_LOCATION — URL). Время жизни в L2 своё: по умолчанию сутки,
+# записи старше LOOKUP_CACHE_TTL_SECONDS отдаются как устаревшие и обновляются в фоне
+LOOKUP_L2_BACKEND = config("LOOKUP_L2_BACKEND", default="none")
+LOOKUP_L2_LOCATION = config("LOOKUP_L2_LOCATION", default="")
+LOOKUP_L2_TTL_SECONDS = config("LOOKUP_L2_TTL_SECONDS", default=86400, cast=float)
+LOOKUP_L2_NEGATIVE_TTL_SECONDS = config(
+    "LOOKUP_L2_NEGATIVE_TTL_SECONDS", default=LOOKUP_NEGATIVE_TTL_SECONDS, cast=float
+)
+# сколько записей L2 загрузить в L1 при старте воркера
+LOOKUP_L2_WARM_LIMIT = config("LOOKUP_L2_WARM_LIMIT", default=LOOKUP_CACHE_SIZE, cast=int)
+
+product_cache = TieredProductCache(
+    ProductCache(
+        maxsize=LOOKUP_CACHE_SIZE,
+        ttl=LOOKUP_CACHE_TTL_SECONDS,
+        stale_ttl=LOOKUP_STALE_TTL_SECONDS,
+        negative_ttl=LOOKUP_NEGATIVE_TTL_SECONDS,
+    ),
+    make_backend(LOOKUP_L2_BACKEND, LOOKUP_L2_LOCATION),
+    l2_ttl=LOOKUP_L2_TTL_SECONDS,
+    l2_negative_ttl=LOOKUP_L2_NEGATIVE_TTL_SECONDS,
+)
+lookup_flight = SingleFlight()
+register_metrics_source("product_lookup_single_flight", lookup_flight.stats)
+
+# Таблица products — долговременный кэш: продукт, полученный из API не раньше
+# LOOKUP_DB_MAX_AGE_SECONDS назад (по умолчанию неделя), берётся из базы без запроса к API.
+# Продукты, добавленные вручную (fetched_at пустой), из API не обновляются.
+# Новые ответы API записываются в базу в фоне (LOOKUP_DB_WRITE_BACK).
+# Продукт, которого нет в базе или который устарел, ищется в локальном индексе выгрузки
+# OpenBeautyFacts (OBF_DUMP_INDEX_DIR, app.db.obf_dump_to_db) и только затем в API;
+# выгрузка старше того же LOOKUP_DB_MAX_AGE_SECONDS отдаётся только при сбое API
+LOOKUP_DB_READ_THROUGH = config("LOOKUP_DB_READ_THROUGH", default=True, cast=bool)
+LOOKUP_DB_MAX_AGE_SECONDS = config("LOOKUP_DB_MAX_AGE_SECONDS", default=604800, cast=float)
+LOOKUP_DB_WRITE_BACK = config("LOOKUP_DB_WRITE_BACK", default=True, cast=bool)
+
+# Бюджет времени на поиск продукта в API: все попытки и паузы между ними укладываются
+# в LOOKUP_DEADLINE_SECONDS, одна попытка — не дольше LOOKUP_ATTEMPT_TIMEOUT_SECONDS
+LOOKUP_DEADLINE_SECONDS = config("LOOKUP_DEADLINE_SECONDS", default=6.0, cast=float)
+LOOKUP_ATTEMPT_TIMEOUT_SECONDS = config(
+    "LOOKUP_ATTEMPT_TIMEOUT_SECONDS", default=3.0, cast=float
+)
+LOOKUP_MAX_ATTEMPTS = config("LOOKUP_MAX_ATTEMPTS", default=3, cast=int)
+LOOKUP_BACKOFF_BASE_SECONDS = config("LOOKUP_BACKOFF_BASE_SECONDS", default=0.2, cast=float)
+LOOKUP_BACKOFF_MAX_SECONDS = config("LOOKUP_BACKOFF_MAX_SECONDS", default=2.0, cast=float)
+
+lookup_retry_policy = RetryPolicy(
+    max_attempts=LOOKUP_MAX_ATTEMPTS,
+    deadline=LOOKUP_DEADLINE_SECONDS,
+    attempt_timeout=LOOKUP_ATTEMPT_TIMEOUT_SECONDS,
+    base_delay=LOOKUP_BACKOFF_BASE_SECONDS,
+    max_delay=LOOKUP_BACKOFF_MAX_SECONDS,
+)
+register_metrics_source("product_lookup_retry", lookup_retry_policy.stats)
+
+# фоновые обновления устаревших записей и запись ответов API в базу
+_refresh_executor: ThreadPoolExecutor | None = None
+_write_back_executor: ThreadPoolExecutor | None = None
+_refreshing: set[str] = set()
+_state_lock = threading.Lock()
+_counters = {
+    "refreshes": 0,
+    "refresh_errors": 0,
+    "stale_if_error": 0,
+    "fail_fast": 0,
+    "db_hits": 0,
+    "db_stale": 0,
+    "db_errors": 0,
+    "local_hits": 0,
+    "local_stale": 0,
+    "local_errors": 0,
+    "write_backs": 0,
+    "write_back_errors": 0,
+    "batches": 0,
+    "batch_barcodes": 0,
+    "batch_upstream": 0,
+}
+
+
+def _count(name: str) -> None:
+    with _state_lock:
+        _counters[name] += 1
+
+
+def lookup_stats() -> dict:
+    with _state_lock:
+        counters = dict(_counters)
+        counters["refreshing"] = len(_refreshing)
+    return {**product_cache.stats(), **counters}
+
+
+register_metrics_source("product_lookup_cache", lookup_stats)
+
+
+def _db() -> OtrazhenieDB:
+    # engine и пул общие для всех экземпляров — создание дешёвое
+    return OtrazhenieDB()
+
+
+def _utcnow() -> datetime:
+    # fetched_at хранится без tzinfo, в UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _read_stored(barcode: str):
+    """Строка продукта из базы или None (нет в базе, чтение выключено или база недоступна)"""
+    if not LOOKUP_DB_READ_THROUGH:
+        return None
+    try:
+        return _db().select_product_for_lookup(barcode)
+    except Exception:
+        _count("db_errors")
+        logger.exception("Ошибка чтения продукта из базы: barcode=%s", barcode)
+        return None
+
+
+def _read_stored_many(barcodes: list[str]) -> dict:
+    """Строки продуктов пачки из базы одним запросом: штрих-код → строка"""
+    if not LOOKUP_DB_READ_THROUGH or not barcodes:
+        return {}
+    try:
+        return _db().select_products_for_lookup(barcodes)
+    except Exception:
+        _count("db_errors")
+        logger.exception("Ошибка чтения пачки продуктов из базы: %s штрих-кодов", len(barcodes))
+        return {}
+
+
+def _read_local(barcode: str) -> tuple[ProductDTO, datetime] | None:
+    """
+    Продукт из локального индекса выгрузки OpenBeautyFacts (если он настроен)
+    и время выгрузки, в которой он записан (UTC, без tzinfo — как fetched_at в базе)
+    """
+    try:
+        index = get_local_index()
+        found = index.get(barcode) if index is not None else None
+    except Exception:
+        _count("local_errors")
+        logger.exception("Ошибка чтения локального индекса продуктов: barcode=%s", barcode)
+        return None
+    if found is None:
+        return None
+    data, dumped_at = found
+    return data, datetime.fromtimestamp(dumped_at, timezone.utc).replace(tzinfo=None)
+
+
+def _is_fresh(fetched_at: datetime) -> bool:
+    return _utcnow() - fetched_at < timedelta(seconds=LOOKUP_DB_MAX_AGE_SECONDS)
+
+
+def _stored_is_fresh(row) -> bool:
+    return row.fetched_at is None or _is_fresh(row.fetched_at)
+
+
+def _write_back(data: ProductDTO, fetched_at: datetime) -> None:
+    try:
+        _db().save_fetched_product(**product_columns(data, fetched_at))
+        _count("write_backs")
+    except Exception:
+        _count("write_back_errors")
+        logger.exception("Ошибка записи продукта в базу: barcode=%s", data.barcode)
+
+
+def _schedule_write_back(data: ProductDTO) -> None:
+    """Запись ответа API в базу в фоне: поиск не ждёт разбора состава и привязки ингредиентов"""
+    global _write_back_executor
+    if not LOOKUP_DB_WRITE_BACK:
+        return
+    with _state_lock:
+        if _write_back_executor is None:
+            # один поток: записи идут по очереди и не спорят за блокировки базы
+            _write_back_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="product-write-back"
+            )
+    _write_back_executor.submit(_write_back, data, _utcnow())
+
+
+def _fetch_from_api(
+    api_function: Callable[..., ProductDTO | None], barcode: str, policy: RetryPolicy
+) -> ProductDTO | None:
+    """Запрос с повторами; сбой после всех попыток — исключение UpstreamError"""
+    result = policy.call(lambda timeout: api_function(barcode, timeout=timeout))
+    if result:
+        logger.info("УСПЕХ: товар найден в API: barcode=%s", barcode)
+    else:
+        logger.info("API: товар не найден: barcode=%s", barcode)
+    return result
 
 
 def fetch_with_retry(
-    api_function: Callable[[str], ProductDTO | None], barcode: str, retries: int = 3
+    api_function: Callable[..., ProductDTO | None],
+    barcode: str,
+    policy: RetryPolicy = None,
 ) -> ProductDTO | None:
-    # Экспоненциальное откладывание (exponential backoff),
-    # пробуем 3 раза обращаться к API, если не работает -> None
-    for attempt in range(retries):
-        try:
-            logger.debug(
-                "Попытка запроса к API: barcode=%s, попытка %s из %s",
-                barcode,
-                attempt + 1,
-                retries
-            )
-            result = api_function(barcode)
-
-            if result:
-                logger.info(
-                    "УСПЕХ: товар найден в API: barcode=%s, попытка %s",
-                    barcode,
-                    attempt + 1
-                )
-                return result
-            else:
-                logger.debug(
-                    "API вернул пустой результат: barcode=%s, попытка %s из %s",
-                    barcode,
-                    attempt + 1,
-                    retries
-                )
-        except Exception as e:
-            logger.exception(
-                "ОШИБКА API: barcode=%s, попытка %s из %s",
-                barcode,
-                attempt + 1,
-                retries
-            )
-        sleep(2**attempt)  # backoff
-        logger.warning(
-            "ИТОГ: товар НЕ НАЙДЕН после всех попыток: barcode=%s, попыток=%s",
-            barcode,
-            retries
-        )
+    """
+    Запрос к API с повторами по политике (по умолчанию lookup_retry_policy).
+    api_function(barcode, timeout=...) возвращает DTO или None («не найден» — не повторяется),
+    сбои сообщает исключениями UpstreamError. Общее время ограничено дедлайном политики.
+    """
+    try:
+        return _fetch_from_api(api_function, barcode, policy or lookup_retry_policy)
+    except (CircuitOpenError, BulkheadFullError) as error:
+        logger.warning("API не опрашивается (%s): barcode=%s", error, barcode)
+    except UpstreamError:
+        logger.exception("ОШИБКА API: barcode=%s (повторы исчерпаны или бессмысленны)", barcode)
+    except Exception:
+        logger.exception("Неожиданная ошибка API: barcode=%s", barcode)
     return None
 
 
-def get_product_info_from_api(barcode: str):
-    """Получение данных о продукте из API В продакшене можно поменять на Redis"""
-    # 1. cache
-    if barcode in cache:
-        logger.info("CACHE HIT: код=%s (данные взяты из кеша)", barcode)
-        return cache[barcode]
+# строка базы ещё не прочитана (пакетный поиск читает базу заранее, одним запросом)
+_UNREAD = object()
+
+
+def _resolve_offline(
+    barcode: str, row=_UNREAD
+) -> tuple[ProductDTO | None, ProductDTO | None]:
+    """
+    Поиск без API: база, затем локальный индекс выгрузки. Выгрузка старше
+    LOOKUP_DB_MAX_AGE_SECONDS, как и устаревшая запись базы, идёт в API.
+    :param row: уже прочитанная строка базы (None — продукта в базе нет)
+    :return: (ответ или None — нужен API, устаревшая запись базы или выгрузки
+        для stale-if-error — более свежая из двух)
+    """
+    if row is _UNREAD:
+        row = _read_stored(barcode)
+    stored = product_from_row(row) if row is not None else None
+    if stored is not None:
+        if _stored_is_fresh(row):
+            _count("db_hits")
+            logger.info("DB HIT: код=%s (данные взяты из базы)", barcode)
+            return stored, None
+        _count("db_stale")
+        logger.info("DB STALE: код=%s (данные в базе устарели)", barcode)
+
+    local = _read_local(barcode)
+    if local is None:
+        return None, stored
+    data, dumped_at = local
+    if _is_fresh(dumped_at):
+        _count("local_hits")
+        logger.info("LOCAL HIT: код=%s (данные взяты из выгрузки OpenBeautyFacts)", barcode)
+        return data, stored
+    _count("local_stale")
+    logger.info("LOCAL STALE: код=%s (выгрузка OpenBeautyFacts устарела)", barcode)
+    if stored is None or row.fetched_at < dumped_at:
+        stored = data
+    return None, stored
+
+
+def _on_api_error(barcode: str, error: Exception, entry, stored) -> ProductDTO | None:
+    """Сбой API: устаревшая запись кэша или базы, если есть (stale-if-error), иначе None"""
+    if isinstance(error, (CircuitOpenError, BulkheadFullError)):
+        # предохранитель разомкнут или слоты заняты — запроса не было, трассировка не нужна
+        _count("fail_fast")
+        logger.warning("API не опрашивается (%s): barcode=%s", error, barcode)
+    else:
+        logger.error("ОШИБКА API: barcode=%s", barcode, exc_info=error)
+    fallback = entry.data if entry is not None and entry.found else stored
+    if fallback is not None:
+        _count("stale_if_error")
+        logger.warning("API недоступен, отдаём устаревшие данные: barcode=%s", barcode)
+    # сбой — не «не найден»: негативная запись не создаётся
+    return fallback
+
+
+def _raise_lookup_error(error: Exception):
+    """Сбой API без устаревших данных: лидер и ожидающие single-flight получают UpstreamError"""
+    if isinstance(error, UpstreamError):
+        raise error
+    raise UpstreamError(f"Неожиданная ошибка API: {error!r}") from error
+
+
+def _on_api_result(barcode: str, data: ProductDTO | None, stored) -> ProductDTO | None:
+    """Ответ API: найденный продукт записывается в базу, «не найден» заменяется записью базы"""
+    if data is not None:
+        _schedule_write_back(data)
+    elif stored is not None:
+        # продукт пропал из OpenBeautyFacts, но известен нам — не теряем его
+        logger.info("API: товар не найден, отдаём данные из базы: barcode=%s", barcode)
+        data = stored
+    return data
+
+
+def _load_product(barcode: str) -> ProductDTO | None:
+    """
+    Поиск для лидера single-flight: база, выгрузка, затем API; результат кладётся в кэш
+    до раздачи ожидающим. При сбое API отдаётся устаревшая запись кэша или базы,
+    если она есть (stale-if-error), иначе — исключение UpstreamError.
+    """
+    entry = product_cache.peek(barcode)
+    # кэш мог обновиться, пока этот вызов ждал своей очереди
+    if entry is not None and product_cache.is_fresh(entry):
+        return entry.data
+
+    data, stored = _resolve_offline(barcode)
+    if data is None:
+        return _load_from_api(barcode, entry, stored)
+    product_cache.put(barcode, data)
+    return data
+
+
+def _load_from_api(barcode: str, entry, stored) -> ProductDTO | None:
+    """API для продукта, которого нет ни в кэше, ни в базе, ни в выгрузке"""
+    try:
+        data = _fetch_from_api(fetch_cosmetic_info, barcode, lookup_retry_policy)
+    except Exception as error:
+        fallback = _on_api_error(barcode, error, entry, stored)
+        if fallback is None:
+            _raise_lookup_error(error)
+        return fallback
+    data = _on_api_result(barcode, data, stored)
+    product_cache.put(barcode, data)
+    return data
+
+
+def _refresh(barcode: str) -> None:
+    try:
+        lookup_flight.do(barcode, lambda: _load_product(barcode))
+    except Exception:
+        _count("refresh_errors")
+        logger.exception("Ошибка фонового обновления: barcode=%s", barcode)
+    finally:
+        with _state_lock:
+            _refreshing.discard(barcode)
+
+
+def _schedule_refresh(barcode: str) -> None:
+    """Фоновое обновление устаревшей записи (не больше одного на штрих-код)"""
+    global _refresh_executor
+    with _state_lock:
+        if barcode in _refreshing:
+            return
+        _refreshing.add(barcode)
+        _counters["refreshes"] += 1
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=LOOKUP_REFRESH_WORKERS, thread_name_prefix="product-refresh"
+            )
+    _refresh_executor.submit(_refresh, barcode)
+
+
+def warm_product_cache() -> int:
+    """Прогрев L1 из общего L2 (вызывается при старте приложения)"""
+    return product_cache.warm(LOOKUP_L2_WARM_LIMIT)
+
+
+def _from_cache(barcode: str, entry, schedule_refresh) -> tuple[bool, ProductDTO | None]:
+    """(ответ готов, данные) по записи кэша; устаревшая запись — в фоне schedule_refresh"""
+    if entry is not None:
+        if not entry.found:
+            logger.info("NEGATIVE CACHE HIT: код=%s (недавно не найден)", barcode)
+            return True, None
+        if product_cache.is_fresh(entry):
+            logger.info("CACHE HIT: код=%s (данные взяты из кеша)", barcode)
+            return True, entry.data
+        if LOOKUP_STALE_WHILE_REVALIDATE:
+            logger.info("STALE HIT: код=%s (отдаём из кеша, обновляем в фоне)", barcode)
+            schedule_refresh(barcode)
+            return True, entry.data
     logger.info("CACHE MISS: код=%s (обращение к API)", barcode)
-    # 2. API + retry
-    data = fetch_with_retry(get_cosmetic_info, barcode, 3)
-    # 3. cache only valid data
+    return False, None
+
+
+def _log_result(barcode: str, data: ProductDTO | None) -> None:
     if data:
         logger.info("ИТОГ: продукт НАЙДЕН (barcode=%s)", barcode)
-        cache[barcode] = data
     else:
         logger.warning("ИТОГ: продукт НЕ НАЙДЕН (barcode=%s)", barcode)
+
+
+def get_product_info_from_api(barcode: str):
+    """Получение данных о продукте из API В продакшене можно поменять на Redis"""
+    # 1. cache
+    answered, data = _from_cache(barcode, product_cache.get(barcode), _schedule_refresh)
+    if answered:
+        return data
+    # 2. API + retry; одновременные запросы одного штрих-кода ждут один запрос к API
+    try:
+        data = lookup_flight.do(barcode, lambda: _load_product(barcode))
+    except UpstreamError:
+        # сбой API уже записан в журнал (_on_api_error); для страницы это «не найден»
+        data = None
+    _log_result(barcode, data)
+    return data
+
+
+# --- пакетный поиск: полка или список заказа одним запросом ---
+# Те же шаги, что у одиночного поиска, но пачкой: штрих-коды проверяются в кэше, промахи
+# читаются из базы одним IN-запросом и ищутся в выгрузке; только оставшиеся уходят в API —
+# параллельно, не больше LOOKUP_BATCH_PARALLELISM запросов одной пачки сразу, в общем
+# пуле из LOOKUP_BATCH_WORKERS потоков (пачки разных клиентов делят его по очереди).
+# Результаты отдаются по мере готовности, а не в порядке запроса.
+LOOKUP_BATCH_MAX_SIZE = config("LOOKUP_BATCH_MAX_SIZE", default=500, cast=int)
+LOOKUP_BATCH_PARALLELISM = config("LOOKUP_BATCH_PARALLELISM", default=4, cast=int)
+# вместе с одиночными поисками не должен заметно превышать OBF_MAX_CONCURRENT:
+# запросы сверх слотов bulkhead отклоняются
+LOOKUP_BATCH_WORKERS = config("LOOKUP_BATCH_WORKERS", default=8, cast=int)
+
+# статусы результата пакетного поиска
+FOUND = "found"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+ERROR = "error"
+
+_batch_executor: ThreadPoolExecutor | None = None
+
+
+@dataclass
+class BatchLookupResult:
+    barcode: str
+    status: str
+    # cache — кэш; local — база или выгрузка OpenBeautyFacts; upstream — API
+    source: str | None = None
+    product: ProductDTO | None = None
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "barcode": self.barcode,
+            "status": self.status,
+            "source": self.source,
+            "product": self.product.model_dump() if self.product is not None else None,
+            "error": self.error,
+        }
+
+
+def _found(barcode: str, data: ProductDTO | None, source: str) -> BatchLookupResult:
+    return BatchLookupResult(barcode, FOUND if data else NOT_FOUND, source, data or None)
+
+
+def _validate_batch(barcodes: list) -> tuple[list[str], list[BatchLookupResult]]:
+    """(корректные штрих-коды без повторов в порядке запроса, результаты для неверных)"""
+    valid, invalid = {}, []
+    for raw in barcodes:
+        try:
+            barcode = ProductCreateSchema.validate_barcode(str(raw))
+        except ValueError:
+            invalid.append(
+                BatchLookupResult(str(raw), INVALID, error="Неверный формат штрих-кода")
+            )
+            continue
+        valid[barcode] = None
+    return list(valid), invalid
+
+
+def _load_batch_miss(barcode: str, stored: ProductDTO | None) -> ProductDTO | None:
+    entry = product_cache.peek(barcode)
+    # пока промах ждал потока, его мог найти другой запрос
+    if entry is not None and product_cache.is_fresh(entry):
+        return entry.data
+    return _load_from_api(barcode, entry, stored)
+
+
+def _lookup_batch_miss(barcode: str, stored: ProductDTO | None) -> ProductDTO | None:
+    # одиночный поиск того же штрих-кода и пакетный ждут один запрос к API
+    return lookup_flight.do(barcode, lambda: _load_batch_miss(barcode, stored))
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    global _batch_executor
+    with _state_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=LOOKUP_BATCH_WORKERS, thread_name_prefix="product-batch"
+            )
+        return _batch_executor
+
+
+def _fan_out(
+    misses: list[tuple[str, ProductDTO | None]], parallelism: int
+) -> Iterator[BatchLookupResult]:
+    """Промахи — в API, не больше parallelism сразу; результаты — по мере готовности"""
+    executor = _get_batch_executor()
+    queue = iter(misses)
+    pending = {}
+    try:
+        while True:
+            while len(pending) < parallelism:
+                miss = next(queue, None)
+                if miss is None:
+                    break
+                pending[executor.submit(_lookup_batch_miss, *miss)] = miss[0]
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                barcode = pending.pop(future)
+                try:
+                    data = future.result()
+                except UpstreamError:
+                    # подробности уже в журнале (_on_api_error)
+                    yield BatchLookupResult(
+                        barcode,
+                        ERROR,
+                        "upstream",
+                        error="OpenBeautyFacts недоступен, повторите запрос позже",
+                    )
+                    continue
+                except Exception:
+                    logger.exception("Ошибка пакетного поиска: barcode=%s", barcode)
+                    yield BatchLookupResult(
+                        barcode, ERROR, "upstream", error="Ошибка при поиске продукта"
+                    )
+                    continue
+                _log_result(barcode, data)
+                yield _found(barcode, data, "upstream")
+    finally:
+        # клиент отключился или пачка прервана: ещё не начатые запросы не нужны
+        for future in pending:
+            future.cancel()
+
+
+def _lookup_batch(
+    valid: list[str], invalid: list[BatchLookupResult], parallelism: int, requested: int
+) -> Iterator[BatchLookupResult]:
+    with _state_lock:
+        _counters["batches"] += 1
+        _counters["batch_barcodes"] += requested
+    started = perf_counter()
+    sources = {"cache": 0, "local": 0, "upstream": 0}
+    yield from invalid
+
+    # 1. кэш
+    misses = []
+    for barcode in valid:
+        answered, data = _from_cache(barcode, product_cache.get(barcode), _schedule_refresh)
+        if answered:
+            sources["cache"] += 1
+            yield _found(barcode, data, "cache")
+        else:
+            misses.append(barcode)
+
+    # 2. база (один запрос на пачку) и выгрузка
+    rows = _read_stored_many(misses)
+    upstream = []
+    for barcode in misses:
+        data, stored = _resolve_offline(barcode, rows.get(barcode))
+        if data is None:
+            upstream.append((barcode, stored))
+            continue
+        product_cache.put(barcode, data)
+        sources["local"] += 1
+        yield _found(barcode, data, "local")
+
+    # 3. API
+    with _state_lock:
+        _counters["batch_upstream"] += len(upstream)
+    sources["upstream"] = len(upstream)
+    yield from _fan_out(upstream, parallelism)
+    logger.info(
+        "Пакетный поиск: %s штрих-кодов (%s неверных), кэш %s, база/выгрузка %s, API %s "
+        "за %.2f с",
+        len(valid) + len(invalid),
+        len(invalid),
+        sources["cache"],
+        sources["local"],
+        sources["upstream"],
+        perf_counter() - started,
+    )
+
+
+def lookup_products_batch(
+    barcodes: Iterable, parallelism: int = LOOKUP_BATCH_PARALLELISM
+) -> Iterator[BatchLookupResult]:
+    """
+    Поиск пачки штрих-кодов (не больше LOOKUP_BATCH_MAX_SIZE, иначе ValueError).
+    Возвращает итератор результатов по мере готовности: сначала неверные штрих-коды,
+    затем найденные в кэше, в базе и выгрузке, затем ответы API. Повторы штрих-кодов
+    ищутся и отдаются один раз. Сбой API для штрих-кода — результат со статусом error,
+    а не исключение: остальная пачка не прерывается.
+    """
+    barcodes = list(barcodes)
+    if len(barcodes) > LOOKUP_BATCH_MAX_SIZE:
+        raise ValueError(
+            f"Слишком много штрих-кодов: {len(barcodes)}, не больше {LOOKUP_BATCH_MAX_SIZE}"
+        )
+    valid, invalid = _validate_batch(barcodes)
+    # проверка размера — сразу, поиск и счётчики — по мере чтения итератора:
+    # пачка, отклонённая до ответа (лимит вызывающего), в метрики не попадает
+    return _lookup_batch(valid, invalid, max(1, parallelism), len(barcodes))
+
+
+# --- asyncio: тот же поиск для Telegram-бота и асинхронного API ---
+# Кэш, счётчики, политика повторов, предохранитель и маппинг DTO — общие с синхронным
+# поиском. HTTP — aiohttp; база и L2-кэш читаются в пуле потоков (asyncio.to_thread),
+# одновременные запросы одного штрих-кода ждут одну задачу (AsyncSingleFlight).
+
+async_lookup_flight = AsyncSingleFlight()
+register_metrics_source("product_lookup_async_single_flight", async_lookup_flight.stats)
+# ссылки на фоновые задачи обновления, чтобы их не собрал сборщик мусора
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+async def _fetch_from_api_async(
+    api_function: Callable[..., Awaitable[ProductDTO | None]],
+    barcode: str,
+    policy: RetryPolicy,
+) -> ProductDTO | None:
+    result = await policy.call_async(lambda timeout: api_function(barcode, timeout=timeout))
+    if result:
+        logger.info("УСПЕХ: товар найден в API: barcode=%s", barcode)
+    else:
+        logger.info("API: товар не найден: barcode=%s", barcode)
+    return result
+
+
+async def _load_product_async(barcode: str) -> ProductDTO | None:
+    """Асинхронный вариант _load_product"""
+    entry = await product_cache.peek_async(barcode)
+    if entry is not None and product_cache.is_fresh(entry):
+        return entry.data
+
+    data, stored = await asyncio.to_thread(_resolve_offline, barcode)
+    if data is None:
+        try:
+            data = await _fetch_from_api_async(
+                fetch_cosmetic_info_async, barcode, lookup_retry_policy
+            )
+        except Exception as error:
+            fallback = _on_api_error(barcode, error, entry, stored)
+            if fallback is None:
+                _raise_lookup_error(error)
+            return fallback
+        data = _on_api_result(barcode, data, stored)
+    await product_cache.put_async(barcode, data)
+    return data
+
+
+async def _refresh_async(barcode: str) -> None:
+    try:
+        await async_lookup_flight.do(barcode, lambda: _load_product_async(barcode))
+    except Exception:
+        _count("refresh_errors")
+        logger.exception("Ошибка фонового обновления: barcode=%s", barcode)
+    finally:
+        with _state_lock:
+            _refreshing.discard(barcode)
+
+
+def _schedule_refresh_async(barcode: str) -> None:
+    """Фоновое обновление устаревшей записи задачей event loop"""
+    with _state_lock:
+        if barcode in _refreshing:
+            return
+        _refreshing.add(barcode)
+        _counters["refreshes"] += 1
+    task = asyncio.get_running_loop().create_task(_refresh_async(barcode))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def get_product_info_async(barcode: str) -> ProductDTO | None:
+    """Асинхронный поиск продукта по штрих-коду: event loop не блокируется ни на одном шаге"""
+    entry = await product_cache.get_async(barcode)
+    answered, data = _from_cache(barcode, entry, _schedule_refresh_async)
+    if answered:
+        return data
+    try:
+        data = await async_lookup_flight.do(barcode, lambda: _load_product_async(barcode))
+    except UpstreamError:
+        data = None
+    _log_result(barcode, data)
     return data
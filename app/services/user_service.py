@@ -2,6 +2,7 @@ from typing import Dict, Optional
 import logging
 from flask_login import UserMixin
 from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy.exc import IntegrityError
 
 from app.db.crud import OtrazhenieDB
 from app.db.encrypt import EncryptData
@@ -41,7 +42,7 @@ class User(UserMixin):
         return self._is_active
 
     def check_password(self, password: str) -> bool:
-        result = EncryptData.verify_password(self.password_hash, password)[0]
+        result = EncryptData().verify_password(self.password_hash, password)[0]
 
         logger.debug(
             "Проверка пароля: user_id=%s result=%s",
@@ -68,11 +69,21 @@ class UserService:
         hash_password = EncryptData().hash_password(validated_data.password)
         logger.debug("Пароль успешно захеширован")
 
-        user_obj = self.db.create_user(
-            username=validated_data.username,
-            email=validated_data.email,
-            password_hash=hash_password,
-        )
+        try:
+            user_obj = self.db.create_user(
+                username=validated_data.username,
+                email=validated_data.email,
+                password_hash=hash_password,
+            )
+        except IntegrityError:
+            # параллельная регистрация успела занять email/username после проверки —
+            # сработал уникальный индекс
+            conflicts = self.db.find_registration_conflicts(
+                validated_data.email, validated_data.username
+            )
+            if not conflicts:
+                raise
+            self._raise_conflicts(conflicts, validated_data)
 
         logger.info("Пользователь создан в БД: user_id=%s username=%s",
             user_obj.id,
@@ -92,33 +103,44 @@ class UserService:
             logger.warning("РЕГИСТРАЦИЯ_ОТКЛОНЕНА причина=ошибка_валидации")
             raise ValidationError(e.errors())
 
-        if self.db.get_user_by_email(validated_user.email):
+        # обе проверки уникальности — одним запросом
+        conflicts = self.db.find_registration_conflicts(
+            validated_user.email, validated_user.username
+        )
+        if conflicts:
+            self._raise_conflicts(conflicts, validated_user)
+
+        logger.debug("РЕГИСТРАЦИЯ_ПРОШЛА_ВАЛИДАЦИЮ_УСПЕШНО")
+        return validated_user
+
+    @staticmethod
+    def _raise_conflicts(conflicts: set[str], validated_user) -> None:
+        errors = {}
+        if "email" in conflicts:
             logger.warning(
                 "РЕГИСТРАЦИЯ_ОТКЛОНЕНА причина=дубликат_email email=%s",
                 mask_email(validated_user.email),
             )
-            raise ValidationError({"email": "Пользователь с таким email уже существует"})
-
-        if self.db.get_user_by_username(validated_user.username):
+            errors["email"] = "Пользователь с таким email уже существует"
+        if "username" in conflicts:
             logger.warning(
                 "РЕГИСТРАЦИЯ_ОТКЛОНЕНА причина=дубликат_username username=%s",
                 validated_user.username,
             )
-            raise ValidationError({"username": "Пользователь с таким именем уже существует"})
-
-        logger.debug("РЕГИСТРАЦИЯ_ПРОШЛА_ВАЛИДАЦИЮ_УСПЕШНО")
-        return validated_user
+            errors["username"] = "Пользователь с таким именем уже существует"
+        raise ValidationError(errors)
 
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         logger.info("Попытка аутентификации пользователя")
 
-        user_obj = self.db.get_user_by_email(email)
+        # один запрос: только колонки, нужные для входа и сессии
+        user_obj = self.db.get_user_credentials(email)
 
         if not user_obj:
             logger.warning("ВХОД_НЕУДАЧЕН причина=неверные_данные")
             return None
 
-        is_valid = self.db.verify_user_password(email, password)
+        is_valid = self.db.check_user_password(user_obj, password)
 
         if not is_valid:
             logger.warning(
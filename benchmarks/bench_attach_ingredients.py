@@ -0,0 +1,117 @@
+"""
+Бенчмарк привязки ингредиентов при добавлении продукта (OtrazhenieDB.add_product).
+
+Сравнивает прежнюю привязку по одному ингредиенту (SELECT по названию, INSERT + flush
+для нового) и текущую set-based (_attach_ingredients): число запросов к БД
+(round trips) и время на продукт.
+
+По умолчанию — временная SQLite, где round trip почти бесплатен; разница по времени
+видна на сетевой БД: python -m benchmarks.bench_attach_ingredients --url postgresql://...
+(в этой БД будут созданы таблицы и тестовые продукты).
+
+Запуск: python -m benchmarks.bench_attach_ingredients [--products 200] [--size 40]
+"""
+import argparse
+import os
+import random
+import tempfile
+from statistics import median
+from time import perf_counter
+
+
+def legacy_attach(db, session, product, ingredients_list):
+    """Прежняя реализация: до двух-трёх запросов на каждый ингредиент"""
+    from app.db.models import ProductIngredient
+    from app.services.ingredient_index import ingredient_index
+
+    created = False
+    for ing_name in ingredients_list:
+        ingredient = None
+        canonical_id = ingredient_index.resolve_id(ing_name)
+        if canonical_id is not None:
+            ingredient = session.get(ProductIngredient, canonical_id)
+        if not ingredient:
+            ingredient = session.query(ProductIngredient).filter_by(name=ing_name).first()
+        if not ingredient:
+            ingredient = ProductIngredient(name=ing_name)
+            session.add(ingredient)
+            session.flush()
+            db._log_ingredient_change(session, ingredient.id, "upsert")
+            created = True
+        if ingredient not in product.ingredients:
+            product.ingredients.append(ingredient)
+    attached = [(ingredient.id, ingredient.safety_score) for ingredient in product.ingredients]
+    return attached, created
+
+
+def run(label, db, compositions, barcode_prefix):
+    from sqlalchemy import event
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    timings = []
+    trips = []
+    for number, composition in enumerate(compositions):
+        before = statements[0]
+        started = perf_counter()
+        db.add_product(f"{barcode_prefix}{number}", "Бенчмарк", ingredients_text=composition)
+        timings.append(perf_counter() - started)
+        trips.append(statements[0] - before)
+    event.remove(db.engine, "before_cursor_execute", count)
+    print(
+        f"{label:>10}: round trips/product median={median(trips):5.0f} max={max(trips):4d}  "
+        f"latency median={median(timings) * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--size", type=int, default=40, help="ингредиентов в продукте")
+    parser.add_argument("--known", type=int, default=500, help="ингредиентов в справочнике")
+    args = parser.parse_args()
+
+    if args.url is None:
+        directory = tempfile.mkdtemp()
+        args.url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    # индекс ингредиентов процесса читает БД по DATABASE_URL — до импорта app
+    os.environ["DATABASE_URL"] = args.url
+
+    from app.db.crud import OtrazhenieDB
+
+    db = OtrazhenieDB(args.url)
+    db.create_tables()
+    if not db.select_one_ingredient("Bench Known 0"):
+        category = db.add_category(name_en="Bench", name_ru="Бенчмарк")
+        for i in range(args.known):
+            db.add_ingredient(f"Bench Known {i}", category_id=category.id, safety_score=1 + i % 10)
+
+    rng = random.Random(42)
+    run_id = rng.randrange(10**6)
+
+    def compositions(label):
+        # 3/4 состава — из справочника, остальное — новые названия
+        result = []
+        for number in range(args.products):
+            known = rng.sample(range(args.known), args.size * 3 // 4)
+            names = [f"Bench Known {i}" for i in known]
+            names += [f"Bench New {label} {run_id} {number} {i}" for i in range(args.size - len(names))]
+            result.append(", ".join(names))
+        return result
+
+    set_based = OtrazhenieDB._attach_ingredients
+    OtrazhenieDB._attach_ingredients = lambda self, session, product, names: legacy_attach(
+        self, session, product, names
+    )
+    run("before", db, compositions("before"), f"bench-before-{run_id}-")
+    OtrazhenieDB._attach_ingredients = set_based
+    run("after", db, compositions("after"), f"bench-after-{run_id}-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Бенчмарк распознавания штрих-кода на загруженном изображении.
+
+Сравнивает прежний decode_barcode (кадр раскодируется в полном разрешении, pyzbar —
+по всему кадру) и поэтапный app.analyzers.barcode_decoder.decode на корпусе
+app/analyzers/img_example: время по этапам, этап, на котором найден код, и долю
+распознанных изображений.
+
+Картинки корпуса — небольшие вырезки, поэтому каждая ещё и вклеивается в «фото
+с телефона» (--photo 4032x3024, JPEG): код занимает малую часть большого кадра,
+как на реальном снимке. --photo 0 — только исходные файлы.
+
+Нужны opencv-python и pyzbar (системная библиотека zbar).
+
+Запуск: python -m benchmarks.bench_barcode_decoder [--repeat 5] [--photo 4032x3024]
+"""
+import argparse
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+
+from app.analyzers import barcode_decoder
+
+CORPUS = Path(__file__).resolve().parent.parent / "app" / "analyzers" / "img_example"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+def load_corpus() -> list[tuple[str, bytes]]:
+    return [
+        (path.name, path.read_bytes())
+        for path in sorted(CORPUS.iterdir())
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    ]
+
+
+def as_phone_photo(cv2, image_data: bytes, size: tuple[int, int]) -> bytes:
+    """Вклеивает изображение в большой кадр (код — около трети ширины) и сжимает в JPEG"""
+    width, height = size
+    sample = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    scale = width / 3 / sample.shape[1]
+    sample = cv2.resize(sample, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    sample = sample[:height, :width]
+    rng = np.random.default_rng(0)
+    # фон — шум, чтобы поиск областей не получил задачу проще реальной
+    canvas = rng.integers(96, 160, (height, width, 3), dtype=np.uint8)
+    top = (height - sample.shape[0]) // 3
+    left = (width - sample.shape[1]) // 2
+    canvas[top:top + sample.shape[0], left:left + sample.shape[1]] = sample
+    _, encoded = cv2.imencode(".jpg", canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def legacy_decode(cv2, pyzbar, image_data: bytes) -> str | None:
+    """Прежняя реализация: полный кадр в цвете, затем оттенки серого, pyzbar по всему кадру"""
+    img = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    barcodes = pyzbar.decode(gray)
+    return barcodes[0].data.decode("utf-8") if barcodes else None
+
+
+def run(label: str, samples, repeat: int) -> None:
+    cv2, pyzbar = barcode_decoder._dependencies()
+    print(f"\n== {label} ==")
+    legacy_times, staged_times = [], []
+    legacy_found = staged_found = 0
+    for name, image_data in samples:
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            legacy_value = legacy_decode(cv2, pyzbar, image_data)
+            timings.append(perf_counter() - started)
+        legacy_ms = median(timings) * 1000
+
+        results = [barcode_decoder.decode(image_data) for _ in range(repeat)]
+        staged_ms = median(sum(r.timings.values()) for r in results) * 1000
+        result = results[-1]
+        stages = "  ".join(
+            f"{stage}={median(r.timings.get(stage, 0.0) for r in results) * 1000:.1f}"
+            for stage in barcode_decoder.TIMINGS
+            if stage in result.timings
+        )
+
+        legacy_times.append(legacy_ms)
+        staged_times.append(staged_ms)
+        legacy_found += legacy_value is not None
+        staged_found += result.value is not None
+        print(
+            f"{name:>18}: прежний {legacy_ms:8.1f} мс ({legacy_value or '—'}), "
+            f"поэтапный {staged_ms:8.1f} мс ({result.value or '—'}, "
+            f"этап {result.stage or '—'}, ×1/{result.scale})"
+        )
+        print(f"{'':>18}  {stages}")
+
+    total = len(samples)
+    print(
+        f"{'итого':>18}: прежний — распознано {legacy_found}/{total}, "
+        f"медиана {median(legacy_times):.1f} мс; поэтапный — распознано "
+        f"{staged_found}/{total}, медиана {median(staged_times):.1f} мс"
+    )
+
+
+def parse_size(value: str) -> tuple[int, int] | None:
+    if value in ("", "0"):
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--photo", type=parse_size, default=(4032, 3024))
+    args = parser.parse_args()
+
+    cv2, _ = barcode_decoder._dependencies()
+    samples = load_corpus()
+    run("исходные файлы", samples, args.repeat)
+    if args.photo:
+        photos = [
+            (name, as_phone_photo(cv2, image_data, args.photo)) for name, image_data in samples
+        ]
+        run(f"фото {args.photo[0]}x{args.photo[1]}", photos, args.repeat)
+    print("\nметрики:", barcode_decoder.decoder_stats.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Бенчмарк нечёткого поиска ингредиентов.
+
+Строит FuzzyMatcher по реальным названиям из csv_files и синтетическим INCI-подобным
+названиям (до десятков тысяч ключей) и измеряет время поиска одного токена с опечаткой.
+
+Запуск: python -m benchmarks.bench_fuzzy_matcher [--sizes 1000 10000 50000]
+"""
+import argparse
+import csv
+import random
+from pathlib import Path
+from time import perf_counter
+
+from app.analyzers.fuzzy_matcher import FuzzyMatcher
+from app.analyzers.ingredient_normalizer import normalize_ingredient_key
+
+CSV_DIR = Path(__file__).resolve().parent.parent / "app" / "db" / "csv_files"
+# Слова, из которых состоят реальные названия INCI: химические префиксы/корни,
+# латинские названия растений и их частей. Комбинации дают распределение триграмм,
+# близкое к словарю CosIng (много общих «sodium», «extract», «oil»).
+WORDS = """
+sodium potassium magnesium calcium zinc ammonium disodium tetrasodium trisodium
+lauryl laureth myreth ceteareth steareth oleth coco cocamidopropyl decyl caprylyl
+cetyl stearyl behenyl isopropyl ethylhexyl butylene propylene pentylene hexylene
+glycol glycerin glyceryl polyglyceryl sorbitan sucrose glucoside betaine sultaine
+sulfate sulfonate phosphate chloride citrate lactate benzoate sorbate salicylate
+stearate palmitate myristate oleate isostearate cocoate laurate acetate gluconate
+hyaluronate methosulfate hydroxide oxide dioxide acrylates copolymer crosspolymer
+dimethicone cyclopentasiloxane trimethicone amodimethicone siloxane silica
+extract oil butter wax water juice powder ferment filtrate seed leaf flower fruit
+root bark peel kernel stem callus culture lysate hydrolyzed acid alcohol ester
+aloe barbadensis butyrospermum parkii simmondsia chinensis prunus amygdalus dulcis
+olea europaea argania spinosa cocos nucifera helianthus annuus camellia sinensis
+rosa damascena canina lavandula angustifolia citrus aurantium limon paradisi
+chamomilla recutita centella asiatica glycyrrhiza glabra vitis vinifera theobroma
+cacao persea gratissima macadamia ternifolia ricinus communis sesamum indicum
+panax ginseng ginkgo biloba calendula officinalis hamamelis virginiana salvia
+rosmarinus melaleuca alternifolia mentha piperita eucalyptus globulus avena sativa
+tocopheryl ascorbyl retinyl panthenyl niacinamide allantoin bisabolol ceramide
+peptide palmitoyl tripeptide hexapeptide acetyl carnosine adenosine arginine
+""".split()
+SUFFIXES = ["", "", "", "", "-2", "-3", "-4", "-7", "-10", "-20", "-40", "-100"]
+def real_names() -> list[str]:
+    names = []
+    for file_name in ("ingredients.csv", "inci_data.csv"):
+        with open(CSV_DIR / file_name, newline="", encoding="utf-8") as csvfile:
+            names.extend(row["name"] for row in csv.DictReader(csvfile))
+    return [normalize_ingredient_key(name) for name in names]
+
+
+def synthetic_names(count: int, rng: random.Random) -> list[str]:
+    names = set()
+    while len(names) < count:
+        words = rng.sample(WORDS, rng.randint(1, 4))
+        names.add(" ".join(words) + rng.choice(SUFFIXES))
+    return list(names)
+
+
+def with_typo(word: str, rng: random.Random) -> str:
+    position = rng.randrange(len(word))
+    kind = rng.choice(("drop", "swap", "replace"))
+    if kind == "drop":
+        return word[:position] + word[position + 1:]
+    if kind == "swap" and position < len(word) - 1:
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return word[:position] + rng.choice("aeiouxyz") + word[position + 1:]
+
+
+def run(size: int, queries: int, rng: random.Random) -> None:
+    keys = real_names() + synthetic_names(size, rng)
+    started = perf_counter()
+    matcher = FuzzyMatcher(keys)
+    build_seconds = perf_counter() - started
+
+    typos = [with_typo(rng.choice(keys), rng) for _ in range(queries)]
+    # слова, которых в словаре нет: проходят все уровни правок — худший случай
+    unknown = [
+        "".join(rng.choice("bcdfgklmnprstvz") for _ in range(rng.randint(6, 20)))
+        for _ in range(queries)
+    ]
+    for label, sample in (("typo", typos), ("unknown", unknown)):
+        found = 0
+        started = perf_counter()
+        for query in sample:
+            if matcher.match(query):
+                found += 1
+        per_query_ms = (perf_counter() - started) / queries * 1000
+        print(
+            f"keys={len(matcher):>6}  build={build_seconds * 1000:8.1f} ms  "
+            f"{label:>7}: {per_query_ms:.3f} ms/token  matched={found / queries:.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    for size in args.sizes:
+        run(size, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
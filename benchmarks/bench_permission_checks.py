@@ -0,0 +1,79 @@
+"""
+Бенчмарк проверки прав: прежний обход ORM-графа User.roles → Role.permissions
+против матрицы прав (битовая маска по id ролей).
+
+Пользователь с ролями и правами загружается заранее (joinedload), так что обход ORM
+здесь — только перебор в памяти, без ленивых запросов к БД: это нижняя граница
+прежней стоимости проверки.
+
+Запуск: python -m benchmarks.bench_permission_checks [--checks 200000]
+"""
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+
+def orm_walk(user, permission_name):
+    """Прежняя реализация User.has_permission"""
+    return any(
+        permission.name == permission_name
+        for role in user.roles
+        for permission in role.permissions
+    )
+
+
+def run(label, check, names, checks):
+    started = perf_counter()
+    for i in range(checks):
+        check(names[i % len(names)])
+    elapsed = perf_counter() - started
+    print(f"{label:>22}: {checks / elapsed:12,.0f} checks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checks", type=int, default=200_000)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+
+    from sqlalchemy.orm import joinedload
+
+    from app.auth.rbac import matrix as matrix_module
+    from app.auth.rbac.constants import PERMISSIONS
+    from app.auth.rbac.principal import Principal
+    from app.auth.rbac.seed_roles_permissions import RBACSeeder
+    from app.db.crud import OtrazhenieDB
+    from app.db.models import Role, User
+
+    db = OtrazhenieDB(url)
+    db.create_tables()
+    RBACSeeder().seed()
+    with db.get_session() as session:
+        user = User(username="bench", email="bench@example.com", password_hash="x")
+        user.roles = session.query(Role).filter(Role.name.in_(["user", "admin"])).all()
+        session.add(user)
+        session.commit()
+        user = (
+            session.query(User)
+            .options(joinedload(User.roles).joinedload(Role.permissions))
+            .filter_by(username="bench")
+            .one()
+        )
+
+    matrix = matrix_module.compile_permission_matrix()
+    principal = Principal.from_user(user)
+    # половина проверок — отказ (право, которого нет, перебирается до конца)
+    names = list(PERMISSIONS) + ["unknown:perm"] * len(PERMISSIONS)
+    mask = principal.permission_mask
+
+    run("ORM walk", lambda name: orm_walk(user, name), names, args.checks)
+    run("User.has_permission", user.has_permission, names, args.checks)
+    run("Principal.has_permission", principal.has_permission, names, args.checks)
+    run("matrix.allows", lambda name: matrix.allows(mask, name), names, args.checks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Бенчмарк разбора строки состава на ингредиенты.
+
+Сравнивает наивный composition.split(",") и iter_ingredients на корпусе реальных
+составов (benchmarks/data/compositions.txt; составы разделены пустой строкой) и на
+«вставленном целиком» длинном составе из всех составов корпуса подряд.
+
+Запуск: python -m benchmarks.bench_tokenizer [--repeat 2000]
+"""
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+from app.analyzers.composition_tokenizer import iter_ingredients
+
+CORPUS = Path(__file__).resolve().parent / "data" / "compositions.txt"
+
+
+def load_corpus() -> list[str]:
+    text = CORPUS.read_text(encoding="utf-8")
+    # по составу на строку; столбиком записанный состав даёт несколько коротких строк
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def naive_split(composition: str) -> list[str]:
+    return [item.strip() for item in composition.split(",") if item.strip()]
+
+
+def tokenize(composition: str) -> list[str]:
+    return list(iter_ingredients(composition))
+
+
+def measure(label: str, parse, samples: list[str], repeat: int) -> None:
+    size = sum(len(sample.encode("utf-8")) for sample in samples)
+    tokens = 0
+    started = perf_counter()
+    for _ in range(repeat):
+        for sample in samples:
+            tokens += len(parse(sample))
+    seconds = perf_counter() - started
+    print(
+        f"{label:>24}: {size * repeat / seconds / 1e6:7.2f} MB/s  "
+        f"{tokens / seconds / 1e6:6.2f} M tokens/s  "
+        f"{tokens // repeat} tokens"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    samples = load_corpus()
+    pasted = ["\n".join(samples) * 20]
+    for label, data, repeat in (
+        ("corpus", samples, args.repeat),
+        ("long pasted", pasted, max(1, args.repeat // 20)),
+    ):
+        measure(f"split(',') {label}", naive_split, data, repeat)
+        measure(f"tokenizer {label}", tokenize, data, repeat)
+
+
+if __name__ == "__main__":
+    main()
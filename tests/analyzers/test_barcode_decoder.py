@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.analyzers import barcode_decoder
+from app.analyzers.barcode_decoder import DecodeResult, ImageTooLarge, image_size, reduce_factor
+
+CORPUS = Path(__file__).resolve().parents[2] / "app" / "analyzers" / "img_example"
+
+
+def test_image_size_reads_only_header():
+    data = (CORPUS / "barcode.jpg").read_bytes()
+    assert image_size(data) == (262, 51)
+    # обрезанный файл: заголовок цел, пиксели не нужны
+    assert image_size(data[:2048]) == (262, 51)
+    assert image_size(b"not an image") is None
+
+
+def test_image_size_rejects_oversized_images(mocker):
+    data = (CORPUS / "barcode.jpg").read_bytes()  # 262×51 = 13 362 пикселя
+    with pytest.raises(ImageTooLarge):
+        image_size(data, max_pixels=10_000)
+    # вдвое больше порога Pillow — DecompressionBombError уже при открытии
+    mocker.patch.object(Image, "MAX_IMAGE_PIXELS", 5_000)
+    with pytest.raises(ImageTooLarge):
+        image_size(data)
+
+
+def test_oversized_image_is_not_decoded(mocker):
+    from app.routes.handle_scan import decode_barcode
+
+    cv2, pyzbar = mocker.Mock(), mocker.Mock()
+    mocker.patch.object(barcode_decoder, "_dependencies", return_value=(cv2, pyzbar))
+    mocker.patch.object(barcode_decoder, "BARCODE_DECODE_MAX_PIXELS", 10_000)
+    data = (CORPUS / "barcode.jpg").read_bytes()
+
+    assert barcode_decoder.decode(data) == DecodeResult()
+    assert decode_barcode(data) is None
+    cv2.imdecode.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "size, factor",
+    [
+        ((4032, 3024), 4),  # 12 Мп → 1008 px по длинной стороне
+        ((8000, 6000), 8),
+        ((1920, 1080), 2),
+        ((1000, 800), 1),
+        (None, 1),  # размер неизвестен — без уменьшения
+    ],
+)
+def test_reduce_factor_keeps_long_side_above_minimum(size, factor):
+    assert reduce_factor(size, min_side=800) == factor
+
+
+def test_stats_count_stage_and_timings():
+    stats = barcode_decoder._Stats()
+    stats.record(
+        DecodeResult(
+            "4600000000001", "reduced_roi", 4, {"decode_reduced": 0.01, "reduced_roi": 0.002}
+        )
+    )
+    stats.record(DecodeResult(None, None, 4, {"decode_reduced": 0.03, "reduced_roi": 0.002}))
+
+    snapshot = stats.stats()
+    assert snapshot["success_rate"] == 0.5
+    assert snapshot["found_at"]["reduced_roi"] == 1
+    assert snapshot["avg_ms"] == {"decode_reduced": 20.0, "reduced_roi": 2.0}
+
+
+def test_decode_barcode_without_opencv_returns_none(mocker):
+    from app.routes.handle_scan import decode_barcode
+
+    mocker.patch.object(barcode_decoder, "_dependencies", side_effect=RuntimeError("нет cv2"))
+    assert decode_barcode(b"...") is None
+
+
+def test_decodes_corpus_barcode_in_large_photo():
+    cv2 = pytest.importorskip("cv2")
+    pytest.importorskip("pyzbar.pyzbar")
+    from benchmarks.bench_barcode_decoder import as_phone_photo
+
+    data = (CORPUS / "barcode.jpg").read_bytes()
+    direct = barcode_decoder.decode(data)
+    assert direct.value
+
+    photo = barcode_decoder.decode(as_phone_photo(cv2, data, (4032, 3024)))
+    assert photo.value == direct.value
+    assert photo.scale == 4
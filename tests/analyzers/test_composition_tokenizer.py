@@ -0,0 +1,48 @@
+import pytest
+
+from app.analyzers.composition_tokenizer import iter_ingredients
+
+
+@pytest.mark.parametrize(
+    "composition, expected",
+    [
+        ("Aqua, Glycerin, Parfum", ["Aqua", "Glycerin", "Parfum"]),
+        ("  Aqua ,, Glycerin.  ", ["Aqua", "Glycerin"]),
+        (
+            "Aqua, Parfum (Fragrance, Limonene), Glycerin",
+            ["Aqua", "Parfum (Fragrance, Limonene)", "Glycerin"],
+        ),
+        ("Aqua, 1,2-Hexanediol, Glycerin", ["Aqua", "1,2-Hexanediol", "Glycerin"]),
+        ("Aqua; Glycerin; Niacinamide 0,5%", ["Aqua", "Glycerin", "Niacinamide 0,5%"]),
+        ("Aqua • Glycerin\nParfum", ["Aqua", "Glycerin", "Parfum"]),
+        ("Ingredients: Aqua, Glycerin", ["Aqua", "Glycerin"]),
+        ("Состав: вода, глицерин", ["вода", "глицерин"]),
+        (
+            "Aqua, Talc. May contain: CI 77491, CI 77492",
+            ["Aqua", "Talc", "CI 77491", "CI 77492"],
+        ),
+        (
+            "Aqua, Talc [+/- CI 77491, CI 77492 (Iron Oxides)]",
+            ["Aqua", "Talc", "CI 77491", "CI 77492 (Iron Oxides)"],
+        ),
+        ("Aqua, Mica (may contain CI 77891, CI 77499)", ["Aqua", "Mica", "CI 77891", "CI 77499"]),
+        ("Aqua/Water/Eau, Glycerin", ["Aqua/Water/Eau", "Glycerin"]),
+        ("Aqua), Glycerin", ["Aqua", "Glycerin"]),
+        ("", []),
+        (None, []),
+    ],
+)
+def test_iter_ingredients(composition, expected):
+    assert list(iter_ingredients(composition)) == expected
+
+
+def test_unclosed_bracket_does_not_swallow_rest_of_list():
+    composition = "Aqua, Parfum (Fragrance, " + ", ".join(f"Ingredient{i}" for i in range(30))
+    tokens = list(iter_ingredients(composition))
+    assert tokens[0] == "Aqua"
+    assert "Ingredient29" in tokens
+
+
+def test_is_lazy():
+    tokens = iter_ingredients("Aqua, Glycerin")
+    assert next(tokens) == "Aqua"
@@ -0,0 +1,53 @@
+import pytest
+
+from app.analyzers.fuzzy_matcher import FuzzyMatcher, edit_distance
+
+KEYS = [
+    "aqua",
+    "glycerin",
+    "phenoxyethanol",
+    "ethylhexylglycerin",
+    "cetearyl alcohol",
+    "cetyl alcohol",
+    "sodium hyaluronate",
+]
+
+
+@pytest.mark.parametrize(
+    "a, b, expected",
+    [
+        ("glycerin", "glycerin", 0),
+        ("glycerine", "glycerin", 1),
+        ("glyecrin", "glycerin", 1),  # перестановка соседних букв
+        ("phenoxyethanl", "phenoxyethanol", 1),
+        ("", "abc", 3),
+    ],
+)
+def test_edit_distance(a, b, expected):
+    assert edit_distance(a, b, max_distance=5) == expected
+
+
+def test_edit_distance_cutoff():
+    assert edit_distance("aqua", "phenoxyethanol", max_distance=2) == 3
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("glycerine", "glycerin"),
+        ("phenoxyethanl", "phenoxyethanol"),
+        ("cetearyl alkohol", "cetearyl alcohol"),
+        ("sodium hyaluronat", "sodium hyaluronate"),
+    ],
+)
+def test_match_typos(query, expected):
+    match = FuzzyMatcher(KEYS).match(query)
+    assert match is not None
+    assert match.key == expected
+    assert 0.75 <= match.confidence < 1
+
+
+def test_no_match_for_unrelated_or_short_tokens():
+    matcher = FuzzyMatcher(KEYS)
+    assert matcher.match("tetrasodium glutamate") is None
+    assert matcher.match("aq") is None
@@ -0,0 +1,36 @@
+import pytest
+
+from app.analyzers.ingredient_normalizer import (
+    normalize_ingredient_key,
+    split_parenthetical,
+    split_slash_forms,
+)
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("  Aqua ", "aqua"),
+        ("AQUA*", "aqua"),
+        ("Cetearyl_Alcohol", "cetearyl alcohol"),
+        ("Ceteareth–20", "ceteareth-20"),
+        ("Сок  Алоэ", "сок алоэ"),
+        ("Ёлка", "елка"),
+        ("Aqua / Water / Eau.", "aqua/water/eau"),
+        ("", ""),
+        (None, ""),
+    ],
+)
+def test_normalize_ingredient_key(raw, expected):
+    assert normalize_ingredient_key(raw) == expected
+
+
+def test_split_slash_forms():
+    assert split_slash_forms("aqua/water/eau") == ["aqua", "water", "eau"]
+    assert split_slash_forms("aqua") == []
+
+
+def test_split_parenthetical():
+    assert split_parenthetical("parfum (fragrance)") == ["parfum", "fragrance"]
+    assert split_parenthetical("ci 77491 (iron oxides") == ["ci 77491", "iron oxides"]
+    assert split_parenthetical("glycerin") == []
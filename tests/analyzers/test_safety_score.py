@@ -0,0 +1,43 @@
+import pytest
+
+from app.analyzers.safety_score import compute_product_score, score_level
+
+
+def test_all_safe_product():
+    result = compute_product_score([1, 1, 2])
+    assert result.level == "safe"
+    assert 1 <= result.score <= 2
+    assert (result.safe_count, result.risk_count, result.unknown_count) == (3, 0, 0)
+
+
+def test_position_weights_first_ingredients_more():
+    risky_first = compute_product_score([6, 1, 1, 1, 1])
+    risky_last = compute_product_score([1, 1, 1, 1, 6])
+    assert risky_first.score > risky_last.score
+
+
+def test_risk_flag_is_not_averaged_away():
+    result = compute_product_score([1] * 20 + [8])
+    assert result.risk_count == 1
+    assert result.score > compute_product_score([1] * 20 + [3]).score + 0.5
+
+
+def test_unknown_ingredients_pull_to_middle():
+    known = compute_product_score([1, 1])
+    with_unknown = compute_product_score([1, 1, "?", None])
+    assert with_unknown.unknown_count == 2
+    assert with_unknown.score > known.score
+
+
+def test_no_scores_gives_unknown_level():
+    result = compute_product_score(["?", None])
+    assert result.score is None
+    assert result.level == "unknown"
+    assert compute_product_score([]).score is None
+
+
+@pytest.mark.parametrize(
+    "score, level", [(None, "unknown"), (3, "safe"), (3.1, "moderate"), (6, "moderate"), (7, "risk")]
+)
+def test_score_level(score, level):
+    assert score_level(score) == level
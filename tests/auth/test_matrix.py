@@ -0,0 +1,73 @@
+import pytest
+
+from app.auth.rbac import matrix as matrix_module
+from app.auth.rbac.constants import PERMISSIONS, ROLES
+from app.auth.rbac.matrix import PermissionMatrix, invalidate_permission_matrix
+from app.auth.rbac.seed_roles_permissions import RBACSeeder
+from app.db.crud import OtrazhenieDB
+from app.db.models import Role, User
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = OtrazhenieDB(f"sqlite:///{tmp_path / 'rbac.db'}")
+    database.create_tables()
+    seeder = RBACSeeder()
+    seeder.db = database
+    seeder.seed()
+    return database
+
+
+def test_matrix_bits():
+    matrix = PermissionMatrix([(1, "admin:panel"), (1, "custom:perm"), (2, None)])
+
+    # известные права — в порядке constants.py, новые из БД — после них
+    assert matrix.bit("admin:panel") == 1 << list(PERMISSIONS).index("admin:panel")
+    assert matrix.bit("custom:perm") == 1 << len(PERMISSIONS)
+    assert matrix.bit("nope") == 0
+
+    mask = matrix.mask_for_roles([1, 2, 99])
+    assert matrix.allows(mask, "admin:panel")
+    assert not matrix.allows(mask, "ingredients:delete")
+    assert not matrix.allows(matrix.mask_for_roles([2]), "admin:panel")
+    assert matrix.permission_names(mask) == {"admin:panel", "custom:perm"}
+
+
+def test_matrix_matches_seeded_roles(db):
+    matrix = PermissionMatrix(db.select_role_permissions())
+
+    with db.get_session() as session:
+        role_ids = {role.name: role.id for role in session.query(Role)}
+    assert len(matrix) == len(ROLES)
+    for name, data in ROLES.items():
+        mask = matrix.mask_for_roles([role_ids[name]])
+        assert matrix.permission_names(mask) == set(data["permissions"])
+
+
+def test_user_has_permission_uses_matrix(db, mocker):
+    mocker.patch.object(
+        matrix_module, "_matrix", PermissionMatrix(db.select_role_permissions())
+    )
+    with db.get_session() as session:
+        manager = session.query(Role).filter_by(name="ingredient_manager").one()
+        user = User(username="m", email="m@example.com", password_hash="x")
+        user.roles.append(manager)
+
+        assert user.has_permission("ingredients:update")
+        assert not user.has_permission("ingredients:delete")
+
+
+def test_invalidate_resets_matrix(mocker):
+    mocker.patch.object(matrix_module, "_matrix", PermissionMatrix([]))
+    compiled = PermissionMatrix([(1, "admin:panel")])
+    compile_matrix = mocker.patch(
+        "app.db.crud.OtrazhenieDB.select_role_permissions",
+        return_value=[(1, "admin:panel")],
+    )
+
+    invalidate_permission_matrix()
+    assert matrix_module._matrix is None
+    assert matrix_module.get_permission_matrix().allows(
+        compiled.mask_for_roles([1]), "admin:panel"
+    )
+    assert compile_matrix.call_count == 1
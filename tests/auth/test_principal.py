@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import load_user
+from app.auth.rbac.matrix import PermissionMatrix
+from app.auth.rbac.principal import Principal, PrincipalCache, principal_cache
+
+
+ROLE_IDS = {"admin": 1, "user": 2}
+
+
+def make_user(user_id=1, roles=("admin",), is_active=True):
+    return SimpleNamespace(
+        id=user_id,
+        username="tester",
+        email="tester@example.com",
+        is_active=is_active,
+        roles=[SimpleNamespace(id=ROLE_IDS[name], name=name) for name in roles],
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(mocker):
+    mocker.patch(
+        "app.auth.rbac.matrix._matrix",
+        PermissionMatrix(
+            [(1, "admin:panel"), (1, "ingredients:create"), (2, None)]
+        ),
+    )
+    principal_cache.clear()
+    yield
+    principal_cache.clear()
+
+
+def test_principal_snapshot():
+    principal = Principal.from_user(make_user())
+
+    assert principal.has_permission("admin:panel")
+    assert not principal.has_permission("ingredients:delete")
+    assert principal.has_role("admin")
+    assert principal.permissions == {"admin:panel", "ingredients:create"}
+    assert not Principal.from_user(make_user(roles=("user",))).has_permission("admin:panel")
+    assert principal.get_id() == "1"
+    assert principal.is_authenticated
+    assert not Principal.from_user(make_user(is_active=False)).is_authenticated
+    with pytest.raises(AttributeError):
+        principal.roles = frozenset()
+
+
+def test_load_user_queries_db_once(mocker):
+    get_user = mocker.patch(
+        "app.db.crud.OtrazhenieDB.get_user_by_id", return_value=make_user()
+    )
+
+    first = load_user("1")
+    second = load_user("1")
+
+    assert first is second
+    assert get_user.call_count == 1
+    assert load_user("garbage") is None
+
+
+def test_invalidate_after_commit():
+    cache = PrincipalCache(ttl=60)
+    cache.put(Principal.from_user(make_user()))
+    session = Session(create_engine("sqlite://"))
+
+    cache.invalidate_after_commit(session, 1)
+    assert cache.get(1) is None
+
+    # параллельный запрос успел закэшировать старые роли до коммита
+    cache.put(Principal.from_user(make_user()))
+    session.commit()
+    assert cache.get(1) is None
+    assert cache.stats()["invalidations"] == 2
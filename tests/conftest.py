@@ -10,7 +10,8 @@ def user_service():
 
 
 @pytest.fixture
-def mock_email_check(mocker):
+def mock_conflict_check(mocker):
     return mocker.patch(
-        "app.services.user_service.OtrazhenieDB.get_user_by_email", return_value=None
+        "app.services.user_service.OtrazhenieDB.find_registration_conflicts",
+        return_value=set(),
     )
@@ -0,0 +1,236 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.bulkhead import AsyncBulkhead, Bulkhead
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.exceptions.upstream import (
+    BulkheadFullError,
+    CircuitOpenError,
+    UpstreamBadResponse,
+    UpstreamUnavailable,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    options = dict(
+        window_size=4,
+        min_calls=4,
+        failure_rate_threshold=0.5,
+        slow_call_seconds=1.0,
+        slow_call_rate_threshold=0.75,
+        open_seconds=30,
+        half_open_calls=2,
+        clock=clock,
+    )
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def fail():
+    raise UpstreamUnavailable("HTTP 503", status=503)
+
+
+def call_quietly(breaker, fn):
+    try:
+        breaker.call(fn)
+    except (UpstreamUnavailable, UpstreamBadResponse):
+        pass
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for fn in (lambda: "ok", fail, lambda: "ok"):
+        call_quietly(breaker, fn)
+    assert breaker.state == CLOSED
+
+    call_quietly(breaker, fail)
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(calls.append, 1)
+    assert calls == []
+    assert error.value.retry_after == 30
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_client_errors_do_not_count_as_failures():
+    breaker = make_breaker(FakeClock())
+
+    def bad():
+        raise UpstreamBadResponse("HTTP 400", status=400)
+
+    for _ in range(8):
+        call_quietly(breaker, bad)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_slow_calls():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    def slow():
+        clock.now += 1.5
+        return "ok"
+
+    for _ in range(3):
+        breaker.call(slow)
+    breaker.call(lambda: "ok")
+    assert breaker.state == OPEN
+
+
+def test_half_open_closes_after_successful_trials():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        call_quietly(breaker, fail)
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    breaker.call(lambda: "ok")
+    assert breaker.state == HALF_OPEN
+    breaker.call(lambda: "ok")
+    assert breaker.state == CLOSED
+    assert breaker.stats()["transitions"] == {
+        "closed_to_open": 1,
+        "open_to_half_open": 1,
+        "half_open_to_closed": 1,
+    }
+
+
+def test_half_open_reopens_on_trial_failure_and_limits_trials():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        call_quietly(breaker, fail)
+    clock.now += 30
+
+    release = threading.Event()
+    trial = threading.Thread(target=breaker.call, args=(release.wait, 5))
+    second = threading.Thread(target=breaker.call, args=(release.wait, 5))
+    trial.start()
+    second.start()
+    while breaker._trials_in_flight < 2:
+        threading.Event().wait(0.001)
+    # оба пробных слота заняты — третий вызов отклоняется
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+    release.set()
+    trial.join()
+    second.join()
+    assert breaker.state == CLOSED
+
+    for _ in range(4):
+        call_quietly(breaker, fail)
+    clock.now += 30
+    call_quietly(breaker, fail)
+    assert breaker.state == OPEN
+    assert breaker.stats()["transitions"]["half_open_to_open"] == 1
+
+
+def test_ignored_errors_release_trial_slot():
+    clock = FakeClock()
+    breaker = make_breaker(
+        clock, ignore=lambda error: isinstance(error, BulkheadFullError)
+    )
+    for _ in range(4):
+        call_quietly(breaker, fail)
+    clock.now += 30
+
+    def rejected():
+        raise BulkheadFullError("full")
+
+    for _ in range(3):
+        with pytest.raises(BulkheadFullError):
+            breaker.call(rejected)
+    assert breaker.state == HALF_OPEN
+    breaker.call(lambda: "ok")
+    breaker.call(lambda: "ok")
+    assert breaker.state == CLOSED
+
+
+def test_cancelled_trial_does_not_close_breaker():
+    clock = FakeClock()
+    breaker = make_breaker(clock, half_open_calls=1)
+    for _ in range(4):
+        call_quietly(breaker, fail)
+    clock.now += 30
+
+    async def scenario():
+        trial = asyncio.ensure_future(breaker.call_async(asyncio.sleep, 5))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(scenario())
+    # отмена не засчитана успехом, пробный слот освобождён
+    assert breaker.state == HALF_OPEN
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        breaker.call(interrupted)
+    assert breaker.state == HALF_OPEN
+    call_quietly(breaker, fail)
+    assert breaker.state == OPEN
+
+
+def test_bulkhead_caps_concurrency():
+    bulkhead = Bulkhead("test", max_concurrent=2)
+    release = threading.Event()
+    threads = [threading.Thread(target=bulkhead.call, args=(release.wait, 5)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while bulkhead.stats()["active"] < 2:
+        threading.Event().wait(0.001)
+
+    with pytest.raises(BulkheadFullError):
+        bulkhead.call(lambda: "ok")
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert bulkhead.call(lambda: "ok") == "ok"
+    stats = bulkhead.stats()
+    assert (stats["active"], stats["peak"], stats["rejected"], stats["calls"]) == (0, 2, 1, 3)
+
+
+def test_async_calls_share_breaker_state_and_bulkhead_limit():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    async def fail_async():
+        fail()
+
+    async def scenario():
+        for _ in range(4):
+            with pytest.raises(UpstreamUnavailable):
+                await breaker.call_async(fail_async)
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "ok")
+
+        bulkhead = AsyncBulkhead("test", max_concurrent=1)
+        release = asyncio.Event()
+        held = asyncio.ensure_future(bulkhead.call(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFullError):
+            await bulkhead.call(asyncio.sleep, 0)
+        release.set()
+        await held
+        return bulkhead.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["calls"], stats["rejected"], stats["active"]) == (1, 1, 0)
@@ -0,0 +1,39 @@
+import pytest
+
+from app.core.rate_limit import CallerLimiter
+from app.exceptions.rate_limit import CallerLimitExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrency_is_limited_per_caller():
+    limiter = CallerLimiter("test", max_concurrent=1, per_minute=100, timer=FakeClock())
+    limiter.acquire("partner:a")
+    with pytest.raises(CallerLimitExceeded):
+        limiter.acquire("partner:a")
+    # другой вызывающий своих слотов не теряет
+    limiter.acquire("partner:b")
+
+    limiter.release("partner:a")
+    limiter.acquire("partner:a")
+    assert limiter.stats()["active"] == 2
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_volume_per_minute_refills_over_time():
+    clock = FakeClock()
+    limiter = CallerLimiter("test", max_concurrent=5, per_minute=60, timer=clock)
+    limiter.acquire("partner:a", cost=50)
+    limiter.release("partner:a")
+    with pytest.raises(CallerLimitExceeded) as error:
+        limiter.acquire("partner:a", cost=20)
+    assert error.value.retry_after == 10
+
+    clock.now += 10
+    limiter.acquire("partner:a", cost=20)
@@ -0,0 +1,134 @@
+import asyncio
+import random
+
+import pytest
+
+from app.core.retry import RetryPolicy
+from app.exceptions.upstream import (
+    UpstreamBadResponse,
+    UpstreamRateLimited,
+    UpstreamTimeout,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_policy(clock, **kwargs):
+    options = dict(max_attempts=3, deadline=10, attempt_timeout=3, clock=clock, rng=random.Random(1))
+    options.update(kwargs)
+    return RetryPolicy(**options)
+
+
+def failing(*errors, result="ok"):
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_retries_until_success_without_extra_sleep():
+    clock = FakeClock()
+    fn, calls = failing(UpstreamTimeout("t"), UpstreamTimeout("t"))
+
+    assert make_policy(clock).call(fn, sleep=clock.sleep) == "ok"
+    assert len(calls) == 3
+    assert len(clock.sleeps) == 2
+    assert all(0.2 <= delay <= 2.0 for delay in clock.sleeps)
+
+
+def test_no_sleep_after_last_attempt():
+    clock = FakeClock()
+    fn, calls = failing(*[UpstreamTimeout("t")] * 3)
+
+    with pytest.raises(UpstreamTimeout):
+        make_policy(clock).call(fn, sleep=clock.sleep)
+    assert len(calls) == 3
+    assert len(clock.sleeps) == 2
+
+
+def test_not_retryable_error_fails_immediately():
+    clock = FakeClock()
+    fn, calls = failing(UpstreamBadResponse("404"))
+    policy = make_policy(clock)
+
+    with pytest.raises(UpstreamBadResponse):
+        policy.call(fn, sleep=clock.sleep)
+    assert (len(calls), clock.sleeps) == (1, [])
+    assert policy.stats()["gave_up"]["not_retryable"] == 1
+
+
+def test_retry_after_and_deadline():
+    clock = FakeClock()
+    fn, calls = failing(UpstreamRateLimited("429", retry_after=1.5))
+    assert make_policy(clock).call(fn, sleep=clock.sleep) == "ok"
+    assert clock.sleeps == [1.5]
+    # попытка получает остаток бюджета
+    assert calls == [3, 3]
+
+    # Retry-After дольше оставшегося бюджета — сдаёмся сразу, без ожидания
+    clock = FakeClock()
+    fn, calls = failing(UpstreamRateLimited("429", retry_after=60))
+    policy = make_policy(clock)
+    with pytest.raises(UpstreamRateLimited):
+        policy.call(fn, sleep=clock.sleep)
+    assert clock.sleeps == []
+    assert policy.stats()["gave_up"]["deadline"] == 1
+
+
+def test_attempt_timeout_shrinks_to_deadline():
+    clock = FakeClock()
+
+    def slow(timeout):
+        clock.now += timeout
+        raise UpstreamTimeout("t")
+
+    policy = make_policy(clock, deadline=4, max_attempts=5)
+    with pytest.raises(UpstreamTimeout):
+        policy.call(slow, sleep=clock.sleep)
+    assert clock.now <= 4
+
+
+def test_decorrelated_jitter_is_bounded():
+    policy = RetryPolicy(base_delay=0.1, max_delay=1.0, rng=random.Random(7))
+    delay = policy.base_delay
+    for _ in range(100):
+        delay = policy._next_delay(delay, UpstreamTimeout("t"))
+        assert 0.1 <= delay <= 1.0
+
+
+def test_async_call_uses_event_loop_sleep():
+    policy = RetryPolicy(max_attempts=3, deadline=2, base_delay=0.001, max_delay=0.002)
+    attempts = []
+
+    async def fetch(timeout):
+        attempts.append(timeout)
+        if len(attempts) == 1:
+            raise UpstreamTimeout("t")
+        return "ok"
+
+    async def slow(timeout):
+        await asyncio.sleep(10)
+
+    assert asyncio.run(policy.call_async(fetch)) == "ok"
+    assert len(attempts) == 2
+
+    # зависшая попытка обрывается по таймауту, а не ждёт бесконечно
+    policy = RetryPolicy(max_attempts=1, deadline=0.05, attempt_timeout=0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(policy.call_async(slow))
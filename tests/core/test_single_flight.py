@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        release.wait(5)
+        return "product"
+
+    threads, results, errors = run_concurrently(flight, "46", fetch, 8)
+    # все 8 вызовов зашли: 1 лидер + 7 ожидающих
+    while flight.stats()["coalesced"] < 7:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert executions == [1]
+    assert results == ["product"] * 8 and not errors
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 7, "errors": 0}
+
+    # результат не кэшируется
+    assert flight.do("46", lambda: "again") == "again"
+
+
+def test_error_is_shared_and_key_released():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise TimeoutError("upstream")
+
+    threads, results, errors = run_concurrently(flight, "46", fetch, 3)
+    while flight.stats()["coalesced"] < 2:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3 and all(isinstance(e, TimeoutError) for e in errors)
+    assert flight.stats()["errors"] == 1
+    with pytest.raises(ValueError):
+        flight.do("46", lambda: (_ for _ in ()).throw(ValueError("next call runs again")))
+
+
+def test_async_calls_share_one_task():
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def fetch():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return "product"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("4600000000000", fetch))
+        cancelled = asyncio.ensure_future(flight.do("4600000000000", fetch))
+        others = [flight.do("4600000000000", fetch) for _ in range(3)]
+        await asyncio.sleep(0)
+        # отмена одного ожидающего не отменяет общий запрос
+        cancelled.cancel()
+        return await asyncio.gather(first, *others)
+
+    assert asyncio.run(scenario()) == ["product"] * 4
+    assert executions == [1]
+    stats = flight.stats()
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_async_errors_reach_all_waiters():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("api down")
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("k", fail), flight.do("k", fail), return_exceptions=True
+        )
+
+    errors = asyncio.run(scenario())
+    assert [type(error) for error in errors] == [RuntimeError, RuntimeError]
+    assert flight.stats()["errors"] == 1
@@ -0,0 +1,144 @@
+import csv
+
+import pytest
+
+from app.db.csv_to_db import CSV_DIR, CSVToDB
+from app.db.models import IngredientAlias, IngredientChange, ProductIngredient
+
+
+@pytest.fixture
+def importer(tmp_path):
+    database = CSVToDB(f"sqlite:///{tmp_path / 'import.db'}", chunk_size=10)
+    database.create_tables()
+    return database
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["name", "category_id", "safety_score", "description"])
+        writer.writerows(rows)
+    return path
+
+
+def test_import_repo_dictionaries(importer):
+    categories = importer.import_categories_from_csv(CSV_DIR / "ingredient_categories.csv")
+    ingredients = importer.import_ingredients_from_csv(CSV_DIR / "ingredients.csv")
+    importer.import_aliases_from_csv(CSV_DIR / "ingredient_aliases.csv")
+    inci = importer.import_inci_from_csv(CSV_DIR / "inci_data.csv")
+
+    assert categories.rows_written == categories.rows_read
+    assert ingredients.chunks == 7
+    assert inci.rows_per_second > 0
+
+    aqua = importer.select_one_ingredient("Aqua")
+    # inci_data.csv — вторичный источник, оценку из ingredients.csv не перетирает
+    assert aqua.safety_score == 1
+    with importer.get_session() as session:
+        names = [name.lower() for (name,) in session.query(ProductIngredient.name)]
+    assert len(names) == len(set(names))
+    # «water» из inci_data.csv — синоним Aqua, а не отдельный ингредиент
+    assert "water" not in names
+
+
+def test_inci_synonym_fills_canonical_ingredient(importer, tmp_path):
+    path = write_csv(tmp_path / "ingredients.csv", [["Aqua", "", "1", ""]])
+    importer.import_ingredients_from_csv(path)
+    aliases = tmp_path / "aliases.csv"
+    aliases.write_text("alias,ingredient,language\nWater,Aqua,en\n", encoding="utf-8")
+    importer.import_aliases_from_csv(aliases)
+    inci = tmp_path / "inci.csv"
+    inci.write_text(
+        "name,function,safety_score,description\nwater,Solvent,5,Вода\n", encoding="utf-8"
+    )
+
+    importer.import_inci_from_csv(inci)
+
+    assert importer.select_one_ingredient("water") is None
+    aqua = importer.select_one_ingredient("Aqua")
+    assert (aqua.safety_score, aqua.description) == (1, "Вода")
+
+
+def test_reimport_updates_in_place(importer, tmp_path):
+    path = write_csv(tmp_path / "ingredients.csv", [["Aqua", "", "1", "Вода"], ["Aqua", "", "2", ""]])
+    importer.import_ingredients_from_csv(path)
+    write_csv(path, [["AQUA", "", "3", ""], ["", "", "", "без названия"]])
+    report = importer.import_ingredients_from_csv(path)
+
+    assert report.rows_skipped == 1
+    aqua = importer.select_one_ingredient("Aqua")
+    assert aqua.safety_score == 3
+    # пустые поля из CSV не стирают заполненные
+    assert aqua.description == "Вода"
+    with importer.get_session() as session:
+        assert session.query(IngredientChange).count() == 2
+
+
+def test_import_resumes_after_failure(importer, tmp_path, mocker):
+    path = write_csv(
+        tmp_path / "ingredients.csv", [[f"Ingredient {i}", "", "1", ""] for i in range(25)]
+    )
+    write = importer._write_ingredients
+    calls = []
+
+    def failing(session, chunk, **kwargs):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise RuntimeError("db down")
+        return write(session, chunk, **kwargs)
+
+    mocker.patch.object(importer, "_write_ingredients", side_effect=failing)
+    with pytest.raises(RuntimeError):
+        importer.import_ingredients_from_csv(path)
+
+    mocker.patch.object(importer, "_write_ingredients", side_effect=write)
+    report = importer.import_ingredients_from_csv(path)
+
+    assert report.resumed_from == 10
+    assert report.rows_read == 15
+    with importer.get_session() as session:
+        assert session.query(ProductIngredient).count() == 25
+    # завершённый импорт при повторном запуске идёт с начала
+    assert importer.import_ingredients_from_csv(path).resumed_from == 0
+
+
+def test_aliases_are_imported_in_chunks(importer, tmp_path):
+    from sqlalchemy import event
+
+    path = write_csv(
+        tmp_path / "ingredients.csv", [[f"Ingredient {i}", "", "1", ""] for i in range(30)]
+    )
+    importer.import_ingredients_from_csv(path)
+    aliases = tmp_path / "aliases.csv"
+    with open(aliases, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["alias", "ingredient", "language"])
+        writer.writerows([f"Synonym {i}", f"ingredient {i}", "en"] for i in range(30))
+        writer.writerow(["Ghost", "Unknownium", "en"])
+
+    statements = []
+    event.listen(importer.engine, "before_cursor_execute", lambda *args: statements.append(1))
+    report = importer.import_aliases_from_csv(aliases)
+
+    assert (report.chunks, report.rows_written, report.rows_skipped) == (4, 30, 1)
+    # число запросов зависит от числа пачек, а не строк
+    assert len(statements) < 40
+    assert importer.select_one_ingredient("synonym 7") is None
+    with importer.get_session() as session:
+        alias = session.query(IngredientAlias).filter_by(normalized="synonym 7").one()
+        assert alias.ingredient.name == "Ingredient 7"
+        assert session.query(IngredientAlias).count() == 30
+
+    # повторный импорт ничего не меняет
+    assert importer.import_aliases_from_csv(aliases).rows_written == 0
+
+
+def test_unsupported_database_is_rejected_before_import(importer, tmp_path, mocker):
+    path = write_csv(tmp_path / "ingredients.csv", [["Aqua", "", "1", ""]])
+    mocker.patch.object(importer.engine.dialect, "name", "mysql")
+
+    with pytest.raises(RuntimeError, match="mysql"):
+        importer.import_ingredients_from_csv(path)
+    mocker.stopall()
+    with importer.get_session() as session:
+        assert session.query(ProductIngredient).count() == 0
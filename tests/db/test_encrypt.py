@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from app.db.crud import OtrazhenieDB
+from app.db.encrypt import Argon2Executor, EncryptData, calibrate, make_hasher
+from app.db.models import User
+
+# минимальные параметры — тесты не должны считать настоящие хеши
+FAST = dict(time_cost=1, memory_cost=8, parallelism=1)
+
+
+@pytest.fixture
+def encrypt():
+    return EncryptData(hasher=make_hasher(**FAST), executor=Argon2Executor(2))
+
+
+def test_hash_and_verify(encrypt):
+    stored = encrypt.hash_password("Secret123!")
+
+    assert encrypt.verify_password(stored, "Secret123!") == (True, None)
+    assert encrypt.verify_password(stored, "wrong") == (False, None)
+    assert encrypt.verify_password("plain", "plain") == (False, None)
+    # хеш + две проверки; не-Argon2 хеш в пул не идёт
+    assert encrypt.executor.stats()["completed"] == 3
+
+
+def test_outdated_parameters_return_new_hash(encrypt):
+    old = EncryptData(hasher=make_hasher(time_cost=2, memory_cost=16, parallelism=1))
+    stored = old.hash_password("Secret123!")
+
+    is_valid, new_hash = encrypt.verify_password(stored, "Secret123!")
+
+    assert is_valid and new_hash.startswith("$argon2id$v=19$m=8,t=1,p=1$")
+
+
+def test_executor_caps_concurrency():
+    executor = Argon2Executor(max_workers=2)
+
+    def work():
+        time.sleep(0.02)
+
+    threads = [threading.Thread(target=executor.run, args=(work,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = executor.stats()
+    assert stats["max_running"] == 2
+    assert stats["completed"] == 6
+    assert (stats["queued"], stats["running"]) == (0, 0)
+
+
+def test_rehash_is_persisted(tmp_path, mocker, encrypt):
+    db = OtrazhenieDB(f"sqlite:///{tmp_path / 'users.db'}")
+    db.create_tables()
+    old = EncryptData(hasher=make_hasher(time_cost=2, memory_cost=16, parallelism=1))
+    db.create_user("u", "u@example.com", old.hash_password("Secret123!"))
+    mocker.patch("app.db.crud.EncryptData", return_value=encrypt)
+    background = mocker.patch(
+        "app.db.crud.run_in_background", side_effect=lambda fn, *args: fn(*args)
+    )
+
+    assert db.verify_user_password("u@example.com", "Secret123!")
+    assert background.call_count == 1
+    with db.get_session() as session:
+        stored = session.query(User).filter_by(email="u@example.com").one().password_hash
+    assert "m=8,t=1,p=1" in stored
+
+    # хеш уже актуален — повторной записи нет; чужой старый хеш не перезаписывается
+    assert db.verify_user_password("u@example.com", "Secret123!")
+    assert background.call_count == 1
+    assert not db.update_password_hash(1, "stale", "new")
+
+
+def test_calibrate_respects_target():
+    time_cost, memory_cost, elapsed_ms = calibrate(
+        target_ms=20, max_memory_kib=64, parallelism=1, rounds=1
+    )
+    assert time_cost >= 1 and memory_cost == 64
+    assert elapsed_ms <= 20
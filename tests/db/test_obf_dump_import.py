@@ -0,0 +1,142 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.db.models import Product, ProductIngredient, product_ingredients_link
+from app.db.obf_dump_to_db import OBFDumpToDB
+from app.services.local_product_index import LocalProductIndex
+
+DUMP_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def importer(tmp_path):
+    database = OBFDumpToDB(f"sqlite:///{tmp_path / 'dump.db'}", chunk_size=2)
+    database.create_tables()
+    return database
+
+
+def write_jsonl(path, records):
+    with gzip.open(path, "wt", encoding="utf-8") as dump:
+        for record in records:
+            dump.write(record if isinstance(record, str) else json.dumps(record, ensure_ascii=False))
+            dump.write("\n")
+    return path
+
+
+FIXTURE = [
+    {
+        "code": "4600000000001",
+        "product_name": "Крем",
+        "brands": "Бренд",
+        "ingredients_text_en": "Aqua, Glycerin",
+        "quantity": "50 ml",
+        "countries": ["Russia", "France"],
+    },
+    {"code": "4600000000002", "product_name": "Тоник", "ingredients_text": "Aqua"},
+    {"code": "12", "product_name": "Неверный штрих-код"},
+    {"code": "4600000000003"},
+    "{битая строка",
+    {"code": "4600000000001", "product_name": "Крем (новая версия)"},
+]
+
+
+def test_import_fixture_dump(importer, tmp_path):
+    dump = write_jsonl(tmp_path / "products.jsonl.gz", FIXTURE)
+    report = importer.import_dump(dump, index_dir=tmp_path / "index", dump_time=DUMP_TIME)
+
+    assert (report.records_read, report.records_skipped) == (6, 3)
+    assert report.products_indexed == 2
+    row = importer.select_product_for_lookup("4600000000002")
+    assert (row.name, row.ingredients_text) == ("Тоник", "Aqua")
+    assert row.fetched_at == datetime(2026, 1, 1)
+    # дубль штрих-кода в другой пачке: последняя запись побеждает, пустые поля не стирают
+    row = importer.select_product_for_lookup("4600000000001")
+    assert (row.name, row.weight, row.countries) == ("Крем (новая версия)", "50 ml", "Russia, France")
+
+    index = LocalProductIndex(tmp_path / "index")
+    data, fetched_at = index.get("4600000000001")
+    assert data.name == "Крем (новая версия)"
+    assert fetched_at == DUMP_TIME.timestamp()
+    assert index.get("4600000000009") is None
+    assert len(index) == 2
+
+
+def test_delta_extends_index_and_keeps_manual_products(importer, tmp_path):
+    index_dir = tmp_path / "index"
+    importer.import_dump(
+        write_jsonl(tmp_path / "products.jsonl.gz", FIXTURE[:2]), index_dir=index_dir
+    )
+    index = LocalProductIndex(index_dir, check_interval=0)
+    assert index.get("4600000000002")[0].name == "Тоник"
+
+    importer.add_product("4600000000005", "Ручной")
+    delta = write_jsonl(
+        tmp_path / "delta.json.gz",
+        [
+            {"code": "4600000000002", "product_name": "Тоник 2"},
+            {"code": "4600000000004", "product_name": "Маска"},
+            {"code": "4600000000005", "product_name": "Из выгрузки"},
+        ],
+    )
+    report = importer.import_dump(delta, index_dir=index_dir, delta=True)
+
+    assert report.manual_skipped == 1
+    assert report.products_indexed == 4
+    assert index.get("4600000000002")[0].name == "Тоник 2"
+    assert index.get("4600000000001")[0].name == "Крем"
+    assert importer.select_product_for_lookup("4600000000005").name == "Ручной"
+    assert index.stats()["reloads"] == 2
+
+
+def test_import_tab_separated_csv(importer, tmp_path):
+    dump = tmp_path / "products.csv.gz"
+    with gzip.open(dump, "wt", encoding="utf-8") as csvfile:
+        csvfile.write("code\tproduct_name\tingredients_text\timage_url\n")
+        csvfile.write('4600000000001\tКрем "Мягкий"\tAqua, Parfum\thttps://img/1.jpg\n')
+    report = importer.import_dump(dump, index_dir="", dump_time=DUMP_TIME)
+
+    assert report.products_written == 1
+    row = importer.select_product_for_lookup("4600000000001")
+    assert (row.name, row.ingredients_text, row.image_url) == (
+        'Крем "Мягкий"', "Aqua, Parfum", "https://img/1.jpg"
+    )
+
+
+def linked_ingredients(database, barcode) -> list[str]:
+    with database.get_session() as session:
+        product = session.query(Product).filter_by(barcode=barcode).one()
+        return session.execute(
+            select(ProductIngredient.name)
+            .join(product_ingredients_link)
+            .where(product_ingredients_link.c.product_id == product.id)
+            .order_by(product_ingredients_link.c.position)
+        ).scalars().all()
+
+
+def test_dump_does_not_roll_back_newer_products_and_relinks_changed(importer, tmp_path):
+    importer.save_fetched_product(
+        "4600000000001", datetime(2026, 2, 1), name="Из API", ingredients_text="Aqua, Glycerin"
+    )
+    importer.save_fetched_product(
+        "4600000000002", datetime(2025, 6, 1), name="Тоник", ingredients_text="Aqua"
+    )
+    dump = write_jsonl(
+        tmp_path / "products.jsonl.gz",
+        [
+            {"code": "4600000000001", "product_name": "Старая", "ingredients_text": "Aqua"},
+            {"code": "4600000000002", "product_name": "Тоник", "ingredients_text": "Aqua, Niacinamide"},
+        ],
+    )
+    report = importer.import_dump(dump, index_dir="", dump_time=DUMP_TIME)
+
+    assert (report.newer_skipped, report.products_written, report.products_relinked) == (1, 1, 1)
+    row = importer.select_product_for_lookup("4600000000001")
+    assert (row.name, row.fetched_at) == ("Из API", datetime(2026, 2, 1))
+    assert linked_ingredients(importer, "4600000000001") == ["Aqua", "Glycerin"]
+    row = importer.select_product_for_lookup("4600000000002")
+    assert (row.ingredients_text, row.fetched_at) == ("Aqua, Niacinamide", datetime(2026, 1, 1))
+    assert linked_ingredients(importer, "4600000000002") == ["Aqua", "Niacinamide"]
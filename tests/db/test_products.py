@@ -0,0 +1,205 @@
+import pytest
+
+from app.db.crud import OtrazhenieDB
+from app.db.models import Product, ProductIngredient
+
+
+@pytest.fixture
+def db(tmp_path, mocker):
+    # индекс ингредиентов процесса смотрит в основную БД — здесь он не нужен
+    mocker.patch(
+        "app.services.ingredient_index.ingredient_index.resolve_id", return_value=None
+    )
+    database = OtrazhenieDB(f"sqlite:///{tmp_path / 'scores.db'}")
+    database.create_tables()
+    return database
+
+
+def product_score(db, barcode):
+    with db.get_session() as session:
+        product = session.query(Product).filter_by(barcode=barcode).one()
+        return product.safety_score, product.risk_count, product.unknown_count
+
+
+def test_add_product_persists_score_and_positions(db):
+    aqua = db.add_ingredient(name="Aqua", safety_score=1)
+    db.add_ingredient(name="Glycerin", safety_score=1)
+    db.add_product("1", "Крем", ingredients_text="Aqua, Glycerin, Unknownium")
+
+    score, risk_count, unknown_count = product_score(db, "1")
+    assert score is not None
+    assert (risk_count, unknown_count) == (0, 1)
+
+    with db.get_session() as session:
+        product = session.query(Product).filter_by(barcode="1").one()
+        assert [i.name for i in product.ingredients] == ["Aqua", "Glycerin", "Unknownium"]
+        assert product.ingredients[0].id == aqua.id
+
+
+def test_ingredient_score_change_recomputes_products(db):
+    db.add_ingredient(name="Aqua", safety_score=1)
+    parabens = db.add_ingredient(name="Propylparaben", safety_score=2)
+    db.add_product("1", "Крем", ingredients_text="Aqua, Propylparaben")
+    db.add_product("2", "Тоник", ingredients_text="Aqua")
+    before = product_score(db, "1")[0]
+    untouched = product_score(db, "2")
+
+    db.update_ingredient(parabens.id, safety_score=9)
+
+    score, risk_count, _ = product_score(db, "1")
+    assert score > before
+    assert risk_count == 1
+    assert product_score(db, "2") == untouched
+
+    db.delete_ingredient(parabens.id)
+    assert product_score(db, "1")[1] == 0
+
+
+def test_select_products_by_safety(db):
+    db.add_ingredient(name="Aqua", safety_score=1)
+    db.add_ingredient(name="Formaldehyde", safety_score=10)
+    db.add_product("1", "Опасный", ingredients_text="Formaldehyde")
+    db.add_product("2", "Безопасный", ingredients_text="Aqua")
+    db.add_product("3", "Без состава")
+
+    assert [p.barcode for p in db.select_products_by_safety()] == ["2", "1", "3"]
+    assert [p.barcode for p in db.select_products_by_safety(max_score=5)] == ["2"]
+    assert db.recompute_product_scores() == 3
+
+
+def count_statements(db):
+    from sqlalchemy import event
+
+    statements = []
+    event.listen(
+        db.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+def test_attach_uses_constant_number_of_queries(db):
+    for i in range(10):
+        db.add_ingredient(name=f"Known {i}", safety_score=1)
+    statements = count_statements(db)
+
+    db.add_product("1", "Короткий", ingredients_text="Known 0, New 0")
+    short = len(statements)
+    statements.clear()
+    composition = ", ".join([f"Known {i}" for i in range(10)] + [f"New {i}" for i in range(1, 30)])
+    db.add_product("2", "Длинный", ingredients_text=composition)
+
+    assert len(statements) == short
+    with db.get_session() as session:
+        product = session.query(Product).filter_by(barcode="2").one()
+        assert len(product.ingredients) == 39
+        assert product.unknown_count == 29
+
+
+def test_attach_reuses_existing_and_drops_duplicates(db, mocker):
+    aqua = db.add_ingredient(name="Aqua", safety_score=1)
+    # Water — синоним Aqua по индексу; 999 — id, которого уже нет в БД
+    resolve = {"Water": aqua.id, "Ghost": 999}
+    mocker.patch(
+        "app.services.ingredient_index.ingredient_index.resolve_id",
+        side_effect=lambda name: resolve.get(name),
+    )
+    db.add_product("1", "Крем", ingredients_text="Aqua, Water, Ghost, Ghost")
+
+    with db.get_session() as session:
+        product = session.query(Product).filter_by(barcode="1").one()
+        assert [i.name for i in product.ingredients] == ["Aqua", "Ghost"]
+
+
+def test_index_is_notified_only_when_ingredients_are_created(db, mocker):
+    db.add_ingredient(name="Aqua", safety_score=1)
+    changed = mocker.patch.object(db, "_ingredients_changed")
+
+    db.add_product("1", "Тоник", ingredients_text="Aqua")
+    changed.assert_not_called()
+    db.add_product("2", "Крем", ingredients_text="Aqua, Glycerin")
+    changed.assert_called_once()
+
+
+def test_failed_attach_keeps_product_and_rolls_back_to_savepoint(db, mocker):
+    from sqlalchemy import Column, Integer, MetaData, Table
+
+    # привязка падает уже после вставки новых ингредиентов
+    missing = Table("missing_link", MetaData(), Column("product_id", Integer))
+    mocker.patch("app.db.crud.product_ingredients_link", missing)
+    db.add_product("1", "Крем", ingredients_text="Aqua, Glycerin")
+
+    with db.get_session() as session:
+        product = session.query(Product).filter_by(barcode="1").one()
+        assert product.name == "Крем"
+        assert session.query(ProductIngredient).count() == 0
+
+
+def test_save_fetched_product_inserts_then_updates(db):
+    from datetime import datetime
+
+    db.add_ingredient(name="Aqua", safety_score=1)
+    first, second = datetime(2026, 1, 1), datetime(2026, 2, 1)
+    db.save_fetched_product("1", first, name="Крем", ingredients_text="Aqua")
+    db.save_fetched_product("1", second, name="Крем 2", ingredients_text="Aqua, Parfum")
+
+    row = db.select_product_for_lookup("1")
+    assert (row.name, row.fetched_at) == ("Крем 2", second)
+    with db.get_session() as session:
+        product = session.query(Product).filter_by(barcode="1").one()
+        assert [i.name for i in product.ingredients] == ["Aqua", "Parfum"]
+        assert product.unknown_count == 1
+
+
+def test_save_fetched_product_keeps_manual_products(db):
+    from datetime import datetime
+
+    db.add_product("1", "Ручной", ingredients_text="Aqua")
+    db.save_fetched_product("1", datetime(2026, 1, 1), name="Из API")
+
+    row = db.select_product_for_lookup("1")
+    assert (row.name, row.fetched_at) == ("Ручной", None)
+    assert db.select_product_for_lookup("2") is None
+
+
+def test_select_products_for_lookup_reads_batch_in_chunks(db, mocker):
+    mocker.patch("app.db.crud._LOOKUP_IN_CHUNK", 2)
+    for barcode in ("1", "2", "3"):
+        db.add_product(barcode, f"Продукт {barcode}")
+    statements = count_statements(db)
+
+    rows = db.select_products_for_lookup(["3", "1", "4", "1", "2"])
+
+    assert {barcode: row.name for barcode, row in rows.items()} == {
+        "1": "Продукт 1",
+        "2": "Продукт 2",
+        "3": "Продукт 3",
+    }
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 2
+
+
+@pytest.mark.parametrize(
+    "weight, quantity", [("0.5 L", None), ("1,5 kg", None), ("3 x 10 g", None), ("50", 50)]
+)
+def test_stored_product_keeps_weight_as_is(db, weight, quantity):
+    from app.schemas.product_dto import ProductDTO
+    from app.schemas.product_mapper import product_columns, product_from_row
+
+    dto = ProductDTO.model_validate(
+        {
+            "barcode": "4600000000001",
+            "name": "Крем",
+            "brand": "",
+            "category": "",
+            "ingredients": "",
+            "image_url": None,
+            "additional_info": {"Упаковка": "", "Вес": weight, "Страна": ""},
+        }
+    )
+    db.add_product(**product_columns(dto))
+
+    row = db.select_product_for_lookup("4600000000001")
+    assert row.quantity == quantity
+    # кэш в базе отдаёт тот же DTO, что пришёл из API
+    assert product_from_row(row) == dto
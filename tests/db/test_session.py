@@ -0,0 +1,55 @@
+import pytest
+from flask import Flask
+
+from app.db.crud import OtrazhenieDB
+from app.db.session import close_request_sessions, get_engine, pool_stats
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'session.db'}"
+    OtrazhenieDB(url).create_tables()
+    return url
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.teardown_appcontext(close_request_sessions)
+    return app
+
+
+def test_engine_is_created_once_per_url(db_url):
+    assert OtrazhenieDB(db_url).engine is OtrazhenieDB(db_url).engine
+    assert get_engine(db_url)[0] is OtrazhenieDB(db_url).engine
+
+
+def test_request_uses_one_connection(db_url, app):
+    pool = get_engine(db_url)[0].pool
+    before = pool.checkouts
+
+    with app.app_context():
+        first = OtrazhenieDB(db_url)
+        with first.get_session() as session:
+            first_session = session
+        first.add_ingredient("Aqua", safety_score=1)
+        # объект из общей сессии не отсоединён: связи догружаются
+        ingredient = OtrazhenieDB(db_url).select_one_ingredient("Aqua")
+        assert ingredient.aliases == []
+        with OtrazhenieDB(db_url).get_session() as session:
+            assert session is first_session
+        assert pool.checkedout() == 1
+
+    assert pool.checkouts - before == 1
+    assert pool.checkedout() == 0
+    assert pool_stats()[db_url]["checkouts"] >= 1
+
+
+def test_error_rolls_back_request_session(db_url, app):
+    with app.app_context():
+        db = OtrazhenieDB(db_url)
+        db.add_ingredient("Aqua")
+        with pytest.raises(Exception):
+            db.add_ingredient("Aqua")  # нарушение уникальности
+        # сессия запроса пригодна для следующих вызовов
+        assert db.select_one_ingredient("Aqua") is not None
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import inspect
+
+from app.db.models import Product
+from app.db.upgrade_schema import SchemaUpgrade
+
+# столбцы, добавленные в модели после первых развёртываний
+NEW_PRODUCT_COLUMNS = (
+    "category", "weight", "fetched_at", "safety_score", "risk_count", "unknown_count"
+)
+
+
+@pytest.fixture
+def legacy_db(tmp_path, mocker):
+    mocker.patch(
+        "app.services.ingredient_index.ingredient_index.resolve_id", return_value=None
+    )
+    database = SchemaUpgrade(f"sqlite:///{tmp_path / 'legacy.db'}")
+    database.create_tables()
+    database.add_ingredient(name="Aqua", safety_score=1)
+    database.add_product("1", "Крем", ingredients_text="Aqua, Unknownium")
+    # база, созданная до новых столбцов: create_all их бы не добавил
+    with database.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_products_fetched_at")
+        connection.exec_driver_sql("DROP INDEX ix_products_safety_score")
+        for name in NEW_PRODUCT_COLUMNS:
+            connection.exec_driver_sql(f"ALTER TABLE products DROP COLUMN {name}")
+        connection.exec_driver_sql(
+            "ALTER TABLE product_ingredients_link DROP COLUMN position"
+        )
+    return database
+
+
+def test_upgrade_adds_missing_columns_and_backfills_scores(legacy_db):
+    report = legacy_db.upgrade()
+
+    assert sorted(report.columns_added) == sorted(
+        [f"products.{name}" for name in NEW_PRODUCT_COLUMNS]
+        + ["product_ingredients_link.position"]
+    )
+    assert set(report.indexes_created) == {"ix_products_fetched_at", "ix_products_safety_score"}
+    assert report.products_scored == 1
+    with legacy_db.get_session() as session:
+        product = session.query(Product).filter_by(barcode="1").one()
+        assert product.safety_score is not None
+        assert (product.risk_count, product.unknown_count) == (0, 1)
+
+    # повторный запуск ничего не меняет
+    again = legacy_db.upgrade()
+    assert (again.columns_added, again.indexes_created, again.products_scored) == ([], [], 0)
+    columns = {column["name"] for column in inspect(legacy_db.engine).get_columns("products")}
+    assert set(NEW_PRODUCT_COLUMNS) <= columns
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from app.core.rate_limit import CallerLimiter
+from app.db.crud import OtrazhenieDB
+from app.routes import batch_lookup
+from app.services import product_lookup_service
+from app.services.product_cache import ProductCache
+from app.services.product_lookup_service import BatchLookupResult
+
+
+@pytest.fixture
+def app_client(monkeypatch, mocker):
+    monkeypatch.setenv("SECRET_KEY", "test")
+    from app import create_app
+
+    mocker.patch.object(batch_lookup, "_partners", {"partner-key": "acme"})
+    mocker.patch.object(
+        batch_lookup,
+        "batch_limiter",
+        CallerLimiter("batch_lookup", max_concurrent=2, per_minute=3),
+    )
+    return create_app().test_client()
+
+
+@pytest.fixture
+def client(app_client, mocker):
+    mocker.patch.object(
+        batch_lookup,
+        "lookup_products_batch",
+        side_effect=lambda barcodes: iter(
+            BatchLookupResult(barcode, "not_found", "upstream") for barcode in barcodes
+        ),
+    )
+    return app_client
+
+
+def post(client, barcodes, **headers):
+    return client.post("/api/products/batch", json={"barcodes": barcodes}, headers=headers)
+
+
+def test_batch_requires_partner_key_or_login(client):
+    assert post(client, ["4600000000001"]).status_code == 401
+    assert post(client, ["4600000000001"], **{"X-API-Key": "wrong"}).status_code == 401
+    batch_lookup.lookup_products_batch.assert_not_called()
+
+
+def test_partner_streams_results_within_its_limit(client):
+    response = post(client, ["4600000000001", "4600000000002"], **{"X-API-Key": "partner-key"})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["barcode"] for line in lines] == ["4600000000001", "4600000000002"]
+    response.close()
+    assert batch_lookup.batch_limiter.stats()["active"] == 0
+
+    # 2 из 3 штрих-кодов в минуту уже израсходованы
+    response = post(client, ["4600000000003", "4600000000004"], **{"X-API-Key": "partner-key"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_partner_keys_parsing_skips_broken_entries():
+    assert batch_lookup._partner_keys(["acme:k1", "broken", " shop : k2 "]) == {
+        "k1": "acme",
+        "k2": "shop",
+    }
+
+
+def test_streamed_batch_does_not_hold_a_pooled_connection(app_client, tmp_path, mocker):
+    mocker.patch(
+        "app.services.ingredient_index.ingredient_index.resolve_id", return_value=None
+    )
+    database = OtrazhenieDB(f"sqlite:///{tmp_path / 'products.db'}")
+    database.create_tables()
+    database.save_fetched_product(
+        "4600000000001", product_lookup_service._utcnow(), name="Из базы"
+    )
+    mocker.patch.object(product_lookup_service, "_db", return_value=database)
+    mocker.patch.object(product_lookup_service, "LOOKUP_DB_READ_THROUGH", True)
+    mocker.patch.object(product_lookup_service, "LOOKUP_DB_WRITE_BACK", False)
+    mocker.patch.object(
+        product_lookup_service,
+        "product_cache",
+        ProductCache(maxsize=10, ttl=300, stale_ttl=3600, negative_ttl=60),
+    )
+    checked_out = []
+
+    def fetch(barcode, timeout=None):
+        # ответы API ждут, пока поток отдаёт строки, — соединение к этому моменту в пуле
+        checked_out.append(database.engine.pool.checkedout())
+
+    mocker.patch.object(product_lookup_service, "fetch_cosmetic_info", side_effect=fetch)
+    response = post(
+        app_client, ["4600000000001", "4600000000002"], **{"X-API-Key": "partner-key"}
+    )
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["status"] for line in lines] == ["found", "not_found"]
+    assert checked_out == [0]
+
+
+def test_rejected_batch_is_not_counted(app_client):
+    for _ in range(2):
+        batch_lookup.batch_limiter.acquire("partner:acme")
+    before = product_lookup_service.lookup_stats()["batches"]
+
+    response = post(app_client, ["abc"], **{"X-API-Key": "partner-key"})
+    assert response.status_code == 429
+    assert product_lookup_service.lookup_stats()["batches"] == before
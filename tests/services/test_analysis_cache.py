@@ -0,0 +1,55 @@
+from app.services.analysis_cache import AnalysisCache, composition_key, estimate_size
+
+
+def entry(name):
+    return {"name": name, "function": "Растворитель", "safety_score": 1.0}
+
+
+def test_same_tokens_computed_once():
+    cache = AnalysisCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [entry("aqua")]
+
+    key = composition_key(["aqua", "glycerin"], revision=1)
+    first = cache.get_or_compute(key, compute)
+    second = cache.get_or_compute(composition_key(["aqua", "glycerin"], 1), compute)
+
+    assert first is second
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_key_depends_on_revision_and_token_boundaries():
+    assert composition_key(["aqua"], 1) != composition_key(["aqua"], 2)
+    assert composition_key(["a b", "c"], 1) != composition_key(["a", "b c"], 1)
+    assert composition_key(["aqua", "glycerin"], 1) != composition_key(["glycerin", "aqua"], 1)
+
+
+def test_memory_cap_evicts_least_recently_used():
+    one = (entry("aqua"),)
+    cache = AnalysisCache(max_bytes=estimate_size(one) * 2, ttl=60)
+
+    cache.get_or_compute(composition_key(["a"], 1), lambda: [entry("aqua")])
+    cache.get_or_compute(composition_key(["b"], 1), lambda: [entry("aqua")])
+    # «a» использован недавно — вытесняется «b»
+    cache.get_or_compute(composition_key(["a"], 1), lambda: [])
+    cache.get_or_compute(composition_key(["c"], 1), lambda: [entry("aqua")])
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert cache.get_or_compute(composition_key(["a"], 1), lambda: []) == one
+
+
+def test_result_larger_than_cache_is_returned_but_not_stored():
+    cache = AnalysisCache(max_bytes=10, ttl=60)
+    result = cache.get_or_compute(composition_key(["a"], 1), lambda: [entry("aqua")])
+
+    assert result[0]["name"] == "aqua"
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["too_large"] == 1
@@ -0,0 +1,192 @@
+from app.services.ingredient_index import IngredientIndex
+
+
+class FakeSource:
+    """Таблица ингредиентов и журнал изменений в памяти"""
+
+    def __init__(self, rows, aliases=()):
+        self.rows = {row[0]: row for row in rows}
+        self.aliases = list(aliases)
+        self.changes = []
+        self.full_loads = 0
+        self.fail = False
+
+    def write(self, row):
+        self.rows[row[0]] = row
+        self.changes.append((len(self.changes) + 1, row[0], "upsert"))
+
+    def delete(self, ingredient_id):
+        self.rows.pop(ingredient_id, None)
+        self.changes.append((len(self.changes) + 1, ingredient_id, "delete"))
+
+    def load_all(self):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.full_loads += 1
+        return list(self.rows.values())
+
+    def load_by_ids(self, ids):
+        return [self.rows[i] for i in ids if i in self.rows]
+
+    def load_aliases(self, ids=None):
+        return [a for a in self.aliases if ids is None or a[0] in ids]
+
+    def latest_revision(self):
+        if self.fail:
+            raise RuntimeError("db down")
+        return max((change[0] for change in self.changes), default=0)
+
+    def changes_since(self, revision, limit):
+        return sorted(c for c in self.changes if c[0] > revision)[:limit]
+
+
+def make_index(source, **kwargs):
+    kwargs.setdefault("poll_interval", 0)
+    return IngredientIndex(source=source, **kwargs)
+
+
+def test_index_loads_once():
+    source = FakeSource([(1, "Aqua", "Растворитель", 1.0, "Вода")])
+    index = make_index(source)
+
+    assert index.get("aqua")["function"] == "Растворитель"
+    assert index.get(" AQUA ")["name"] == "Aqua"
+    assert index.get("unknown") is None
+    assert source.full_loads == 1
+
+    stats = index.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["reloads"] == 1
+
+
+def test_changes_are_applied_without_full_reload():
+    source = FakeSource([(1, "Aqua", "Растворитель", 1.0, "Вода")])
+    index = make_index(source)
+    assert index.revision == 0
+
+    source.write((2, "Glycerin", "Увлажнитель", 1.0, None))
+    source.write((1, "Water", "Растворитель", 1.0, "Вода"))
+
+    assert index.get("glycerin") is not None
+    assert index.get("water") is not None
+    # переименованный ингредиент не остаётся под старым ключом
+    assert index.get("aqua") is None
+    assert index.revision == 2
+    assert source.full_loads == 1
+
+    source.delete(2)
+    assert index.get("glycerin") is None
+    assert index.stats()["delta_updates"] == 2
+
+
+def test_poll_interval_defers_check_until_marked_dirty():
+    source = FakeSource([(1, "Aqua", "Растворитель", 1.0, "Вода")])
+    index = make_index(source, poll_interval=3600)
+    index.get("aqua")
+
+    source.write((2, "Glycerin", "Увлажнитель", 1.0, None))
+    assert index.get("glycerin") is None
+
+    index.mark_dirty()
+    assert index.get("glycerin") is not None
+
+
+def test_large_delta_triggers_full_reload():
+    source = FakeSource([])
+    index = make_index(source, max_delta=2)
+    index.get("aqua")
+
+    for i in range(3):
+        source.write((i, f"ing{i}", None, None, None))
+
+    assert index.get("ing2") is not None
+    assert source.full_loads == 2
+
+
+def test_failed_reload_keeps_previous_data():
+    source = FakeSource([(1, "Aqua", "Растворитель", 1.0, "Вода")])
+    index = make_index(source)
+    assert index.get("aqua") is not None
+
+    source.fail = True
+    index.invalidate()
+    assert index.get("aqua") is not None
+    assert index.stats()["reload_errors"] == 1
+
+
+def test_aliases_and_slash_forms_resolve_to_canonical():
+    source = FakeSource(
+        [
+            (1, "Aqua", "Растворитель", 1.0, "Вода"),
+            (2, "Caprylic/Capric Triglyceride", "Эмолент", 1.0, None),
+        ],
+        aliases=[(1, "water"), (1, "вода"), (1, "eau")],
+    )
+    index = make_index(source)
+
+    for spelling in ("Water", "ВОДА", "Aqua/Water/Eau", "aqua*", "Eau / Aqua"):
+        assert index.get(spelling)["name"] == "Aqua", spelling
+    assert index.get("caprylic / capric triglyceride")["name"] == (
+        "Caprylic/Capric Triglyceride"
+    )
+    assert index.resolve_id("water") == 1
+    assert index.get("Eau (Aqua)")["name"] == "Aqua"
+
+
+def test_alias_does_not_override_canonical_name():
+    source = FakeSource(
+        [(1, "Aqua", None, 1.0, None), (2, "Water", None, 2.0, None)],
+        aliases=[(1, "water")],
+    )
+    index = make_index(source)
+    assert index.get("water")["id"] == 2
+
+    source.aliases.append((2, "h2o"))
+    source.write((2, "Water", None, 3.0, None))
+    assert index.get("h2o")["safety_score"] == 3.0
+
+
+def test_fuzzy_match_returns_entry_and_confidence():
+    source = FakeSource([(1, "Phenoxyethanol", "Консервант", 4.0, None)])
+    index = make_index(source)
+
+    entry, confidence = index.fuzzy_match("Phenoxyethanl")
+    assert entry["name"] == "Phenoxyethanol"
+    assert 0.9 < confidence < 1
+    assert index.fuzzy_match("Tetrasodium Glutamate") is None
+
+    # нечёткий индекс пересобирается после изменения данных
+    source.write((2, "Glycerin", "Увлажнитель", 1.0, None))
+    assert index.fuzzy_match("glycerine")[0]["name"] == "Glycerin"
+
+
+def test_change_committed_out_of_order_is_not_skipped():
+    source = FakeSource([(1, "Aqua", "Растворитель", 1.0, "Вода")])
+    index = make_index(source)
+    index.get("aqua")
+
+    # транзакция с id 1 ещё не зафиксирована, а id 2 уже виден
+    source.rows[2] = (2, "Glycerin", "Увлажнитель", 1.0, None)
+    source.changes.append((2, 2, "upsert"))
+    assert index.get("glycerin") is not None
+    assert index.revision == 2
+    assert index.stats()["pending_gaps"] == 1
+
+    source.rows[3] = (3, "Parfum", "Отдушка", 4.0, None)
+    source.changes.append((1, 3, "upsert"))
+    assert index.get("parfum") is not None
+    assert index.stats()["pending_gaps"] == 0
+    assert source.full_loads == 1
+
+
+def test_gap_of_rolled_back_transaction_expires():
+    source = FakeSource([(1, "Aqua", "Растворитель", 1.0, "Вода")])
+    index = make_index(source, gap_seconds=0)
+    index.get("aqua")
+
+    source.rows[2] = (2, "Glycerin", "Увлажнитель", 1.0, None)
+    source.changes.append((2, 2, "upsert"))
+    index.get("glycerin")
+    index.get("glycerin")
+    assert index.stats()["pending_gaps"] == 0
@@ -0,0 +1,142 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.analyzers.qr_reader import fetch_cosmetic_info
+from app.core.circuit_breaker import CircuitBreaker
+from app.exceptions.upstream import (
+    CircuitOpenError,
+    UpstreamBadResponse,
+    UpstreamRateLimited,
+    UpstreamTimeout,
+    UpstreamUnavailable,
+)
+from app.services import openbeautyfacts_client
+from app.services.openbeautyfacts_client import PRODUCT_FIELDS, OpenBeautyFactsClient
+
+PRODUCT = {
+    "status": 1,
+    "product": {"product_name": "Крем", "brands": "Бренд", "ingredients_text_en": "Aqua"},
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Заглушка API: ответ выбирается по штрих-коду в пути"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.seen.append(
+            (self.client_address[1], parse_qs(url.query), self.headers.get("Accept-Encoding"))
+        )
+        barcode = url.path.rsplit("/", 1)[-1].removesuffix(".json")
+        if barcode == "404":
+            self._send(404, b'{"status": 0}')
+        elif barcode == "503":
+            self._send(503)
+        elif barcode == "429":
+            self._send(429, headers={"Retry-After": "7"})
+        elif barcode == "big":
+            self._send(200, gzip.compress(b" " * 10_000 + b"{}"), {"Content-Encoding": "gzip"})
+        elif barcode == "slow":
+            threading.Event().wait(0.5)
+            try:
+                self._send(200, b"{}")
+            except BrokenPipeError:
+                pass  # клиент уже ушёл по таймауту
+        elif barcode == "garbage":
+            self._send(200, b"<html>")
+        else:
+            body = gzip.compress(json.dumps(PRODUCT).encode())
+            self._send(200, body, {"Content-Encoding": "gzip"})
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.seen = []
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = OpenBeautyFactsClient(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}", max_response_bytes=4096
+    )
+    yield client
+    client.close()
+
+
+def test_fetch_reuses_connection_and_requests_fields(server, client):
+    first = fetch_cosmetic_info("4600000000001", client=client)
+    second = fetch_cosmetic_info("4600000000002", client=client)
+
+    assert first.name == "Крем" and first.ingredients == "Aqua"
+    assert second.barcode == "4600000000002"
+    ports = {port for port, _, _ in server.seen}
+    assert len(ports) == 1  # одно keep-alive соединение на оба запроса
+    _, query, encoding = server.seen[0]
+    assert query["fields"] == [PRODUCT_FIELDS]
+    assert "gzip" in encoding
+    assert client.stats()["requests"] == 2
+
+
+def test_not_found_returns_none(client):
+    assert fetch_cosmetic_info("404", client=client) is None
+
+
+@pytest.mark.parametrize(
+    "barcode, error",
+    [
+        ("503", UpstreamUnavailable),
+        ("429", UpstreamRateLimited),
+        ("big", UpstreamBadResponse),
+        ("garbage", UpstreamBadResponse),
+    ],
+)
+def test_upstream_errors(client, barcode, error):
+    with pytest.raises(error) as raised:
+        client.fetch_product(barcode)
+    if error is UpstreamRateLimited:
+        assert raised.value.retry_after == 7
+    assert raised.value.retryable == (error in (UpstreamUnavailable, UpstreamRateLimited))
+
+
+def test_read_timeout(client):
+    with pytest.raises(UpstreamTimeout):
+        client.fetch_product("slow", timeout=0.1)
+
+
+def test_open_breaker_stops_requests(client, mocker):
+    breaker = CircuitBreaker("test", window_size=2, min_calls=2, open_seconds=60)
+    mocker.patch.object(openbeautyfacts_client, "openbeautyfacts_breaker", breaker)
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            fetch_cosmetic_info("503", client=client)
+
+    with pytest.raises(CircuitOpenError):
+        fetch_cosmetic_info("4600000000001", client=client)
+    assert client.stats()["requests"] == 2
+    assert breaker.stats()["transitions"] == {"closed_to_open": 1}
@@ -0,0 +1,123 @@
+import pytest
+
+from app.schemas.product_dto import ProductDTO
+from app.services.cache_backends import (
+    MemoryBackend,
+    SQLiteBackend,
+    dump_product,
+    load_product,
+)
+from app.services.product_cache import ProductCache, TieredProductCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_product(barcode="4600000000001", name="Крем"):
+    return ProductDTO.model_validate(
+        {
+            "barcode": barcode,
+            "name": name,
+            "brand": "Бренд",
+            "category": "Уход",
+            "ingredients": "Aqua, Glycerin, Parfum",
+            "image_url": None,
+            "additional_info": {"Упаковка": "Туба", "Вес": "50 мл", "Страна": "Россия"},
+        }
+    )
+
+
+def make_tiered(clock, backend):
+    return TieredProductCache(
+        ProductCache(maxsize=100, ttl=300, stale_ttl=3600, negative_ttl=60, timer=clock),
+        backend,
+        l2_ttl=86400,
+        l2_negative_ttl=60,
+    )
+
+
+def test_serialization_round_trip_is_compact():
+    product = make_product()
+    raw = dump_product(product, 123.5)
+
+    assert load_product(raw) == (product, 123.5)
+    assert load_product(dump_product(None, 7.0)) == (None, 7.0)
+    assert len(raw) < len(product.model_dump_json(by_alias=True).encode())
+    assert load_product(b"\x09garbage") is None
+
+
+def test_l2_is_shared_between_workers():
+    clock = FakeClock()
+    backend = MemoryBackend(timer=clock)
+    worker_a, worker_b = make_tiered(clock, backend), make_tiered(clock, backend)
+
+    worker_a.put("1", make_product("1"))
+    worker_a.put("2", None)
+
+    entry = worker_b.get("1")
+    assert entry.data.barcode == "1" and worker_b.is_fresh(entry)
+    assert not worker_b.get("2").found
+    assert worker_b.stats()["l2_hits"] == 2
+    # второй раз — уже из L1
+    worker_b.get("1")
+    assert worker_b.stats()["l2_hits"] == 2
+
+    # негативная запись старше своего TTL из L2 не берётся
+    clock.now += 61
+    assert worker_b.get("2") is None
+
+
+def test_stale_l1_entry_picks_fresher_l2_entry():
+    clock = FakeClock()
+    backend = MemoryBackend(timer=clock)
+    worker_a, worker_b = make_tiered(clock, backend), make_tiered(clock, backend)
+    worker_a.put("1", make_product("1", name="Старое"))
+    worker_b.get("1")
+
+    clock.now += 301
+    worker_a.put("1", make_product("1", name="Новое"))
+
+    entry = worker_b.get("1")
+    assert entry.data.name == "Новое" and worker_b.is_fresh(entry)
+
+
+def test_warm_up_fills_l1(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "cache.sqlite3")
+    make_tiered(clock, SQLiteBackend(path, timer=clock)).put("1", make_product("1"))
+
+    # новый воркер / деплой: L1 пуст, L2 в файле
+    restarted = make_tiered(clock, SQLiteBackend(path, timer=clock))
+    assert restarted.warm(limit=10) == 1
+    assert restarted.l1.peek("1").data.barcode == "1"
+    assert restarted.stats()["l2_hits"] == 0
+
+
+def test_l2_failure_does_not_break_lookups():
+    class BrokenBackend(MemoryBackend):
+        name = "broken"
+
+        def get(self, key):
+            raise ConnectionError("redis down")
+
+        def set(self, key, value, ttl):
+            raise ConnectionError("redis down")
+
+    cache = make_tiered(FakeClock(), BrokenBackend())
+    cache.put("1", make_product("1"))
+
+    assert cache.get("1").found
+    assert cache.get("2") is None
+    assert cache.stats()["l2_errors"] == 2
+
+
+@pytest.mark.parametrize("ttl, expected", [(10, True), (-1, False)])
+def test_sqlite_backend_expiry(tmp_path, ttl, expected):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    backend.set("1", b"value", ttl)
+    assert (backend.get("1") == b"value") is expected
@@ -0,0 +1,470 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from app.core.retry import RetryPolicy
+from app.db.crud import OtrazhenieDB
+from app.exceptions.upstream import (
+    CircuitOpenError,
+    UpstreamBadResponse,
+    UpstreamUnavailable,
+)
+from app.schemas.product_dto import ProductDTO
+from app.services import product_lookup_service
+from app.services.product_cache import ProductCache
+from app.services.product_lookup_service import fetch_with_retry
+
+
+@pytest.fixture(autouse=True)
+def no_database(mocker):
+    # долговременный кэш в базе проверяется отдельно (tests ниже с fixture stored_db)
+    mocker.patch.object(product_lookup_service, "LOOKUP_DB_READ_THROUGH", False)
+    mocker.patch.object(product_lookup_service, "LOOKUP_DB_WRITE_BACK", False)
+
+
+@pytest.fixture
+def policy():
+    return RetryPolicy(max_attempts=3, deadline=5, base_delay=0.001, max_delay=0.002)
+
+
+def test_not_found_is_not_retried(policy):
+    calls = []
+
+    def api(barcode, timeout):
+        calls.append(barcode)
+        return None
+
+    assert fetch_with_retry(api, "4600000000000", policy) is None
+    assert calls == ["4600000000000"]
+
+
+def test_upstream_errors_are_retried_then_swallowed(policy):
+    calls = []
+
+    def api(barcode, timeout):
+        calls.append(timeout)
+        raise UpstreamUnavailable("HTTP 503", status=503)
+
+    assert fetch_with_retry(api, "4600000000000", policy) is None
+    assert len(calls) == 3
+
+    calls.clear()
+
+    def bad(barcode, timeout):
+        calls.append(timeout)
+        raise UpstreamBadResponse("HTTP 400", status=400)
+
+    assert fetch_with_retry(bad, "4600000000000", policy) is None
+    assert len(calls) == 1
+
+
+def test_lookup_caches_found_products(mocker):
+    product_lookup_service.product_cache.clear()
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value={"barcode": "1"}
+    )
+
+    assert product_lookup_service.get_product_info_from_api("1") == {"barcode": "1"}
+    assert product_lookup_service.get_product_info_from_api("1") == {"barcode": "1"}
+    assert fetch.call_count == 1
+    product_lookup_service.product_cache.clear()
+
+
+def test_concurrent_lookups_coalesce(mocker):
+    product_lookup_service.product_cache.clear()
+    release = threading.Event()
+
+    def slow_fetch(barcode, timeout=None):
+        release.wait(5)
+        return {"barcode": barcode}
+
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", side_effect=slow_fetch
+    )
+    flight = product_lookup_service.lookup_flight
+    coalesced_before = flight.stats()["coalesced"]
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                product_lookup_service.get_product_info_from_api("2")
+            )
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] - coalesced_before < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.call_count == 1
+    assert results == [{"barcode": "2"}] * 5
+    product_lookup_service.product_cache.clear()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = FakeClock()
+    mocker.patch.object(
+        product_lookup_service,
+        "product_cache",
+        ProductCache(maxsize=10, ttl=300, stale_ttl=3600, negative_ttl=60, timer=clock),
+    )
+    return clock
+
+
+def test_not_found_is_cached_briefly(clock, mocker):
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value=None
+    )
+
+    assert product_lookup_service.get_product_info_from_api("3") is None
+    assert product_lookup_service.get_product_info_from_api("3") is None
+    assert fetch.call_count == 1
+
+    clock.now += 61
+    product_lookup_service.get_product_info_from_api("3")
+    assert fetch.call_count == 2
+    assert product_lookup_service.product_cache.stats()["negative_hits"] == 1
+
+
+def test_upstream_failure_is_not_negatively_cached(clock, mocker):
+    mocker.patch.object(product_lookup_service, "lookup_retry_policy", RetryPolicy(max_attempts=1))
+    fetch = mocker.patch.object(
+        product_lookup_service,
+        "fetch_cosmetic_info",
+        side_effect=UpstreamUnavailable("HTTP 503", status=503),
+    )
+
+    assert product_lookup_service.get_product_info_from_api("4") is None
+    assert product_lookup_service.get_product_info_from_api("4") is None
+    assert fetch.call_count == 2
+
+
+def test_stale_while_revalidate(clock, mocker):
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value={"v": 1}
+    )
+    scheduled = mocker.patch.object(product_lookup_service, "_schedule_refresh")
+    product_lookup_service.get_product_info_from_api("5")
+
+    clock.now += 301
+    fetch.return_value = {"v": 2}
+    # устаревшее значение — сразу, обновление — в фоне
+    assert product_lookup_service.get_product_info_from_api("5") == {"v": 1}
+    scheduled.assert_called_once_with("5")
+
+    product_lookup_service._refresh("5")
+    assert product_lookup_service.get_product_info_from_api("5") == {"v": 2}
+    assert fetch.call_count == 2
+
+
+def test_stale_if_error(clock, mocker):
+    mocker.patch.object(product_lookup_service, "LOOKUP_STALE_WHILE_REVALIDATE", False)
+    mocker.patch.object(product_lookup_service, "lookup_retry_policy", RetryPolicy(max_attempts=1))
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value={"v": 1}
+    )
+    product_lookup_service.get_product_info_from_api("6")
+
+    clock.now += 301
+    fetch.side_effect = UpstreamUnavailable("HTTP 503", status=503)
+    assert product_lookup_service.get_product_info_from_api("6") == {"v": 1}
+    assert fetch.call_count == 2
+
+    # после окна устаревания отдавать уже нечего
+    clock.now += 3600
+    assert product_lookup_service.get_product_info_from_api("6") is None
+
+
+@pytest.fixture
+def stored_db(tmp_path, mocker):
+    mocker.patch(
+        "app.services.ingredient_index.ingredient_index.resolve_id", return_value=None
+    )
+    database = OtrazhenieDB(f"sqlite:///{tmp_path / 'products.db'}")
+    database.create_tables()
+    mocker.patch.object(product_lookup_service, "_db", return_value=database)
+    mocker.patch.object(product_lookup_service, "LOOKUP_DB_READ_THROUGH", True)
+    mocker.patch.object(product_lookup_service, "LOOKUP_DB_WRITE_BACK", True)
+    # запись в базу — синхронно, чтобы проверить её сразу
+    mocker.patch.object(
+        product_lookup_service,
+        "_schedule_write_back",
+        side_effect=lambda data: product_lookup_service._write_back(
+            data, product_lookup_service._utcnow()
+        ),
+    )
+    return database
+
+
+def make_product(barcode, name="Крем"):
+    return ProductDTO.model_validate(
+        {
+            "barcode": barcode,
+            "name": name,
+            "brand": "",
+            "category": "",
+            "ingredients": "Aqua, Glycerin",
+            "image_url": None,
+            "additional_info": {"Вес": "50 ml"},
+        }
+    )
+
+
+def test_api_result_is_written_and_read_back(clock, stored_db, mocker):
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value=make_product("7")
+    )
+    product_lookup_service.get_product_info_from_api("7")
+    row = stored_db.select_product_for_lookup("7")
+    assert (row.name, row.weight, row.quantity) == ("Крем", "50 ml", None)
+    assert row.fetched_at is not None
+
+    # кэш процесса истёк — продукт берётся из базы, API не нужен
+    product_lookup_service.product_cache.clear()
+    data = product_lookup_service.get_product_info_from_api("7")
+    assert (data.name, data.ingredients, data.additional_info.weight) == (
+        "Крем", "Aqua, Glycerin", "50 ml"
+    )
+    assert fetch.call_count == 1
+
+
+def test_stale_database_row_is_refreshed(clock, stored_db, mocker):
+    stored_db.save_fetched_product("8", datetime(2000, 1, 1), name="Старый")
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value=make_product("8", "Новый")
+    )
+
+    assert product_lookup_service.get_product_info_from_api("8").name == "Новый"
+    assert stored_db.select_product_for_lookup("8").name == "Новый"
+    assert fetch.call_count == 1
+
+
+def test_stale_database_row_served_when_api_fails(clock, stored_db, mocker):
+    stored_db.save_fetched_product("9", datetime(2000, 1, 1), name="Старый")
+    mocker.patch.object(product_lookup_service, "lookup_retry_policy", RetryPolicy(max_attempts=1))
+    mocker.patch.object(
+        product_lookup_service,
+        "fetch_cosmetic_info",
+        side_effect=UpstreamUnavailable("HTTP 503", status=503),
+    )
+
+    assert product_lookup_service.get_product_info_from_api("9").name == "Старый"
+
+
+def test_manual_product_never_hits_api(clock, stored_db, mocker):
+    stored_db.add_product("10", "Ручной")
+    fetch = mocker.patch.object(product_lookup_service, "fetch_cosmetic_info")
+
+    assert product_lookup_service.get_product_info_from_api("10").name == "Ручной"
+    fetch.assert_not_called()
+
+
+def test_open_circuit_serves_stale_without_api(clock, mocker):
+    mocker.patch.object(product_lookup_service, "LOOKUP_STALE_WHILE_REVALIDATE", False)
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value={"v": 1}
+    )
+    product_lookup_service.get_product_info_from_api("11")
+
+    clock.now += 301
+    fetch.side_effect = CircuitOpenError("openbeautyfacts: предохранитель разомкнут")
+    assert product_lookup_service.get_product_info_from_api("11") == {"v": 1}
+    # CircuitOpenError не повторяется
+    assert fetch.call_count == 2
+    assert product_lookup_service.lookup_stats()["fail_fast"] >= 1
+
+
+def test_dump_index_resolves_before_api(clock, mocker):
+    index = mocker.Mock()
+    index.get.return_value = (make_product("12", "Из выгрузки"), time.time())
+    mocker.patch.object(product_lookup_service, "get_local_index", return_value=index)
+    fetch = mocker.patch.object(product_lookup_service, "fetch_cosmetic_info")
+
+    assert product_lookup_service.get_product_info_from_api("12").name == "Из выгрузки"
+    fetch.assert_not_called()
+
+    index.get.return_value = None
+    fetch.return_value = make_product("13")
+    assert product_lookup_service.get_product_info_from_api("13").name == "Крем"
+
+
+def test_stale_dump_entry_goes_to_api_and_serves_only_on_error(clock, mocker):
+    mocker.patch.object(product_lookup_service, "LOOKUP_STALE_WHILE_REVALIDATE", False)
+    index = mocker.Mock()
+    dumped_at = time.time() - product_lookup_service.LOOKUP_DB_MAX_AGE_SECONDS - 60
+    index.get.return_value = (make_product("15", "Из старой выгрузки"), dumped_at)
+    mocker.patch.object(product_lookup_service, "get_local_index", return_value=index)
+    fetch = mocker.patch.object(
+        product_lookup_service, "fetch_cosmetic_info", return_value=make_product("15", "Из API")
+    )
+
+    assert product_lookup_service.get_product_info_from_api("15").name == "Из API"
+
+    index.get.return_value = (make_product("16", "Из старой выгрузки"), dumped_at)
+    fetch.side_effect = UpstreamUnavailable("HTTP 503", status=503)
+    assert product_lookup_service.get_product_info_from_api("16").name == "Из старой выгрузки"
+    assert product_lookup_service.lookup_stats()["local_stale"] >= 2
+
+
+def test_async_lookup_coalesces_and_caches(clock, mocker):
+    calls = []
+
+    async def fetch(barcode, timeout=None):
+        calls.append(barcode)
+        await asyncio.sleep(0.01)
+        return make_product(barcode)
+
+    mocker.patch.object(product_lookup_service, "fetch_cosmetic_info_async", side_effect=fetch)
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(product_lookup_service.get_product_info_async("14") for _ in range(5))
+        )
+        cached = await product_lookup_service.get_product_info_async("14")
+        return results, cached
+
+    results, cached = asyncio.run(scenario())
+    assert [data.barcode for data in results] == ["14"] * 5
+    assert cached.barcode == "14"
+    assert calls == ["14"]
+
+
+def test_async_lookup_serves_stale_on_error(clock, mocker):
+    mocker.patch.object(product_lookup_service, "LOOKUP_STALE_WHILE_REVALIDATE", False)
+    mocker.patch.object(product_lookup_service, "lookup_retry_policy", RetryPolicy(max_attempts=1))
+    fetch = mocker.patch.object(
+        product_lookup_service,
+        "fetch_cosmetic_info_async",
+        return_value=make_product("15"),
+    )
+    asyncio.run(product_lookup_service.get_product_info_async("15"))
+
+    clock.now += 301
+    fetch.side_effect = UpstreamUnavailable("HTTP 503", status=503)
+    assert asyncio.run(product_lookup_service.get_product_info_async("15")).barcode == "15"
+    assert fetch.call_count == 2
+
+
+def test_async_stale_while_revalidate(clock, mocker):
+    fetch = mocker.patch.object(
+        product_lookup_service,
+        "fetch_cosmetic_info_async",
+        return_value=make_product("16", "Старый"),
+    )
+
+    async def scenario():
+        await product_lookup_service.get_product_info_async("16")
+        clock.now += 301
+        fetch.return_value = make_product("16", "Новый")
+        stale = await product_lookup_service.get_product_info_async("16")
+        await asyncio.gather(*product_lookup_service._refresh_tasks)
+        fresh = await product_lookup_service.get_product_info_async("16")
+        return stale.name, fresh.name
+
+    assert asyncio.run(scenario()) == ("Старый", "Новый")
+
+
+def test_batch_lookup_answers_from_cache_and_database_first(clock, stored_db, mocker):
+    stored_db.save_fetched_product(
+        "4600000000002", product_lookup_service._utcnow(), name="Из базы"
+    )
+    product_lookup_service.product_cache.put("4600000000001", make_product("4600000000001"))
+    fetch = mocker.patch.object(
+        product_lookup_service,
+        "fetch_cosmetic_info",
+        side_effect=lambda barcode, timeout=None: make_product(barcode, "Из API")
+        if barcode == "4600000000003"
+        else None,
+    )
+
+    results = list(
+        product_lookup_service.lookup_products_batch(
+            ["4600000000001", "4600000000002", "4600000000003", "4600000000004",
+             "46 00000000001", "abc"]
+        )
+    )
+
+    outcomes = [(r.barcode, r.status, r.source) for r in results]
+    assert outcomes[:3] == [
+        ("abc", "invalid", None),
+        ("4600000000001", "found", "cache"),
+        ("4600000000002", "found", "local"),
+    ]
+    # ответы API — в порядке готовности
+    assert sorted(outcomes[3:]) == [
+        ("4600000000003", "found", "upstream"),
+        ("4600000000004", "not_found", "upstream"),
+    ]
+    by_barcode = {r.barcode: r.to_dict() for r in results}
+    assert by_barcode["4600000000003"]["product"]["name"] == "Из API"
+    assert sorted(call.args[0] for call in fetch.call_args_list) == [
+        "4600000000003",
+        "4600000000004",
+    ]
+    # найденное пачкой попадает в кэш для одиночных запросов
+    assert product_lookup_service.product_cache.peek("4600000000002").data.name == "Из базы"
+
+
+def test_batch_lookup_bounds_parallel_upstream_calls(clock, mocker):
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def slow_fetch(barcode, timeout=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.02)
+        with lock:
+            active[0] -= 1
+        return make_product(barcode)
+
+    mocker.patch.object(product_lookup_service, "fetch_cosmetic_info", side_effect=slow_fetch)
+    barcodes = [f"46000000000{i:02d}" for i in range(12)]
+
+    results = list(product_lookup_service.lookup_products_batch(barcodes, parallelism=3))
+
+    assert sorted(r.barcode for r in results) == barcodes
+    assert all(r.status == "found" for r in results)
+    assert peak[0] <= 3
+
+
+def test_batch_lookup_reports_upstream_failures_per_barcode(clock, mocker):
+    mocker.patch.object(product_lookup_service, "lookup_retry_policy", RetryPolicy(max_attempts=1))
+
+    def fetch(barcode, timeout=None):
+        if barcode == "4600000000011":
+            raise UpstreamUnavailable("HTTP 503", status=503)
+        return make_product(barcode)
+
+    mocker.patch.object(product_lookup_service, "fetch_cosmetic_info", side_effect=fetch)
+
+    results = {
+        r.barcode: r.status
+        for r in product_lookup_service.lookup_products_batch(["4600000000011", "4600000000012"])
+    }
+
+    assert results == {"4600000000011": "error", "4600000000012": "found"}
+    # сбой — не «не найден»: в кэш не записан
+    assert product_lookup_service.product_cache.peek("4600000000011") is None
+
+
+def test_batch_lookup_rejects_oversized_batch(mocker):
+    mocker.patch.object(product_lookup_service, "LOOKUP_BATCH_MAX_SIZE", 2)
+    with pytest.raises(ValueError):
+        product_lookup_service.lookup_products_batch(["46000000", "46000001", "46000002"])
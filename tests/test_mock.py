@@ -2,12 +2,12 @@ from datetime import datetime
 from unittest.mock import patch
 
 
-def test_validate_with_mock(user_service, mock_email_check):
+def test_validate_with_mock(user_service, mock_conflict_check):
     data = {"username": "user", "email": "a@a.com", "password": "Strong123"}
     validated = user_service.validate_registration_data(data)
 
     assert validated["email"] == "a@a.com"
-    mock_email_check.assert_called_once_with("a@a.com")
+    mock_conflict_check.assert_called_once_with("a@a.com", "user")
 
 
 @patch("app.services.user_service.OtrazhenieDB.get_user_by_username")
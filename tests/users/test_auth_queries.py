@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.db.crud import OtrazhenieDB
+from app.db.encrypt import EncryptData, make_hasher
+from app.exceptions.validation import ValidationError
+from app.services.user_service import UserService
+
+PASSWORD = "StrongPass123!"
+
+
+@pytest.fixture
+def service(tmp_path, mocker):
+    # минимальные параметры Argon2 — тест считает запросы, а не хеши
+    mocker.patch(
+        "app.db.crud.EncryptData",
+        return_value=EncryptData(
+            hasher=make_hasher(time_cost=1, memory_cost=8, parallelism=1)
+        ),
+    )
+    mocker.patch(
+        "app.services.user_service.EncryptData",
+        return_value=EncryptData(
+            hasher=make_hasher(time_cost=1, memory_cost=8, parallelism=1)
+        ),
+    )
+    user_service = UserService()
+    user_service.db = OtrazhenieDB(f"sqlite:///{tmp_path / 'users.db'}")
+    user_service.db.create_tables()
+    user_service.register_user(
+        {"username": "existing", "email": "existing@example.com", "password": PASSWORD}
+    )
+    return user_service
+
+
+@contextmanager
+def count_queries(db):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_login_is_one_query(service):
+    with count_queries(service.db) as statements:
+        user = service.authenticate_user("existing@example.com", PASSWORD)
+    assert user.username == "existing"
+    assert len(statements) == 1
+    # только нужные колонки, не весь ORM-объект
+    assert "created_at" not in statements[0]
+
+
+@pytest.mark.parametrize(
+    "email, password",
+    [("existing@example.com", "Wrong123!"), ("missing@example.com", PASSWORD)],
+)
+def test_failed_login_is_one_query(service, email, password):
+    with count_queries(service.db) as statements:
+        assert service.authenticate_user(email, password) is None
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize(
+    "username, email, expected",
+    [
+        ("new", "new@example.com", set()),
+        ("existing", "new@example.com", {"username"}),
+        ("new", "existing@example.com", {"email"}),
+        ("existing", "existing@example.com", {"email", "username"}),
+    ],
+)
+def test_registration_check_is_one_query(service, username, email, expected):
+    data = {"username": username, "email": email, "password": PASSWORD}
+    with count_queries(service.db) as statements:
+        if expected:
+            with pytest.raises(ValidationError) as error:
+                service.validate_registration_data(data)
+            assert set(error.value.errors) == expected
+        else:
+            service.validate_registration_data(data)
+    assert len(statements) == 1
+
+
+def test_registration_race_maps_integrity_error(service, mocker):
+    # проверка прошла до того, как параллельный запрос занял email
+    mocker.patch.object(
+        service.db, "find_registration_conflicts", side_effect=[set(), {"email"}]
+    )
+    with pytest.raises(ValidationError) as error:
+        service.register_user(
+            {"username": "other", "email": "existing@example.com", "password": PASSWORD}
+        )
+    assert set(error.value.errors) == {"email"}
@@ -64,24 +64,30 @@ def test_password_strength(user_service, password, expect_error):
 
 
 # Проверка дубликатов username/email
-def test_duplicate_email(user_service):
+def test_duplicate_email(user_service, mocker):
     # Мокаем, что пользователь уже существует
-    user_service.db.get_user_by_email = lambda email: True
+    mocker.patch.object(
+        user_service.db, "find_registration_conflicts", return_value={"email"}
+    )
     data = {
         "username": "user1",
         "email": "user1@example.com",
-        "password": "StrongPass123",
+        "password": "StrongPass123!",
     }
-    with pytest.raises(ValidationError):
+    with pytest.raises(ValidationError) as error:
         user_service.validate_registration_data(data)
+    assert set(error.value.errors) == {"email"}
 
 
-def test_duplicate_username(user_service):
-    user_service.db.get_user_by_username = lambda username: True
+def test_duplicate_username(user_service, mocker):
+    mocker.patch.object(
+        user_service.db, "find_registration_conflicts", return_value={"username"}
+    )
     data = {
         "username": "user1",
         "email": "user1@example.com",
-        "password": "StrongPass123",
+        "password": "StrongPass123!",
     }
-    with pytest.raises(ValidationError):
+    with pytest.raises(ValidationError) as error:
         user_service.validate_registration_data(data)
+    assert set(error.value.errors) == {"username"}